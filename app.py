@@ -1,5 +1,5 @@
 # app.py
-import os, json, asyncio
+import os, json, asyncio, time
 from pathlib import Path
 import faiss
 import numpy as np
@@ -7,19 +7,25 @@ from fastapi import FastAPI, HTTPException
 from fastapi.staticfiles import StaticFiles
 from fastapi.responses import FileResponse
 from pydantic import BaseModel
-from sentence_transformers import SentenceTransformer
+from embedding_backend import load_embedder, EMBED_BACKEND, EMBED_QUANTIZE
 from dotenv import load_dotenv
 from openai import OpenAI
 import uuid
 from datetime import datetime
 from typing import List, Dict, Optional
 from contextlib import asynccontextmanager
+from query_expansion import expander, expand_query
+from retrieval import search_candidates, mmr_select, adaptive_cutoff, RetrievalStats, SourceFilterIndex
+from structured_answer import StructuredAnswerStats, timed_answer
 from fastapi import UploadFile, File, Header, Depends
 import shutil
 import tempfile
 import subprocess
 import os
-from file_watcher import init_file_watcher, start_file_watcher, stop_file_watcher, get_watcher_status
+from file_watcher import (init_file_watcher, start_file_watcher, stop_file_watcher, get_watcher_status,
+                          enqueue_files, SUPPORTED_EXTENSIONS)
+from reconcile import scan_files, plan_reconcile, load_manifest, save_manifest, seed_manifest
+from poll_watcher import parse_ignore, WATCH_IGNORE
 
 # --- 챗봇의 핵심 자원(모델, 인덱스)을 관리하는 lifespan 함수 ---
 @asynccontextmanager
@@ -31,10 +37,14 @@ async def lifespan(app: FastAPI):
     
     # 파일 워쳐 초기화 및 시작
     print("👁️ 파일 워쳐 초기화 중...")
-    init_file_watcher(DATA_DIR, add_documents_to_index)
+    # 워쳐 스레드가 감지한 파일은 이 이벤트 루프에서 인덱싱 (run_coroutine_threadsafe)
+    init_file_watcher(DATA_DIR, add_documents_to_index, asyncio.get_running_loop())
     start_file_watcher()
     print("✅ 파일 워쳐 시작됨")
     
+    # 서버가 꺼져 있던 동안 바뀐 파일은 백그라운드에서 대조 (그동안은 기존 인덱스로 응답)
+    asyncio.create_task(reconcile_data_dir())
+    
     yield
     # 서버가 종료될 때 실행되는 부분 (정리 코드)
     print("🛑 파일 워쳐 중지 중...")
@@ -43,18 +53,67 @@ async def lifespan(app: FastAPI):
 
 async def load_resources():
     """AI 모델 및 인덱스 파일을 로드하는 함수"""
-    global index, metas, texts, emb_model
+    global state, emb_model, manifest
+    if not (INDEX_DIR / "faiss.index").exists():
+        # 인덱스가 아직 없으면 빈 상태로 시작 (파일 워쳐/업로드로 추가되는 첫 문서가 인덱스를 만든다)
+        print("⚠️ 인덱스가 없습니다 - 빈 인덱스로 시작합니다")
+        state, manifest = IndexState(), {}
+        emb_model = load_embedder(model_name=EMB_MODEL_NAME)
+        return
     try:
         index = faiss.read_index(str(INDEX_DIR / "faiss.index"))
         with open(INDEX_DIR / "meta.json", "r", encoding="utf-8") as f:
             store = json.load(f)
-        metas = store["metas"]
-        texts = store["texts"]
-        emb_model = SentenceTransformer(EMB_MODEL_NAME)
-        print("✅ 인덱스와 모델 로드 완료!")
+        state = IndexState(index, store["metas"], store["texts"])
+        manifest = load_manifest(INDEX_DIR)
+        emb_model = load_embedder(model_name=EMB_MODEL_NAME)
+        print(f"✅ 인덱스와 모델 로드 완료! (임베딩 백엔드: {EMBED_BACKEND}, 양자화: {EMBED_QUANTIZE})")
     except Exception as e:
         print(f"❌ 인덱스/모델 로드 실패: {e}")
 
+async def reconcile_data_dir():
+    """data/를 stat해서 manifest와 비교하고, 추가·변경·삭제된 파일만 증분 인덱싱에 넘긴다"""
+    global reconcile_status
+    start = time.perf_counter()
+    try:
+        scanned = await asyncio.to_thread(scan_files, DATA_DIR, SUPPORTED_EXTENSIONS,
+                                          is_ignored=parse_ignore(WATCH_IGNORE))
+        indexed_sources = {meta["source"] for meta in state.metas}
+        if not manifest and indexed_sources:
+            # manifest.json이 없는 이전 인덱스: 전부 다시 임베딩하지 않도록 현재 stat으로 기록을 채운다
+            manifest.update(seed_manifest(scanned, indexed_sources))
+            save_manifest(INDEX_DIR, manifest)
+            print(f"📝 manifest 없음 - 인덱스에 있는 파일 {len(manifest)}개를 현재 상태로 기록")
+        plan = plan_reconcile(scanned, manifest, indexed_sources)
+    except Exception as e:
+        print(f"❌ 시작 시 대조 실패: {e}")
+        reconcile_status = {"state": "failed", "error": str(e)}
+        return
+    scan_ms = round((time.perf_counter() - start) * 1000, 1)
+    reconcile_status = {
+        "state": "scanned", "files": len(scanned), "scan_ms": scan_ms,
+        "added": len(plan.added), "changed": len(plan.changed), "removed": len(plan.removed),
+        "unchanged": plan.unchanged,
+    }
+    print(f"🔍 시작 시 대조: 파일 {len(scanned)}개 ({scan_ms}ms) - 추가 {len(plan.added)}, "
+          f"변경 {len(plan.changed)}, 삭제 {len(plan.removed)}, 그대로 {plan.unchanged}")
+
+    paths = plan.paths(DATA_DIR)
+    if not paths:
+        reconcile_status["state"] = "done"
+        return
+    # 워쳐가 돌고 있으면 같은 큐로 넘겨 워쳐 이벤트와 중복 인덱싱되지 않게 한다
+    if enqueue_files(paths):
+        reconcile_status["state"] = "queued"
+        return
+    reconcile_status["state"] = "indexing"
+    try:
+        await add_documents_to_index(paths)
+        reconcile_status["state"] = "done"
+    except Exception as e:
+        print(f"❌ 시작 시 증분 인덱싱 실패: {e}")
+        reconcile_status.update(state="failed", error=str(e))
+
 # .env 파일 로드
 load_dotenv()
 
@@ -73,24 +132,47 @@ EMB_MODEL_NAME = "jhgan/ko-sroberta-multitask"
 TOP_K = 10
 SIMILARITY_THRESHOLD = 0.1
 
-# 키워드 확장 맵
-KEYWORD_EXPANSION = {
-    "다자녀가정": ["다자녀", "셋째아이", "3자녀", "3명 이상", "많은 자녀"], 
-    "다자녀": ["다자녀가정", "셋째아이", "3자녀", "3명 이상"],
-    "혜택": ["지원", "보조", "급여", "수당", "할인", "감면", "우대"], 
-    "지원": ["혜택", "보조", "급여", "수당", "지원금"],
-    "임신": ["임산부", "예비맘", "산모", "임신부"], 
-    "출산": ["분만", "해산", "신생아", "산후조리"],
-    "육아": ["양육", "자녀돌봄", "보육", "육아휴직"], 
-    "보육": ["어린이집", "유치원", "놀이방", "육아", "양육"],
-    "한부모": ["한부모가정", "미혼모", "편부모", "조손가정"]
-}
+# MMR(Maximal Marginal Relevance) 다양화 설정
+MMR_ENABLED = os.environ.get("MMR_ENABLED", "false").lower() == "true"
+MMR_LAMBDA = float(os.environ.get("MMR_LAMBDA", 0.7))  # 1.0에 가까울수록 관련성 우선
+MMR_FETCH_MULTIPLIER = 4  # 후보를 k의 몇 배까지 가져올지
+MMR_MAX_PER_SOURCE = int(os.environ.get("MMR_MAX_PER_SOURCE", 3))  # 문서당 최대 청크 수
+MMR_MAX_WIDEN = 2  # 문서당 상한 때문에 후보가 k개보다 적을 때 후보 수를 두 배로 늘려 다시 검색하는 최대 횟수
+
+# 다중 질의 설정 (원본 + 동의어 그룹별 변형을 한 번에 배치 임베딩/검색 후 결과 병합)
+MULTI_QUERY_ENABLED = os.environ.get("MULTI_QUERY_ENABLED", "false").lower() == "true"
+MULTI_QUERY_MAX_VARIANTS = int(os.environ.get("MULTI_QUERY_MAX_VARIANTS", 4))
+
+# 적응형 top-k 설정 (fixed: 항상 TOP_K개, knee: 점수 급락 지점에서 자름, threshold: 보정된 절대 임계값)
+RETRIEVAL_MODE = os.environ.get("RETRIEVAL_MODE", "fixed")
+ADAPTIVE_MIN_K = int(os.environ.get("ADAPTIVE_MIN_K", 3))
+ADAPTIVE_SCORE_THRESHOLD = float(os.environ.get("ADAPTIVE_SCORE_THRESHOLD", 0.35))
+ADAPTIVE_MIN_GAP = float(os.environ.get("ADAPTIVE_MIN_GAP", 0.05))
+
+# 구조화 답변 (문의처/신청 방법 등 필드 하나를 묻는 질문은 검색된 사업 필드로 LLM 없이 답변)
+STRUCTURED_ANSWER_ENABLED = os.environ.get("STRUCTURED_ANSWER_ENABLED", "true").lower() == "true"
 
 # === 인덱스 및 모델 변수 초기화 ===
-index = None
-metas = []
-texts = []
+class IndexState:
+    """FAISS 인덱스, 메타데이터, 텍스트, 출처/확장자 필터 역색인 묶음
+
+    인덱스를 바꿀 때는 새 객체를 다 만든 뒤 state에 한 번에 대입한다.
+    검색 요청은 시작할 때 잡은 state를 끝까지 쓰므로 갱신 중에도 서로 어긋난 인덱스·메타데이터를 보지 않는다.
+    """
+
+    def __init__(self, index=None, metas: Optional[List[Dict]] = None, texts: Optional[List[str]] = None):
+        self.index = index
+        self.metas = metas if metas is not None else []
+        self.texts = texts if texts is not None else []
+        self.source_filter = SourceFilterIndex(self.metas)
+
+state = IndexState()
 emb_model = None
+manifest = {}  # 파일명 → {size, mtime_ns, content_hash} (시작 시 대조용)
+index_update_lock = asyncio.Lock()  # 인덱스 변경(워쳐·업로드·삭제)은 한 번에 하나씩
+reconcile_status = {"state": "pending"}  # 시작 시 대조 결과
+retrieval_stats = RetrievalStats()  # 요청별 선택된 k / 프롬프트 토큰 / LLM 지연 기록
+structured_stats = StructuredAnswerStats()  # 구조화 답변 적중률
 
 # FastAPI 앱 생성 시 lifespan 연결
 app = FastAPI(
@@ -149,50 +231,84 @@ sessions: Dict[str, ConversationSession] = {}
 class AskReq(BaseModel):
     question: str
     session_id: Optional[str] = None
+    diversify: Optional[bool] = None  # None이면 MMR_ENABLED 설정을 따름
+    multi_query: Optional[bool] = None  # None이면 MULTI_QUERY_ENABLED 설정을 따름
+    sources: Optional[List[str]] = None  # 검색 대상 파일명 (예: ["광양시_복지.txt"])
+    extensions: Optional[List[str]] = None  # 검색 대상 확장자 (예: [".xlsx"])
 
 class NewSessionResponse(BaseModel):
     session_id: str
     message: str
 
-def expand_query(query: str) -> str:
-    """질문을 확장하여 더 나은 검색 결과를 얻기"""
-    expanded_terms = []
-    query_lower = query.lower()
-    
-    for keyword, synonyms in KEYWORD_EXPANSION.items():
-        if keyword in query_lower:
-            expanded_terms.extend(synonyms)
-        for synonym in synonyms:
-            if synonym in query_lower and keyword not in expanded_terms:
-                expanded_terms.append(keyword)
-                expanded_terms.extend([s for s in synonyms if s != synonym])
-    
-    if expanded_terms:
-        unique_terms = list(set(expanded_terms))
-        return f"{query} {' '.join(unique_terms[:5])}"
-    return query
-
-def search_similar(query: str, k=TOP_K):
-    """유사한 문서를 검색합니다"""
-    if not index or not emb_model:
+def search_similar(query: str, k=TOP_K, diversify: Optional[bool] = None,
+                   sources: Optional[List[str]] = None, extensions: Optional[List[str]] = None,
+                   multi_query: Optional[bool] = None):
+    """유사한 문서를 검색합니다 (sources/extensions 지정 시 해당 문서 안에서만 검색)"""
+    current = state
+    if not current.index or not emb_model:
         raise HTTPException(status_code=503, detail="모델/인덱스가 아직 로드되지 않았습니다. 잠시 후 다시 시도해주세요.")
     
-    # 질문 확장
-    expanded_query = expand_query(query)
+    # 질문 확장: 다중 질의 모드는 변형 질문 목록, 기본은 동의어를 이어 붙인 단일 질문
+    use_multi = MULTI_QUERY_ENABLED if multi_query is None else multi_query
+    if use_multi:
+        query_variants = expander.variants(query, MULTI_QUERY_MAX_VARIANTS)
+    else:
+        query_variants = [expand_query(query)]
+    
+    # 메타데이터 필터는 ID 선택자로 index.search 내부에서 적용
+    search_params, candidate_count = current.source_filter.search_params(sources, extensions)
+    if candidate_count == 0:
+        return []
+    
+    # MMR 사용 시 후보를 넉넉히 가져온 뒤 다양화
+    use_mmr = MMR_ENABLED if diversify is None else diversify
+    fetch_k = min(k * MMR_FETCH_MULTIPLIER if use_mmr else k, candidate_count)
+    
+    # 임베딩 및 검색 (변형 질문 전체를 한 번의 encode / index.search로 배치 처리)
+    q_emb = emb_model.encode(query_variants, normalize_embeddings=True).astype("float32")
+    # 유사도 임계값 이상만 포함 (MMR 사용 시 문서당 상한 때문에 후보가 k개보다 적으면 후보를 넓혀 다시 검색)
+    hits = search_candidates(
+        current.index, q_emb, fetch_k, candidate_count, SIMILARITY_THRESHOLD, search_params,
+        metas=current.metas if use_mmr else None, k=k,
+        max_per_source=MMR_MAX_PER_SOURCE, max_widen=MMR_MAX_WIDEN,
+    )
+    
+    # 적응형 top-k: 점수 분포를 보고 실제로 사용할 개수를 결정
+    top_k = adaptive_cutoff(
+        [score for _, score in hits],
+        min_k=ADAPTIVE_MIN_K,
+        max_k=k,
+        mode=RETRIEVAL_MODE,
+        threshold=ADAPTIVE_SCORE_THRESHOLD,
+        min_gap=ADAPTIVE_MIN_GAP,
+    )
     
-    # 임베딩 및 검색
-    q_emb = emb_model.encode([expanded_query], normalize_embeddings=True).astype("float32")
-    D, I = index.search(q_emb, k)
+    if use_mmr and len(hits) > 1:
+        ids = np.array([i for i, _ in hits], dtype="int64")
+        order = mmr_select(
+            q_emb[0],
+            current.index.reconstruct_batch(ids),
+            top_k,
+            lambda_mult=MMR_LAMBDA,
+            rel_scores=np.array([score for _, score in hits], dtype="float32"),
+            sources=[current.metas[i]["source"] for i in ids],
+            max_per_source=MMR_MAX_PER_SOURCE,
+        )
+        hits = [hits[j] for j in order]
     
     results = []
-    for i, score in zip(I[0], D[0]):
-        if score >= SIMILARITY_THRESHOLD:  # 유사도 임계값 이상만 포함
-            results.append({
-                "text": texts[i],
-                "source": metas[i]["source"],
-                "chunk_id": metas[i]["chunk_id"],
-                "score": float(score)
-            })
+    for i, score in hits[:top_k]:
+        meta = current.metas[i]
+        result = {
+            "text": current.texts[i],
+            "source": meta["source"],
+            "chunk_id": meta["chunk_id"],
+            "score": score
+        }
+        # 사업 단위로 인덱싱된 청크는 파싱된 필드를 함께 전달
+        if "program" in meta:
+            result["program"] = meta["program"]
+        results.append(result)
     
     return results
 
@@ -294,12 +410,14 @@ def get_session_history(session_id: str):
 @app.get("/documents")
 def get_indexed_documents():
     """인덱스된 문서 목록을 반환합니다"""
+    current = state
+    metas, texts = current.metas, current.texts
     if not metas:
         return {"documents": [], "total_documents": 0, "total_chunks": 0}
     
     # 문서별로 그룹화
     doc_info = {}
-    for meta in metas:
+    for position, meta in enumerate(metas):
         source = meta["source"]
         if source not in doc_info:
             doc_info[source] = {
@@ -311,11 +429,10 @@ def get_indexed_documents():
         doc_info[source]["chunks"] += 1
         
         # 첫 번째 청크의 일부 텍스트를 미리보기로 사용
+        # (uid는 삭제·교체 후 위치와 달라지므로 texts는 metas와 같은 위치로 찾는다)
         if doc_info[source]["chunks"] == 1 and meta["chunk_id"] == 0:
-            chunk_index = meta["uid"]
-            if chunk_index < len(texts):
-                preview_text = texts[chunk_index][:200] + "..." if len(texts[chunk_index]) > 200 else texts[chunk_index]
-                doc_info[source]["first_chunk_text"] = preview_text
+            text = texts[position]
+            doc_info[source]["first_chunk_text"] = text[:200] + "..." if len(text) > 200 else text
     
     return {
         "documents": list(doc_info.values()),
@@ -337,15 +454,29 @@ def ask(req: AskReq):
     session.add_message("user", req.question)
     
     # 유사한 문서 검색
-    hits = search_similar(req.question, k=TOP_K)
-    
-    if not client:
+    hits = search_similar(req.question, k=TOP_K, diversify=req.diversify,
+                          sources=req.sources, extensions=req.extensions,
+                          multi_query=req.multi_query)
+    
+    prompt_tokens = None
+    llm_ms = None
+    sources = hits
+    structured = timed_answer(req.question, hits, structured_stats) if STRUCTURED_ANSWER_ENABLED else None
+    if structured:
+        # 필드 하나로 답할 수 있는 질문 - LLM 호출 생략, 근거 청크만 출처로 반환
+        answer = structured.answer
+        sources = [structured.hit]
+        summary = structured_stats.summary()
+        print(f"⚡ 구조화 답변: {structured.title} / {structured.field} "
+              f"(적중률 {summary['hits']}/{summary['requests']} = {summary['hit_rate']:.0%})")
+    elif not client:
         answer = "⚠️ OpenAI API 키가 설정되지 않았습니다."
     else:
         # LLM 프롬프트 구성
         user_prompt = build_prompt(req.question, hits, session.get_context())
         
         # OpenAI API 호출
+        llm_start = time.perf_counter()
         completion = client.chat.completions.create(
             model="gpt-4o-mini",
             temperature=0.1,
@@ -355,89 +486,181 @@ def ask(req: AskReq):
             ]
         )
         answer = completion.choices[0].message.content
+        llm_ms = (time.perf_counter() - llm_start) * 1000
+        if completion.usage:
+            prompt_tokens = completion.usage.prompt_tokens
+    
+    # 선택된 k와 프롬프트 비용 기록 (적응형 top-k 효과 측정용)
+    retrieval_stats.record(len(hits), prompt_tokens, llm_ms)
     
     # 응답 저장
-    session.add_message("assistant", answer, hits)
+    session.add_message("assistant", answer, sources)
     
     return {
         "answer": answer,
-        "sources": hits,
+        "sources": sources,
         "session_id": session_id
     }
 
 # === 증분 인덱싱 함수들 ===
+def replace_chunks(current: IndexState, metas: List[Dict], stale: List[int],
+                   new_embeddings: Optional[np.ndarray] = None,
+                   new_metas: List[Dict] = (), new_texts: List[str] = ()) -> IndexState:
+    """stale 위치를 빼고 새 청크를 뒤에 붙인 IndexState를 새로 만든다 (남은 항목의 순서는 유지)
+
+    metas는 current.metas와 위치가 같은 목록(이름 변경을 반영한 사본일 수 있음)이다.
+    current의 인덱스는 건드리지 않고 사본을 고치므로, 그동안 진행 중인 검색은 기존 state로 계속 응답한다.
+    """
+    index = current.index
+    texts = current.texts
+    if stale or new_embeddings is not None:
+        index = faiss.clone_index(index) if index is not None else faiss.IndexFlatIP(new_embeddings.shape[1])
+    if stale:
+        # IndexFlat의 remove_ids는 남은 벡터를 앞으로 당겨 순서를 유지하므로 metas/texts와 위치가 계속 맞는다
+        index.remove_ids(np.array(stale, dtype="int64"))
+        removed = set(stale)
+        metas = [meta for i, meta in enumerate(metas) if i not in removed]
+        texts = [text for i, text in enumerate(texts) if i not in removed]
+    if new_embeddings is not None:
+        index.add(new_embeddings)
+    return IndexState(index, list(metas) + list(new_metas), list(texts) + list(new_texts))
+
 async def add_documents_to_index(file_paths: List[Path]):
-    """새 문서들을 기존 인덱스에 추가"""
-    global index, metas, texts, emb_model
-    
+    """파일 목록을 인덱스와 동기화 (내용 해시 기준)
+
+    - 처음 보는 파일: 청크를 만들어 추가
+    - 내용이 바뀐 파일: 그 파일의 청크와 벡터만 교체
+    - 내용이 같은 파일(같은 해시로 다시 저장): 아무것도 하지 않음
+    - 없어진 파일(삭제, 다른 이름으로 이동): 청크와 벡터 제거
+      (같은 배치에서 같은 해시의 새 이름이 나타나면 다시 임베딩하지 않고 이름만 바꿈)
+    해시·청크 분할·임베딩은 스레드에서 실행해 그동안에도 서버는 기존 인덱스로 응답하고,
+    인덱스 변경은 index_update_lock으로 한 번에 하나씩만 한다.
+    새로 추가된 청크 수를 반환한다.
+    """
     if not emb_model:
         await load_resources()
     
-    # 기존 메타데이터에서 최대 uid 찾기
-    max_uid = max([meta["uid"] for meta in metas], default=-1)
+    async with index_update_lock:
+        return await _sync_documents(file_paths)
+
+async def _sync_documents(file_paths: List[Path]):
+    global state
+    
+    from ingest import iter_file_records, chunk_metadata, file_fingerprint
     
-    new_vectors = []
+    # index_update_lock 안에서는 state가 바뀌지 않는다 - 이름 변경은 metas 사본에 반영
+    current = state
+    metas = list(current.metas)
+    positions_by_source: Dict[str, List[int]] = {}
+    for i, meta in enumerate(metas):
+        positions_by_source.setdefault(meta["source"], []).append(i)
+    
+    # 1) 배치 안의 파일을 삭제 / 변경 / 변경 없음으로 분류
+    removed_sources = []
+    changed = []  # (경로, manifest 항목)
+    manifest_dirty = False
+    # 새 청크가 인덱스에 반영되기 전에는 manifest에 쓰지 않는다 (임베딩이 실패하면 다음 대조에서 다시 처리되도록)
+    new_fingerprints: Dict[str, Dict] = {}
+    for file_path in dict.fromkeys(file_paths):
+        existing = positions_by_source.get(file_path.name, [])
+        if not file_path.exists():
+            if existing:
+                print(f"🗑️ {file_path.name}: 파일 없음 - 기존 청크 {len(existing)}개 정리")
+                removed_sources.append(file_path.name)
+            elif manifest.pop(file_path.name, None) is not None:
+                manifest_dirty = True  # 청크 없이 기록만 남은 파일 (텍스트 추출 실패 등)
+            continue
+        try:
+            fingerprint = await asyncio.to_thread(file_fingerprint, file_path)
+        except OSError as e:
+            print(f"❌ {file_path.name} 읽기 오류: {e}")
+            continue
+        content_hash = fingerprint["content_hash"]
+        if existing and metas[existing[0]].get("content_hash") == content_hash:
+            print(f"⏭️ {file_path.name}: 내용 변경 없음 (해시 동일)")
+            manifest[file_path.name] = fingerprint  # 수정 시각만 바뀐 경우 다음 대조에서 다시 읽지 않도록
+            manifest_dirty = True
+            continue
+        changed.append((file_path, fingerprint))
+    
+    # 2) 이름만 바뀐 파일은 기존 청크의 출처만 갱신
+    removed_by_hash = {}
+    for source in removed_sources:
+        removed_by_hash.setdefault(metas[positions_by_source[source][0]].get("content_hash"), source)
+    renamed = 0
+    dropped_sources = []  # 이름이 바뀌어 manifest에서 뺄 옛 이름
+    for file_path, fingerprint in list(changed):
+        old_source = removed_by_hash.pop(fingerprint["content_hash"], None)
+        if old_source is None or positions_by_source.get(file_path.name):
+            continue
+        print(f"📦 {old_source} → {file_path.name}: 이름 변경 (재임베딩 없음)")
+        for i in positions_by_source[old_source]:
+            metas[i] = {**metas[i], "source": file_path.name, "path": str(file_path.resolve())}
+        removed_sources.remove(old_source)
+        new_fingerprints[file_path.name] = fingerprint
+        dropped_sources.append(old_source)
+        changed.remove((file_path, fingerprint))
+        renamed += 1
+    
+    # 3) 바뀐 파일의 새 청크 생성
+    max_uid = max([meta["uid"] for meta in metas], default=-1)
     new_metas = []
     new_texts = []
-    
-    from ingest import load_and_extract, chunk_text
-    
-    for file_path in file_paths:
+    replaced_sources = []
+    for file_path, fingerprint in changed:
         print(f"📄 처리 중: {file_path.name}")
-        
-        # 이미 인덱스된 문서인지 확인
-        if any(meta["source"] == file_path.name for meta in metas):
-            print(f"⚠️ {file_path.name}은 이미 인덱스됨. 건너뜀.")
-            continue
-        
         try:
-            text = load_and_extract(file_path)
-            if not text:
-                print(f"⚠️ {file_path.name}: 텍스트 추출 실패")
-                continue
-                
-            chunks = chunk_text(text)
-            print(f"📄 {file_path.name}: {len(chunks)}개 청크 생성")
-            
-            for i, chunk in enumerate(chunks):
-                max_uid += 1
-                meta = {
-                    "uid": max_uid,
-                    "source": file_path.name,
-                    "chunk_id": i,
-                    "path": str(file_path.resolve())
-                }
-                new_metas.append(meta)
-                new_texts.append(chunk)
+            # 대용량 텍스트도 파일 전체를 읽지 않고 청크 단위로 분할
+            records = await asyncio.to_thread(lambda: list(iter_file_records(file_path)))
         except Exception as e:
             print(f"❌ {file_path.name} 처리 중 오류: {e}")
             continue
+        if file_path.name in positions_by_source:
+            replaced_sources.append(file_path.name)
+        new_fingerprints[file_path.name] = fingerprint
+        if not records:
+            print(f"⚠️ {file_path.name}: 텍스트 추출 실패")
+            continue
+        print(f"📄 {file_path.name}: {len(records)}개 청크 생성")
+        for i, record in enumerate(records):
+            max_uid += 1
+            new_metas.append(chunk_metadata(max_uid, file_path, i, record, fingerprint["content_hash"]))
+            new_texts.append(record.text)
     
     if new_texts:
-        # 새 텍스트들 임베딩
+        # 새 텍스트들 임베딩 (인덱스를 바꾸기 전에 끝내서 실패해도 기존 인덱스가 유지되게 함)
         print(f"🔄 {len(new_texts)}개 청크 임베딩 생성 중...")
-        new_embeddings = emb_model.encode(new_texts, normalize_embeddings=True)
+        new_embeddings = await asyncio.to_thread(emb_model.encode, new_texts, normalize_embeddings=True)
         new_embeddings = np.array(new_embeddings).astype("float32")
-        
-        # 기존 인덱스에 추가
-        index.add(new_embeddings)
-        metas.extend(new_metas)
-        texts.extend(new_texts)
-        
-        # 인덱스 저장
-        save_index()
-        print(f"✅ {len(new_texts)}개 청크가 인덱스에 추가됨")
-        return len(new_texts)
-    else:
-        print("⚠️ 추가할 새로운 청크가 없습니다")
+    
+    # 4) 삭제·교체 대상 청크 제거 후 새 청크 추가
+    stale = [i for source in removed_sources + replaced_sources for i in positions_by_source[source]]
+    if not (stale or new_texts or renamed):
+        if manifest_dirty or changed:
+            manifest.update(new_fingerprints)  # 텍스트 추출에 실패한 새 파일 - 다시 읽지 않도록 기록만
+            INDEX_DIR.mkdir(exist_ok=True)
+            save_manifest(INDEX_DIR, manifest)
+        print("⚠️ 인덱스에 반영할 변경이 없습니다")
         return 0
+    state = await asyncio.to_thread(replace_chunks, current, metas, sorted(stale),
+                                    new_embeddings if new_texts else None, new_metas, new_texts)
+    for source in removed_sources + dropped_sources:
+        manifest.pop(source, None)
+    manifest.update(new_fingerprints)
+    
+    # 인덱스 저장
+    save_index()
+    print(f"✅ 인덱스 갱신: 청크 {len(new_texts)}개 추가, {len(stale)}개 제거, 이름 변경 {renamed}건")
+    return len(new_texts)
 
 def save_index():
     """인덱스와 메타데이터 저장"""
+    current = state
     INDEX_DIR.mkdir(exist_ok=True)
-    faiss.write_index(index, str(INDEX_DIR / "faiss.index"))
+    faiss.write_index(current.index, str(INDEX_DIR / "faiss.index"))
     with open(INDEX_DIR / "meta.json", "w", encoding="utf-8") as f:
-        json.dump({"metas": metas, "texts": texts}, f, ensure_ascii=False)
+        json.dump({"metas": current.metas, "texts": current.texts}, f, ensure_ascii=False)
+    save_manifest(INDEX_DIR, manifest)
 
 async def rebuild_full_index():
     """전체 인덱스 재구축"""
@@ -458,24 +681,18 @@ async def rebuild_full_index():
         return False
 
 def remove_document_from_index(filename: str):
-    """특정 문서를 인덱스에서 제거"""
-    global index, metas, texts
-    
+    """특정 문서의 청크와 벡터를 인덱스에서 제거"""
+    global state
+    current = state
     # 해당 문서의 인덱스들 찾기
-    indices_to_remove = []
-    for i, meta in enumerate(metas):
-        if meta["source"] == filename:
-            indices_to_remove.append(i)
+    indices_to_remove = [i for i, meta in enumerate(current.metas) if meta["source"] == filename]
     
     if not indices_to_remove:
         return False
     
-    # 역순으로 제거 (인덱스 변화 방지)
-    for i in reversed(indices_to_remove):
-        del metas[i]
-        del texts[i]
-    
-    # 전체 인덱스 재구축 필요 (FAISS는 개별 벡터 삭제 미지원)
+    state = replace_chunks(current, current.metas, indices_to_remove)
+    manifest.pop(filename, None)
+    save_index()
     return True
 
 # === 관리자 API 엔드포인트들 ===
@@ -512,6 +729,30 @@ async def upload_documents(
                 file_path.unlink()
         raise HTTPException(status_code=500, detail=f"업로드 처리 중 오류: {str(e)}")
 
+class IndexQueueReq(BaseModel):
+    paths: List[str]  # data 폴더 안의 파일 경로 또는 파일명
+
+@app.post("/admin/index-queue")
+async def index_queue_endpoint(req: IndexQueueReq, _: bool = Depends(verify_admin_password)):
+    """쓰기가 끝난 파일을 디바운스 없이 인덱싱 큐에 넣기 (FTP 서버의 업로드 완료 알림용)"""
+    data_dir = DATA_DIR.resolve()
+    paths, rejected = [], []
+    for raw in req.paths:
+        candidate = Path(raw)
+        if not candidate.is_absolute():
+            candidate = DATA_DIR / candidate
+        resolved = candidate.resolve()
+        if resolved.parent != data_dir:
+            rejected.append(raw)
+            continue
+        # 파일 워쳐가 넘기는 경로와 같은 형태로 맞춰 큐에서 하나로 합쳐지게 한다
+        paths.append(DATA_DIR / resolved.name)
+    
+    if paths and not enqueue_files(paths, complete=True):
+        # 워쳐가 꺼져 있으면 바로 증분 인덱싱
+        asyncio.create_task(add_documents_to_index(paths))
+    return {"queued": [p.name for p in paths], "rejected": rejected}
+
 @app.delete("/admin/documents/{filename}")
 async def delete_document(
     filename: str,
@@ -524,12 +765,11 @@ async def delete_document(
         if file_path.exists():
             file_path.unlink()
         
-        # 인덱스에서 제거
-        removed = remove_document_from_index(filename)
+        # 인덱스에서 제거 (인덱스 복사·저장은 스레드에서 - 그동안에도 다른 요청은 기존 state로 응답)
+        async with index_update_lock:
+            removed = await asyncio.to_thread(remove_document_from_index, filename)
         if removed:
-            # 전체 재구축 필요
-            await rebuild_full_index()
-            return {"message": f"문서 '{filename}'이 삭제되고 인덱스가 재구축되었습니다."}
+            return {"message": f"문서 '{filename}'이 삭제되고 인덱스에서 제거되었습니다."}
         else:
             return {"message": f"문서 '{filename}'을 찾을 수 없습니다."}
     
@@ -551,7 +791,7 @@ async def rebuild_index_endpoint(_: bool = Depends(verify_admin_password)):
 @app.post("/admin/clear-index")
 async def clear_index_endpoint(_: bool = Depends(verify_admin_password)):
     """인덱스 초기화"""
-    global index, metas, texts
+    global state
     
     try:
         # 데이터 파일들 삭제
@@ -567,9 +807,8 @@ async def clear_index_endpoint(_: bool = Depends(verify_admin_password)):
                     file.unlink()
         
         # 메모리 상의 데이터 초기화
-        index = None
-        metas = []
-        texts = []
+        state = IndexState()
+        manifest.clear()
         
         return {"message": "모든 인덱스와 문서가 삭제되었습니다."}
     
@@ -581,6 +820,7 @@ async def get_watcher_status_endpoint(_: bool = Depends(verify_admin_password)):
     """파일 워쳐 상태 확인"""
     try:
         status = get_watcher_status()
+        status["reconcile"] = reconcile_status
         return status
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"상태 확인 중 오류: {str(e)}")
@@ -609,6 +849,18 @@ async def stop_watcher_endpoint(_: bool = Depends(verify_admin_password)):
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"워쳐 중지 중 오류: {str(e)}")
 
+@app.post("/admin/reload-keywords")
+async def reload_keywords_endpoint(_: bool = Depends(verify_admin_password)):
+    """키워드 확장 표(keyword_expansion.json)를 재시작 없이 다시 로드"""
+    if not expander.reload():
+        raise HTTPException(status_code=500, detail="키워드 확장 표를 다시 읽지 못했습니다.")
+    return {"message": "키워드 확장 표를 다시 로드했습니다.", "keywords": len(expander.table)}
+
+@app.get("/admin/retrieval-stats")
+async def retrieval_stats_endpoint(_: bool = Depends(verify_admin_password)):
+    """요청별 검색 개수(k)와 프롬프트 토큰, LLM 지연 시간 통계"""
+    return {"mode": RETRIEVAL_MODE, **retrieval_stats.summary(), "structured_answer": structured_stats.summary()}
+
 if __name__ == "__main__":
     import uvicorn
     port = int(os.environ.get("PORT", 8003))
@@ -1,19 +1,27 @@
 # app_serverless.py - Netlify Functions 최적화 버전
-import os, json, asyncio
+# 콜드 스타트를 줄이기 위해 faiss / 임베딩 백엔드(torch 또는 onnxruntime) / openai는 처음 필요할 때 import하고,
+# 빌드 시점 번들(bundle/, serverless_bundle.py build)이 있으면 인덱스·청크·모델을 그곳에서 로드한다.
+import os, json, asyncio, time
+_import_start = time.perf_counter()
+import threading
 from pathlib import Path
-import faiss
 import numpy as np
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Depends
 from fastapi.staticfiles import StaticFiles
 from fastapi.responses import FileResponse
 from pydantic import BaseModel
-from sentence_transformers import SentenceTransformer
 from dotenv import load_dotenv
-from openai import OpenAI
 import uuid
 from datetime import datetime
 from typing import List, Dict, Optional
 from contextlib import asynccontextmanager
+from query_expansion import expander, expand_query
+from retrieval import search_candidates, mmr_select, adaptive_cutoff, RetrievalStats, SourceFilterIndex
+from serverless_bundle import ColdStartProfiler, BUNDLE_DIR, load_manifest as load_bundle_manifest, load_chunks
+from embedding_backend import EMBED_BACKEND, ONNX_MODEL_DIR, load_embedder
+
+cold_start = ColdStartProfiler(_import_start)  # import부터 첫 검색까지 단계별 시간
+cold_start.mark("import")
 
 # 서버리스 환경 감지
 IS_SERVERLESS = os.environ.get('AWS_LAMBDA_FUNCTION_NAME') or os.environ.get('NETLIFY')
@@ -51,19 +59,58 @@ async def lifespan(app: FastAPI):
     print("👋 서버 종료.")
 
 async def load_resources():
-    """AI 모델 및 인덱스 파일을 로드하는 함수"""
-    global index, metas, texts, emb_model
+    """AI 모델 및 인덱스 파일을 로드하는 함수 (LAZY_MODEL이면 모델은 첫 검색 때 로드)"""
+    global index, metas, texts, source_filter, bundle_manifest
     try:
-        index = faiss.read_index(str(INDEX_DIR / "faiss.index"))
-        with open(INDEX_DIR / "meta.json", "r", encoding="utf-8") as f:
-            store = json.load(f)
-        metas = store["metas"]
-        texts = store["texts"]
-        emb_model = SentenceTransformer(EMB_MODEL_NAME)
-        print("✅ 인덱스와 모델 로드 완료!")
+        with cold_start.phase("import_faiss"):
+            import faiss
+        bundle_manifest = load_bundle_manifest(BUNDLE_DIR)
+        with cold_start.phase("load_index"):
+            if bundle_manifest:
+                # 빌드 시점 번들: 본문은 mmap으로 열어 두고 필요한 청크만 디코딩
+                index = faiss.read_index(str(BUNDLE_DIR / "faiss.index"))
+                metas, texts = load_chunks(BUNDLE_DIR)
+            else:
+                index = faiss.read_index(str(INDEX_DIR / "faiss.index"))
+                with open(INDEX_DIR / "meta.json", "r", encoding="utf-8") as f:
+                    store = json.load(f)
+                metas = store["metas"]
+                texts = store["texts"]
+            source_filter = SourceFilterIndex(metas)
+        print(f"✅ 인덱스 로드 완료! ({'번들' if bundle_manifest else 'index/'}, 청크 {len(metas)}개)")
+        if not LAZY_MODEL:
+            get_emb_model()
     except Exception as e:
         print(f"❌ 인덱스/모델 로드 실패: {e}")
 
+def load_embedding_model():
+    """임베딩 모델 생성 (번들에 내보낸 모델이 있으면 허브 접속 없이 로드, EMBED_BACKEND=onnx면 torch 없이 실행)"""
+    with cold_start.phase("load_model"):
+        if EMBED_BACKEND == "onnx":
+            bundled = BUNDLE_DIR / "onnx"
+            return load_embedder("onnx", onnx_dir=bundled if bundled.exists() else ONNX_MODEL_DIR)
+        bundled = BUNDLE_DIR / "model"
+        return load_embedder(EMBED_BACKEND, str(bundled) if bundled.exists() else EMB_MODEL_NAME, device="cpu")
+
+def get_emb_model():
+    """임베딩 모델 (처음 호출될 때 한 번만 로드)"""
+    global emb_model
+    if emb_model is None:
+        with _model_lock:
+            if emb_model is None:
+                emb_model = load_embedding_model()
+                print("✅ 임베딩 모델 로드 완료!")
+    return emb_model
+
+def get_client():
+    """OpenAI 클라이언트 (처음 호출될 때 import/생성, 키가 없으면 None)"""
+    global client
+    if client is None and OPENAI_API_KEY and OPENAI_API_KEY != "YOUR_API_KEY_HERE":
+        with cold_start.phase("import_openai"):
+            from openai import OpenAI
+            client = OpenAI(api_key=OPENAI_API_KEY)
+    return client
+
 # .env 파일 로드
 load_dotenv()
 
@@ -72,9 +119,7 @@ OPENAI_API_KEY = os.environ.get('OPENAI_API_KEY')
 
 if not OPENAI_API_KEY or OPENAI_API_KEY == "YOUR_API_KEY_HERE":
     print("⚠️ OPENAI_API_KEY가 설정되지 않았습니다.")
-    client = None
-else:
-    client = OpenAI(api_key=OPENAI_API_KEY)
+client = None  # get_client()가 처음 질문할 때 생성
 
 INDEX_DIR = Path("index")
 DATA_DIR = Path("data")
@@ -82,24 +127,35 @@ EMB_MODEL_NAME = "jhgan/ko-sroberta-multitask"
 TOP_K = 10
 SIMILARITY_THRESHOLD = 0.1
 
-# 키워드 확장 맵
-KEYWORD_EXPANSION = {
-    "다자녀가정": ["다자녀", "셋째아이", "3자녀", "3명 이상", "많은 자녀"], 
-    "다자녀": ["다자녀가정", "셋째아이", "3자녀", "3명 이상"],
-    "혜택": ["지원", "보조", "급여", "수당", "할인", "감면", "우대"], 
-    "지원": ["혜택", "보조", "급여", "수당", "지원금"],
-    "임신": ["임산부", "예비맘", "산모", "임신부"], 
-    "출산": ["분만", "해산", "신생아", "산후조리"],
-    "육아": ["양육", "자녀돌봄", "보육", "육아휴직"], 
-    "보육": ["어린이집", "유치원", "놀이방", "육아", "양육"],
-    "한부모": ["한부모가정", "미혼모", "편부모", "조손가정"]
-}
+# 임베딩 모델을 첫 검색 때 로드 (서버리스 기본값 - 헬스 체크·세션 생성 같은 요청은 모델 없이 응답)
+LAZY_MODEL = os.environ.get("LAZY_MODEL", "true" if IS_SERVERLESS else "false").lower() == "true"
+
+# MMR(Maximal Marginal Relevance) 다양화 설정
+MMR_ENABLED = os.environ.get("MMR_ENABLED", "false").lower() == "true"
+MMR_LAMBDA = float(os.environ.get("MMR_LAMBDA", 0.7))  # 1.0에 가까울수록 관련성 우선
+MMR_FETCH_MULTIPLIER = 4  # 후보를 k의 몇 배까지 가져올지
+MMR_MAX_PER_SOURCE = int(os.environ.get("MMR_MAX_PER_SOURCE", 3))  # 문서당 최대 청크 수
+MMR_MAX_WIDEN = 2  # 문서당 상한 때문에 후보가 k개보다 적을 때 후보 수를 두 배로 늘려 다시 검색하는 최대 횟수
+
+# 다중 질의 설정 (원본 + 동의어 그룹별 변형을 한 번에 배치 임베딩/검색 후 결과 병합)
+MULTI_QUERY_ENABLED = os.environ.get("MULTI_QUERY_ENABLED", "false").lower() == "true"
+MULTI_QUERY_MAX_VARIANTS = int(os.environ.get("MULTI_QUERY_MAX_VARIANTS", 4))
+
+# 적응형 top-k 설정 (fixed: 항상 TOP_K개, knee: 점수 급락 지점에서 자름, threshold: 보정된 절대 임계값)
+RETRIEVAL_MODE = os.environ.get("RETRIEVAL_MODE", "fixed")
+ADAPTIVE_MIN_K = int(os.environ.get("ADAPTIVE_MIN_K", 3))
+ADAPTIVE_SCORE_THRESHOLD = float(os.environ.get("ADAPTIVE_SCORE_THRESHOLD", 0.35))
+ADAPTIVE_MIN_GAP = float(os.environ.get("ADAPTIVE_MIN_GAP", 0.05))
 
 # === 인덱스 및 모델 변수 초기화 ===
 index = None
 metas = []
 texts = []
 emb_model = None
+_model_lock = threading.Lock()
+source_filter = None  # 출처/확장자 → 벡터 위치 역색인 (필터 검색용)
+bundle_manifest = None  # 번들에서 로드했으면 bundle/manifest.json 내용
+retrieval_stats = RetrievalStats()  # 요청별 선택된 k / 프롬프트 토큰 / LLM 지연 기록
 
 # FastAPI 앱 생성 시 lifespan 연결
 app = FastAPI(
@@ -160,50 +216,83 @@ sessions: Dict[str, ConversationSession] = {}
 class AskReq(BaseModel):
     question: str
     session_id: Optional[str] = None
+    diversify: Optional[bool] = None  # None이면 MMR_ENABLED 설정을 따름
+    multi_query: Optional[bool] = None  # None이면 MULTI_QUERY_ENABLED 설정을 따름
+    sources: Optional[List[str]] = None  # 검색 대상 파일명 (예: ["광양시_복지.txt"])
+    extensions: Optional[List[str]] = None  # 검색 대상 확장자 (예: [".xlsx"])
 
 class NewSessionResponse(BaseModel):
     session_id: str
     message: str
 
-def expand_query(query: str) -> str:
-    """질문을 확장하여 더 나은 검색 결과를 얻기"""
-    expanded_terms = []
-    query_lower = query.lower()
+def search_similar(query: str, k=TOP_K, diversify: Optional[bool] = None,
+                   sources: Optional[List[str]] = None, extensions: Optional[List[str]] = None,
+                   multi_query: Optional[bool] = None):
+    """유사한 문서를 검색합니다 (sources/extensions 지정 시 해당 문서 안에서만 검색)"""
+    if not index:
+        raise HTTPException(status_code=503, detail="모델/인덱스가 아직 로드되지 않았습니다. 잠시 후 다시 시도해주세요.")
+    model = get_emb_model()
     
-    for keyword, synonyms in KEYWORD_EXPANSION.items():
-        if keyword in query_lower:
-            expanded_terms.extend(synonyms)
-        for synonym in synonyms:
-            if synonym in query_lower and keyword not in expanded_terms:
-                expanded_terms.append(keyword)
-                expanded_terms.extend([s for s in synonyms if s != synonym])
+    # 질문 확장: 다중 질의 모드는 변형 질문 목록, 기본은 동의어를 이어 붙인 단일 질문
+    use_multi = MULTI_QUERY_ENABLED if multi_query is None else multi_query
+    if use_multi:
+        query_variants = expander.variants(query, MULTI_QUERY_MAX_VARIANTS)
+    else:
+        query_variants = [expand_query(query)]
     
-    if expanded_terms:
-        unique_terms = list(set(expanded_terms))
-        return f"{query} {' '.join(unique_terms[:5])}"
-    return query
-
-def search_similar(query: str, k=TOP_K):
-    """유사한 문서를 검색합니다"""
-    if not index or not emb_model:
-        raise HTTPException(status_code=503, detail="모델/인덱스가 아직 로드되지 않았습니다. 잠시 후 다시 시도해주세요.")
+    # 메타데이터 필터는 ID 선택자로 index.search 내부에서 적용
+    search_params, candidate_count = source_filter.search_params(sources, extensions)
+    if candidate_count == 0:
+        return []
     
-    # 질문 확장
-    expanded_query = expand_query(query)
+    # MMR 사용 시 후보를 넉넉히 가져온 뒤 다양화
+    use_mmr = MMR_ENABLED if diversify is None else diversify
+    fetch_k = min(k * MMR_FETCH_MULTIPLIER if use_mmr else k, candidate_count)
     
-    # 임베딩 및 검색
-    q_emb = emb_model.encode([expanded_query], normalize_embeddings=True).astype("float32")
-    D, I = index.search(q_emb, k)
+    # 임베딩 및 검색 (변형 질문 전체를 한 번의 encode / index.search로 배치 처리)
+    q_emb = model.encode(query_variants, normalize_embeddings=True).astype("float32")
+    # 유사도 임계값 이상만 포함 (MMR 사용 시 문서당 상한 때문에 후보가 k개보다 적으면 후보를 넓혀 다시 검색)
+    hits = search_candidates(
+        index, q_emb, fetch_k, candidate_count, SIMILARITY_THRESHOLD, search_params,
+        metas=metas if use_mmr else None, k=k,
+        max_per_source=MMR_MAX_PER_SOURCE, max_widen=MMR_MAX_WIDEN,
+    )
+    
+    # 적응형 top-k: 점수 분포를 보고 실제로 사용할 개수를 결정
+    top_k = adaptive_cutoff(
+        [score for _, score in hits],
+        min_k=ADAPTIVE_MIN_K,
+        max_k=k,
+        mode=RETRIEVAL_MODE,
+        threshold=ADAPTIVE_SCORE_THRESHOLD,
+        min_gap=ADAPTIVE_MIN_GAP,
+    )
+    
+    if use_mmr and len(hits) > 1:
+        ids = np.array([i for i, _ in hits], dtype="int64")
+        order = mmr_select(
+            q_emb[0],
+            index.reconstruct_batch(ids),
+            top_k,
+            lambda_mult=MMR_LAMBDA,
+            rel_scores=np.array([score for _, score in hits], dtype="float32"),
+            sources=[metas[i]["source"] for i in ids],
+            max_per_source=MMR_MAX_PER_SOURCE,
+        )
+        hits = [hits[j] for j in order]
     
     results = []
-    for i, score in zip(I[0], D[0]):
-        if score >= SIMILARITY_THRESHOLD:  # 유사도 임계값 이상만 포함
-            results.append({
-                "text": texts[i],
-                "source": metas[i]["source"],
-                "chunk_id": metas[i]["chunk_id"],
-                "score": float(score)
-            })
+    for i, score in hits[:top_k]:
+        result = {
+            "text": texts[i],
+            "source": metas[i]["source"],
+            "chunk_id": metas[i]["chunk_id"],
+            "score": score
+        }
+        # 사업 단위로 인덱싱된 청크는 파싱된 필드를 함께 전달
+        if "program" in metas[i]:
+            result["program"] = metas[i]["program"]
+        results.append(result)
     
     return results
 
@@ -350,8 +439,13 @@ def ask(req: AskReq):
     session.add_message("user", req.question)
     
     # 유사한 문서 검색
-    hits = search_similar(req.question, k=TOP_K)
+    hits = search_similar(req.question, k=TOP_K, diversify=req.diversify,
+                          sources=req.sources, extensions=req.extensions,
+                          multi_query=req.multi_query)
     
+    prompt_tokens = None
+    llm_ms = None
+    client = get_client()
     if not client:
         answer = "⚠️ OpenAI API 키가 설정되지 않았습니다."
     else:
@@ -359,6 +453,7 @@ def ask(req: AskReq):
         user_prompt = build_prompt(req.question, hits, session.get_context())
         
         # OpenAI API 호출
+        llm_start = time.perf_counter()
         completion = client.chat.completions.create(
             model="gpt-4o-mini",
             temperature=0.1,
@@ -368,6 +463,12 @@ def ask(req: AskReq):
             ]
         )
         answer = completion.choices[0].message.content
+        llm_ms = (time.perf_counter() - llm_start) * 1000
+        if completion.usage:
+            prompt_tokens = completion.usage.prompt_tokens
+    
+    # 선택된 k와 프롬프트 비용 기록 (적응형 top-k 효과 측정용)
+    retrieval_stats.record(len(hits), prompt_tokens, llm_ms)
     
     # 응답 저장
     session.add_message("assistant", answer, hits)
@@ -396,9 +497,22 @@ def health_check():
         "environment": "serverless" if IS_SERVERLESS else "standard",
         "model_loaded": emb_model is not None,
         "index_loaded": index is not None,
-        "documents_count": len(metas) if metas else 0
+        "documents_count": len(metas) if metas else 0,
+        "bundle": bundle_manifest is not None,
+        "embed_backend": EMBED_BACKEND,
+        "cold_start_ms": cold_start.summary()["total_ms"]
     }
 
+@app.get("/admin/cold-start")
+def cold_start_endpoint(_: bool = Depends(verify_admin_password)):
+    """이 인스턴스의 콜드 스타트 단계별 소요 시간 (import, 인덱스 로드, 모델 로드 등)"""
+    return {"bundle": bundle_manifest, **cold_start.summary()}
+
+@app.get("/admin/retrieval-stats")
+def retrieval_stats_endpoint(_: bool = Depends(verify_admin_password)):
+    """요청별 검색 개수(k)와 프롬프트 토큰, LLM 지연 시간 통계"""
+    return {"mode": RETRIEVAL_MODE, **retrieval_stats.summary()}
+
 if __name__ == "__main__":
     import uvicorn
     port = int(os.environ.get("PORT", 8003))
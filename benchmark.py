@@ -0,0 +1,698 @@
+#!/usr/bin/env python3
+"""
+검색 파이프라인 성능 측정 스크립트
+합성 데이터로 각 최적화 단계의 지연 시간을 측정합니다.
+
+사용법:
+    python benchmark.py mmr
+    python benchmark.py filter
+    python benchmark.py multiquery   # 임베딩 모델 필요 (sentence-transformers)
+    python benchmark.py expansion
+    python benchmark.py keyword
+    python benchmark.py server       # standalone_chatbot 서버 부하 테스트 (index/simple_meta.json 사용)
+    python benchmark.py http         # standalone_chatbot 서버 전송 비용 비교
+    python benchmark.py sparse
+    python benchmark.py chunker      # 대용량 텍스트 파일 청크 분할: 전체 읽기 vs 스트리밍
+    python benchmark.py poll         # 폴링 파일 워쳐: 폴더 크기별 폴링 비용 (watchdog 스냅샷과 비교)
+    python benchmark.py quantize     # 임베딩 fp32 vs 동적 int8: 처리량, 지연 시간, 검색 top-k 일치율 (torch 필요)
+"""
+
+import time
+import argparse
+import numpy as np
+
+
+def timeit(func, repeat=20):
+    """함수를 repeat번 실행해 평균 실행 시간(ms)을 반환"""
+    func()  # 워밍업
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def make_clustered_corpus(n_docs=500, chunks_per_doc=40, dim=768, noise=0.35, seed=0):
+    """같은 문서의 청크끼리 비슷한 벡터를 갖는 합성 코퍼스 생성"""
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((n_docs, dim)).astype("float32")
+    vecs = np.repeat(centers, chunks_per_doc, axis=0)
+    vecs += noise * rng.standard_normal(vecs.shape).astype("float32")
+    vecs /= np.linalg.norm(vecs, axis=1, keepdims=True)
+    sources = [f"doc{d}.txt" for d in range(n_docs) for _ in range(chunks_per_doc)]
+    return vecs, sources
+
+
+def bench_mmr(args):
+    """MMR 다양화 단계의 추가 지연 시간 측정 (k=10/50/200)"""
+    import faiss
+    from retrieval import mmr_select
+
+    vecs, sources = make_clustered_corpus(args.docs, args.chunks_per_doc)
+    index = faiss.IndexFlatIP(vecs.shape[1])
+    index.add(vecs)
+    query = vecs[:1] + 0.05
+    query /= np.linalg.norm(query)
+
+    print(f"📊 코퍼스: {index.ntotal}개 벡터, 후보 배수: x{args.fetch_multiplier}")
+    print(f"{'k':>5} | {'기본 검색':>10} | {'MMR 포함':>10} | {'추가 지연':>10} | 출처 수(기본→MMR, 결과 수)")
+    for k in (10, 50, 200):
+        fetch_k = k * args.fetch_multiplier
+
+        def plain():
+            return index.search(query, k)
+
+        def with_mmr():
+            D, I = index.search(query, fetch_k)
+            ids = I[0][I[0] >= 0]
+            order = mmr_select(
+                query[0], index.reconstruct_batch(ids), k,
+                rel_scores=D[0][:len(ids)],
+                sources=[sources[i] for i in ids],
+                max_per_source=args.max_per_source,
+            )
+            return ids[order]
+
+        t_plain = timeit(plain, args.repeat)
+        t_mmr = timeit(with_mmr, args.repeat)
+        plain_sources = len({sources[i] for i in plain()[1][0]})
+        mmr_ids = with_mmr()
+        mmr_sources = len({sources[i] for i in mmr_ids})
+        print(f"{k:>5} | {t_plain:>8.2f}ms | {t_mmr:>8.2f}ms | {t_mmr - t_plain:>8.2f}ms | {plain_sources} → {mmr_sources} ({len(mmr_ids)}/{k}개)")
+
+
+def bench_filter(args):
+    """ID 선택자 필터 검색 vs 필터 없는 검색 vs 상위 k 후처리 필터 비교"""
+    import faiss
+    from retrieval import SourceFilterIndex
+
+    vecs, sources = make_clustered_corpus(args.docs, args.chunks_per_doc)
+    metas = [{"source": s} for s in sources]
+    index = faiss.IndexFlatIP(vecs.shape[1])
+    index.add(vecs)
+    source_filter = SourceFilterIndex(metas)
+    query = vecs[:1]
+    k = args.k
+
+    t_plain = timeit(lambda: index.search(query, k), args.repeat)
+    print(f"📊 코퍼스: {index.ntotal}개 벡터, k={k}")
+    print(f"필터 없음: {t_plain:.2f}ms")
+    print(f"{'선택 비율':>8} | {'ID 선택자':>10} | {'결과 수':>6} | {'후처리 필터 결과 수':>10}")
+    all_sources = sorted(set(sources))
+    for ratio in (0.01, 0.1, 0.5):
+        # 질의와 무관한 문서들을 골라 후처리 필터의 한계를 드러냄
+        chosen = all_sources[-max(1, int(len(all_sources) * ratio)):]
+        params, count = source_filter.search_params(sources=chosen)
+        t_sel = timeit(lambda: index.search(query, k, params=params), args.repeat)
+        _, I = index.search(query, k, params=params)
+        _, I_post = index.search(query, k)
+        chosen_set = set(chosen)
+        post_hits = sum(1 for i in I_post[0] if sources[i] in chosen_set)
+        print(f"{ratio:>7.0%} | {t_sel:>8.2f}ms | {int((I[0] >= 0).sum()):>6} | {post_hits:>10}")
+
+
+# 벤치마크용 샘플 질문
+SAMPLE_QUERIES = [
+    "다자녀가정 혜택이 뭐가 있나요?",
+    "임신 출산 지원금 알려줘",
+    "한부모 육아 지원 정책",
+    "보육 지원 받을 수 있나요",
+]
+
+
+def bench_multiquery(args):
+    """단일 확장 질의 vs 변형 질의 순차 처리 vs 배치 처리 지연 시간 비교"""
+    import faiss
+    from sentence_transformers import SentenceTransformer
+    from query_expansion import expander
+    from retrieval import fuse_max_scores
+
+    print(f"🤖 임베딩 모델 로딩: {args.model}")
+    model = SentenceTransformer(args.model)
+    dim = model.get_sentence_embedding_dimension()
+    vecs, _ = make_clustered_corpus(args.docs, args.chunks_per_doc, dim=dim)
+    index = faiss.IndexFlatIP(dim)
+    index.add(vecs)
+
+    def encode(batch):
+        return model.encode(batch, normalize_embeddings=True).astype("float32")
+
+    print(f"📊 코퍼스: {index.ntotal}개 벡터, k={args.k}")
+    print(f"{'질문':<24} | {'변형 수':>4} | {'단일 질의':>9} | {'순차 변형':>9} | {'배치 변형':>9}")
+    for query in SAMPLE_QUERIES:
+        variants = expander.variants(query, args.max_variants)
+
+        def single():
+            return index.search(encode([" ".join(variants)]), args.k)
+
+        def sequential():
+            results = [index.search(encode([v]), args.k) for v in variants]
+            return fuse_max_scores(np.vstack([d for d, _ in results]), np.vstack([i for _, i in results]))
+
+        def batched():
+            D, I = index.search(encode(variants), args.k)
+            return fuse_max_scores(D, I)
+
+        t_single = timeit(single, args.repeat)
+        t_seq = timeit(sequential, args.repeat)
+        t_batch = timeit(batched, args.repeat)
+        print(f"{query:<24} | {len(variants):>4} | {t_single:>7.1f}ms | {t_seq:>7.1f}ms | {t_batch:>7.1f}ms")
+
+
+def legacy_expanded_terms(query, table):
+    """기존 expand_query의 키워드×동의어 중첩 부분 문자열 스캔 (비교 기준)"""
+    expanded_terms = []
+    query_lower = query.lower()
+    for keyword, synonyms in table.items():
+        if keyword in query_lower:
+            expanded_terms.extend(synonyms)
+        for synonym in synonyms:
+            if synonym in query_lower and keyword not in expanded_terms:
+                expanded_terms.append(keyword)
+                expanded_terms.extend([s for s in synonyms if s != synonym])
+    return expanded_terms
+
+
+def bench_expansion(args):
+    """키워드 확장: 기존 중첩 스캔 vs Aho–Corasick 오토마톤 (현재 표와 확대 표)"""
+    from query_expansion import expander, KeywordExpander
+
+    queries = SAMPLE_QUERIES + [
+        "우리 집은 셋째아이가 태어났고 맞벌이라 어린이집 보육료와 육아휴직 급여, 주거 지원이 궁금해요",
+        "안녕하세요",
+    ]
+    base_table = expander.table
+    for scale in (1, 10, 50):
+        # 지자체별 용어가 추가된 상황을 흉내 내어 그룹 수를 늘린 표
+        table = dict(base_table)
+        for n in range(1, scale):
+            for keyword, synonyms in base_table.items():
+                table[f"{keyword}{n}"] = [f"{s}{n}" for s in synonyms]
+        engine = KeywordExpander(table_path=None, table=table)
+        compiled = engine._compiled
+        for query in queries:
+            assert set(legacy_expanded_terms(query, table)) == set(engine.expanded_terms(query)), query
+
+        patterns = sum(len(v) + 1 for v in table.values())
+        print(f"\n📊 동의어 그룹: {len(table)}개, 패턴: {patterns}개")
+        print(f"{'질문 길이':>8} | {'기존 스캔':>10} | {'오토마톤':>10} | {'캐시 적중':>10}")
+        for query in queries:
+            t_old = timeit(lambda: [legacy_expanded_terms(query, table) for _ in range(100)], args.repeat) / 100
+            t_new = timeit(lambda: [compiled.expanded_terms(query.lower()) for _ in range(100)], args.repeat) / 100
+            t_cached = timeit(lambda: [engine.expanded_terms(query) for _ in range(100)], args.repeat) / 100
+            print(f"{len(query):>8} | {t_old * 1000:>8.1f}µs | {t_new * 1000:>8.1f}µs | {t_cached * 1000:>8.1f}µs")
+
+
+def make_text_corpus(n_chunks, chunk_len=1000, seed=0):
+    """복지 용어와 일반 어휘를 섞은 합성 텍스트 청크 생성"""
+    import random
+    from query_expansion import expander
+
+    rng = random.Random(seed)
+    welfare_terms = [t for k, v in expander.table.items() for t in [k] + v]
+    filler = [
+        "사업", "대상", "내용", "방법", "문의", "신청", "주민센터", "시청", "읍면동",
+        "가구", "소득", "기준", "월", "만원", "이내", "연간", "해당", "경우", "및", "등",
+    ]
+    syllables = [chr(0xAC00 + rng.randrange(11172)) for _ in range(800)]
+    filler += ["".join(rng.choice(syllables) for _ in range(rng.randint(2, 4))) for _ in range(3000)]
+    chunks = []
+    for _ in range(n_chunks):
+        words = []
+        length = 0
+        while length < chunk_len:
+            word = rng.choice(welfare_terms) if rng.random() < 0.05 else rng.choice(filler)
+            words.append(word)
+            length += len(word) + 1
+        chunks.append(" ".join(words)[:chunk_len])
+    return chunks
+
+
+def legacy_keyword_search(texts, keywords, top_k=5):
+    """기존 standalone_chatbot.search_documents의 전체 스캔 (비교 기준)"""
+    scores = []
+    for i, text in enumerate(texts):
+        score = 0
+        text_lower = text.lower()
+        for keyword in keywords:
+            if keyword in text_lower:
+                score += text_lower.count(keyword)
+        if score > 0:
+            scores.append((i, score))
+    scores.sort(key=lambda x: x[1], reverse=True)
+    return scores[:top_k]
+
+
+def bench_keyword(args):
+    """키워드 검색: 전체 스캔 vs n-gram 역색인 (청크 수별)"""
+    from query_expansion import expander
+    from keyword_index import NgramIndex
+
+    queries = [expander.expand(q).lower().split() for q in SAMPLE_QUERIES]
+    print(f"{'청크 수':>8} | {'색인 구축':>9} | {'n-gram 수':>9} | {'전체 스캔':>10} | {'역색인':>10} | {'역색인(캐시)':>11}")
+    for size in args.sizes:
+        texts = make_text_corpus(size)
+        start = time.perf_counter()
+        index = NgramIndex(texts)
+        build_s = time.perf_counter() - start
+
+        for keywords in queries:
+            assert legacy_keyword_search(texts, keywords) == index.search(keywords), keywords
+
+        repeat = max(1, args.repeat * 1000 // size)
+        t_scan = timeit(lambda: [legacy_keyword_search(texts, kw) for kw in queries], repeat) / len(queries)
+
+        def indexed_cold():
+            index._term_counts.clear()
+            return [index.search(kw) for kw in queries]
+
+        t_index = timeit(indexed_cold, repeat) / len(queries)
+        t_cached = timeit(lambda: [index.search(kw) for kw in queries], repeat) / len(queries)
+        print(f"{size:>8} | {build_s:>8.2f}s | {len(index.postings):>9} | {t_scan:>8.2f}ms | {t_index:>8.2f}ms | {t_cached:>9.3f}ms")
+
+
+def bench_server(args):
+    """standalone 서버 동시 접속 부하 테스트 (단일 스레드 vs 멀티스레드, 세션 분리 확인)"""
+    import json
+    import socket
+    import threading
+    import http.cookiejar
+    import urllib.request
+    import contextlib
+    import io
+    with contextlib.redirect_stdout(io.StringIO()):
+        import standalone_chatbot as sc
+
+    sc.RequestHandler.log_message = lambda *a: None  # 요청 로그 출력 끄기
+    topics = [("다자녀", "다자녀 지원 정책"), ("한부모", "한부모 지원 정책"),
+              ("임신출산", "임산부 지원 정책"), ("보육", "보육 지원 정책")]
+
+    def slow_client(port, seconds):
+        """본문을 늦게 보내는 클라이언트 (단일 스레드 서버는 이 요청이 끝날 때까지 멈춤)"""
+        body = json.dumps({"question": "다자녀 지원"}).encode("utf-8")
+        with socket.create_connection(("127.0.0.1", port)) as sock:
+            sock.sendall(b"POST /ask HTTP/1.1\r\nHost: 127.0.0.1\r\nContent-Type: application/json\r\n"
+                         + f"Content-Length: {len(body)}\r\n\r\n".encode())
+            time.sleep(seconds)
+            sock.sendall(body)
+            sock.recv(65536)
+
+    def client(port, i, latencies, errors):
+        """쿠키를 유지하며 주제 질문과 '더 있어?'를 번갈아 보내고 자기 주제가 돌아오는지 확인"""
+        topic, question = topics[i % len(topics)]
+        opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()))
+        for r in range(args.requests):
+            q = question if r % 2 == 0 else "다른거 더 있어?"
+            req = urllib.request.Request(f"http://127.0.0.1:{port}/ask", json.dumps({"question": q}).encode("utf-8"),
+                                         {"Content-Type": "application/json"})
+            start = time.perf_counter()
+            with opener.open(req, timeout=60) as resp:
+                result = json.loads(resp.read().decode("utf-8"))
+            latencies.append((time.perf_counter() - start) * 1000)
+            if result["conversation_length"] != min(2 * (r + 1), 10):
+                errors.append(f"client {i}: conversation_length {result['conversation_length']}")
+            if r % 2 == 1 and f"{topic} 관련 추가" not in result["answer"]:
+                errors.append(f"client {i}: 다른 사용자의 주제가 섞임")
+
+    print(f"클라이언트 {args.clients}명 x 요청 {args.requests}건, 느린 클라이언트 {args.slow_seconds}s")
+    print(f"{'모드':>8} | {'처리량':>10} | {'p50':>8} | {'p95':>8} | {'최대':>8} | {'세션 수':>7} | {'오류':>4}")
+    for threaded in (False, True):
+        sc.sessions = sc.SessionStore(max_sessions=args.max_sessions)
+        server = sc.make_server("127.0.0.1", 0, threaded)
+        port = server.server_address[1]
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+
+        slow = threading.Thread(target=slow_client, args=(port, args.slow_seconds), daemon=True)
+        slow.start()
+        time.sleep(0.1)
+
+        latencies, errors = [], []
+        workers = [threading.Thread(target=client, args=(port, i, latencies, errors)) for i in range(args.clients)]
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):  # 서버의 검색 로그 출력 숨김
+            for w in workers:
+                w.start()
+            for w in workers:
+                w.join()
+            elapsed = time.perf_counter() - start
+            slow.join()
+        server.shutdown()
+        server.server_close()
+
+        lat = np.sort(np.array(latencies))
+        mode = "멀티스레드" if threaded else "단일"
+        print(f"{mode:>8} | {len(lat) / elapsed:>6.0f}건/s | {np.percentile(lat, 50):>6.1f}ms | "
+              f"{np.percentile(lat, 95):>6.1f}ms | {lat[-1]:>6.1f}ms | {len(sc.sessions):>7} | {len(errors):>4}")
+        for error in errors[:5]:
+            print(f"   ⚠️ {error}")
+
+
+def bench_http(args):
+    """standalone 서버 전송 비용: 요청마다 새 연결·비압축·원문 포함 vs 지속 연결·gzip·원문 제외"""
+    import json
+    import gzip
+    import threading
+    import contextlib
+    import io
+    import http.client
+    with contextlib.redirect_stdout(io.StringIO()):
+        import standalone_chatbot as sc
+
+    sc.RequestHandler.log_message = lambda *a: None
+    server = sc.make_server("127.0.0.1", 0, True)
+    port = server.server_address[1]
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    def run(keep_alive, encoding, include_texts):
+        total_bytes = 0
+        conn = None
+        start = time.perf_counter()
+        for i in range(args.requests):
+            if conn is None or not keep_alive:
+                conn = http.client.HTTPConnection("127.0.0.1", port)
+            body = json.dumps({"question": SAMPLE_QUERIES[i % len(SAMPLE_QUERIES)], "include_texts": include_texts})
+            conn.request("POST", "/ask", body, {"Content-Type": "application/json", "Accept-Encoding": encoding,
+                                                "Connection": "keep-alive" if keep_alive else "close"})
+            resp = conn.getresponse()
+            data = resp.read()
+            total_bytes += len(data)
+            if resp.getheader("Content-Encoding") == "gzip":
+                data = gzip.decompress(data)
+            json.loads(data)
+            if not keep_alive:
+                conn.close()
+        elapsed = time.perf_counter() - start
+        return elapsed / args.requests * 1000, total_bytes / args.requests
+
+    conn = http.client.HTTPConnection("127.0.0.1", port)
+    conn.request("GET", "/", headers={"Accept-Encoding": "gzip"})
+    resp = conn.getresponse()
+    page_gzip = len(resp.read())
+    etag = resp.getheader("ETag")
+    conn.request("GET", "/", headers={"If-None-Match": etag})
+    resp = conn.getresponse()
+    resp.read()
+    print(f"메인 페이지: 원본 {len(sc.INDEX_PAGE.body)}B → gzip {page_gzip}B, 재방문(ETag) {resp.status} 응답")
+
+    print(f"{'연결':>6} | {'인코딩':>8} | {'원문':>4} | {'요청당 시간':>10} | {'요청당 바이트':>11}")
+    with contextlib.redirect_stdout(io.StringIO()):  # 서버의 검색 로그 출력 숨김
+        rows = [(keep_alive, encoding, include_texts, run(keep_alive, encoding, include_texts))
+                for keep_alive, encoding, include_texts in [
+                    (False, "identity", True), (True, "identity", True),
+                    (True, "gzip", True), (True, "gzip", False)]]
+    for keep_alive, encoding, include_texts, (ms, size) in rows:
+        print(f"{'유지' if keep_alive else '매번':>6} | {encoding:>8} | {'포함' if include_texts else '제외':>4} | "
+              f"{ms:>8.2f}ms | {size:>10.0f}B")
+    server.shutdown()
+    server.server_close()
+
+
+def legacy_simple_search(texts, query, k=5):
+    """기존 simple_app.simple_search의 전체 스캔 + 전체 정렬 (비교 기준)"""
+    query_lower = query.lower()
+    results = []
+    for i, text in enumerate(texts):
+        text_lower = text.lower()
+        score = 0
+        for word in query_lower.split():
+            if word in text_lower:
+                score += text_lower.count(word)
+        if score > 0:
+            results.append((i, score))
+    results.sort(key=lambda x: x[1], reverse=True)
+    return results[:k]
+
+
+def bench_sparse(args):
+    """simple_app 검색: 전체 스캔 vs 희소 행렬 곱 + argpartition (청크 수별)"""
+    from sparse_index import SparseSearchIndex
+
+    print(f"{'청크 수':>8} | {'행렬 구축':>9} | {'용어 수':>7} | {'nnz':>10} | {'전체 스캔':>10} | {'희소 행렬':>10}")
+    for size in args.sizes:
+        texts = make_text_corpus(size)
+        start = time.perf_counter()
+        index = SparseSearchIndex(texts, scoring=args.scoring)
+        build_s = time.perf_counter() - start
+
+        # 상위 k 선택이 전체 정렬(점수 내림차순, 동점은 앞 번호)과 같은지 확인
+        for query in SAMPLE_QUERIES:
+            dense = (index.query_vector(query) @ index.term_doc).toarray().ravel()
+            expected = [i for i in np.lexsort((np.arange(len(dense)), -dense)) if dense[i] > 0][:5]
+            assert index.search(query, 5)[0].tolist() == expected, query
+
+        repeat = max(1, args.repeat * 1000 // size)
+        t_scan = timeit(lambda: [legacy_simple_search(texts, q) for q in SAMPLE_QUERIES], repeat) / len(SAMPLE_QUERIES)
+        t_sparse = timeit(lambda: [index.search(q, 5) for q in SAMPLE_QUERIES], repeat * 10) / len(SAMPLE_QUERIES)
+        print(f"{size:>8} | {build_s:>8.2f}s | {len(index.vocab):>7} | {index.nnz:>10} | {t_scan:>8.2f}ms | {t_sparse:>8.3f}ms")
+
+
+def bench_chunker(args):
+    """대용량 상담 기록 로그 청크 분할: 파일 전체 읽기 + chunk_text vs 블록 단위 스트리밍 (시간, 최대 메모리)"""
+    import hashlib
+    import os
+    import tempfile
+    import tracemalloc
+    from pathlib import Path
+    from simple_ingest import chunk_text, load_and_extract, iter_file_chunks
+
+    # 빈 줄 연속, CRLF가 섞인 합성 로그 생성
+    lines = make_text_corpus(200, chunk_len=120)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "consultation_log.txt"
+        with open(path, "w", encoding="utf-8", newline="") as f:
+            written = 0
+            i = 0
+            while written < args.megabytes * 1024 * 1024:
+                line = f"[{i:08d}] {lines[i % len(lines)]}" + ("\r\n" if i % 7 else "\n\n\n\n")
+                f.write(line)
+                written += len(line.encode("utf-8"))
+                i += 1
+        print(f"📄 합성 로그: {os.path.getsize(path) / 1024 / 1024:.0f}MB")
+
+        def measure(produce):
+            digest = hashlib.sha1()
+            count = 0
+            tracemalloc.start()
+            start = time.perf_counter()
+            for chunk in produce():
+                digest.update(chunk.encode("utf-8"))
+                count += 1
+            elapsed = time.perf_counter() - start
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            return count, digest.hexdigest(), elapsed, peak
+
+        results = {
+            "전체 읽기": measure(lambda: chunk_text(load_and_extract(path))),
+            "스트리밍": measure(lambda: iter_file_chunks(path)),
+        }
+    print(f"{'방식':>8} | {'청크 수':>9} | {'시간':>8} | {'최대 메모리':>10}")
+    for name, (count, _, elapsed, peak) in results.items():
+        print(f"{name:>8} | {count:>9} | {elapsed:>7.2f}s | {peak / 1024 / 1024:>8.1f}MB")
+    digests = {digest for _, digest, _, _ in results.values()}
+    assert len(digests) == 1, "스트리밍 청크가 chunk_text 결과와 다릅니다"
+    print("✅ 두 방식의 청크가 동일합니다")
+
+
+def bench_poll(args):
+    """폴링 워쳐 한 주기(스냅샷 + 비교) 비용과 스냅샷 메모리: poll_watcher vs watchdog DirectorySnapshot"""
+    import os
+    import tempfile
+    import tracemalloc
+    from poll_watcher import take_snapshot, diff_snapshots, parse_ignore
+    try:
+        from watchdog.utils.dirsnapshot import DirectorySnapshot, DirectorySnapshotDiff
+    except ImportError:
+        DirectorySnapshot = None
+
+    is_ignored = parse_ignore()
+    print(f"{'파일 수':>8} | {'폴링(스냅샷)':>12} | {'메모리':>8} | {'watchdog':>10} | {'메모리':>8}")
+    for size in args.sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            # 폴더당 1천 개씩 하위 폴더에 나눠 생성
+            for i in range(size):
+                sub = os.path.join(tmp, f"dir{i // 1000:04d}")
+                if i % 1000 == 0:
+                    os.mkdir(sub)
+                open(os.path.join(sub, f"doc{i:06d}.txt"), "w").close()
+
+            def measure(take, compare):
+                tracemalloc.start()
+                old = take()
+                memory = tracemalloc.get_traced_memory()[0]
+                tracemalloc.stop()
+                elapsed = timeit(lambda: compare(old, take()), args.repeat)
+                return elapsed, memory
+
+            t_poll, m_poll = measure(lambda: take_snapshot(tmp, is_ignored, True),
+                                     lambda old, new: diff_snapshots(old, new))
+            assert not diff_snapshots(take_snapshot(tmp, is_ignored, True), take_snapshot(tmp, is_ignored, True))
+            if DirectorySnapshot is not None:
+                t_wd, m_wd = measure(lambda: DirectorySnapshot(tmp, recursive=True),
+                                     lambda old, new: DirectorySnapshotDiff(old, new))
+                wd = f"{t_wd:>8.1f}ms | {m_wd / 1024 / 1024:>6.1f}MB"
+            else:
+                wd = f"{'-':>10} | {'-':>8}"
+        print(f"{size:>8} | {t_poll:>10.1f}ms | {m_poll / 1024 / 1024:>6.1f}MB | {wd}")
+
+
+# 양자화 일치율 확인용 질의 (SAMPLE_QUERIES 포함)
+AGREEMENT_QUERIES = SAMPLE_QUERIES + [
+    "기초연금 수급 자격",
+    "청년 월세 지원 신청",
+    "장애인 활동지원 서비스",
+    "긴급복지 생계지원 금액",
+    "아동수당 지급 대상",
+    "노인 일자리 사업 참여 방법",
+    "저소득층 의료비 지원",
+    "국민기초생활보장 주거급여",
+    "산후조리 비용 지원",
+    "난임 부부 시술비 지원",
+    "에너지 바우처 신청 기간",
+    "첫만남이용권 사용처",
+]
+
+
+def bench_quantize(args):
+    """임베딩 인코딩: fp32 vs 동적 int8 양자화 - 처리량, 단건 지연 시간, 검색 top-k 일치율"""
+    import json
+    import faiss
+    from pathlib import Path
+    from embedding_backend import load_embedder
+
+    meta_path = Path("index/meta.json")
+    if meta_path.exists():
+        with open(meta_path, "r", encoding="utf-8") as f:
+            corpus = json.load(f)["texts"][:args.docs]
+        print(f"📄 코퍼스: index/meta.json 청크 {len(corpus)}개")
+    else:
+        corpus = make_text_corpus(args.docs, args.chunk_len)
+        print(f"📄 코퍼스: 합성 청크 {len(corpus)}개 ({args.chunk_len}자)")
+    queries = AGREEMENT_QUERIES
+
+    results = {}
+    for mode in ("none", "int8"):
+        start = time.perf_counter()
+        model = load_embedder("torch", args.model, quantize=mode, threads=args.threads)
+        load_s = time.perf_counter() - start
+
+        def encode(batch, batch_size=args.batch_size):
+            return model.encode(batch, batch_size=batch_size, normalize_embeddings=True).astype("float32")
+
+        encode(corpus[:args.batch_size])  # 워밍업
+        start = time.perf_counter()
+        doc_vecs = encode(corpus)
+        throughput = len(corpus) / (time.perf_counter() - start)
+        latencies = []
+        for _ in range(args.repeat):
+            for query in queries:
+                start = time.perf_counter()
+                encode([query], 1)
+                latencies.append((time.perf_counter() - start) * 1000)
+        results[mode] = (load_s, throughput, np.percentile(latencies, [50, 95]), doc_vecs, encode(queries))
+        del model
+
+    def top_k(doc_vecs, query_vecs):
+        index = faiss.IndexFlatIP(doc_vecs.shape[1])
+        index.add(doc_vecs)
+        return index.search(query_vecs, args.k)[1]
+
+    def overlap(a, b):
+        return np.mean([len(set(x) & set(y)) / args.k for x, y in zip(a, b)])
+
+    fp32_docs, fp32_queries = results["none"][3], results["none"][4]
+    reference = top_k(fp32_docs, fp32_queries)
+    int8_docs, int8_queries = results["int8"][3], results["int8"][4]
+    query_only = overlap(reference, top_k(fp32_docs, int8_queries))  # fp32 인덱스에 int8 질의
+    both = overlap(reference, top_k(int8_docs, int8_queries))        # int8로 다시 인덱싱
+    cosine = float((fp32_queries * int8_queries).sum(axis=1).mean())
+
+    print(f"🧵 스레드: {args.threads or '자동'}, 배치: {args.batch_size}, 질의 {len(queries)}개 × {args.repeat}회")
+    print(f"{'모드':>6} | {'로드':>6} | {'처리량':>12} | {'단건 p50':>9} | {'단건 p95':>9}")
+    for mode, (load_s, throughput, (p50, p95), _, _) in results.items():
+        name = "fp32" if mode == "none" else mode
+        print(f"{name:>6} | {load_s:>5.1f}s | {throughput:>7.1f}개/초 | {p50:>7.1f}ms | {p95:>7.1f}ms")
+    speedup = results["int8"][1] / results["none"][1]
+    print(f"⚡ int8 처리량 x{speedup:.2f}, 질의 임베딩 평균 코사인 {cosine:.4f}")
+    print(f"🎯 top-{args.k} 일치율: fp32 인덱스 + int8 질의 {query_only:.1%}, int8 인덱스 + int8 질의 {both:.1%}")
+
+
+def main():
+    """메인 함수"""
+    parser = argparse.ArgumentParser(description="검색 파이프라인 벤치마크")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("mmr", help="MMR 다양화 지연 시간")
+    p.add_argument("--docs", type=int, default=500, help="문서 수 (기본값: 500)")
+    p.add_argument("--chunks-per-doc", type=int, default=40, help="문서당 청크 수 (기본값: 40)")
+    p.add_argument("--fetch-multiplier", type=int, default=4, help="후보 배수 (기본값: 4)")
+    p.add_argument("--max-per-source", type=int, default=3, help="문서당 최대 청크 수 (기본값: 3)")
+    p.add_argument("--repeat", type=int, default=20, help="반복 횟수 (기본값: 20)")
+    p.set_defaults(func=bench_mmr)
+
+    p = sub.add_parser("filter", help="메타데이터 필터 검색 비용")
+    p.add_argument("--docs", type=int, default=500, help="문서 수 (기본값: 500)")
+    p.add_argument("--chunks-per-doc", type=int, default=40, help="문서당 청크 수 (기본값: 40)")
+    p.add_argument("--k", type=int, default=10, help="검색 개수 (기본값: 10)")
+    p.add_argument("--repeat", type=int, default=20, help="반복 횟수 (기본값: 20)")
+    p.set_defaults(func=bench_filter)
+
+    p = sub.add_parser("multiquery", help="다중 질의 배치 처리 지연 시간")
+    p.add_argument("--model", default="jhgan/ko-sroberta-multitask", help="임베딩 모델")
+    p.add_argument("--docs", type=int, default=500, help="문서 수 (기본값: 500)")
+    p.add_argument("--chunks-per-doc", type=int, default=40, help="문서당 청크 수 (기본값: 40)")
+    p.add_argument("--max-variants", type=int, default=4, help="최대 변형 질의 수 (기본값: 4)")
+    p.add_argument("--k", type=int, default=40, help="검색 개수 (기본값: 40)")
+    p.add_argument("--repeat", type=int, default=10, help="반복 횟수 (기본값: 10)")
+    p.set_defaults(func=bench_multiquery)
+
+    p = sub.add_parser("expansion", help="키워드 확장 엔진 비교")
+    p.add_argument("--repeat", type=int, default=20, help="반복 횟수 (기본값: 20)")
+    p.set_defaults(func=bench_expansion)
+
+    p = sub.add_parser("keyword", help="standalone 키워드 검색: 전체 스캔 vs 역색인")
+    p.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000], help="청크 수 목록")
+    p.add_argument("--repeat", type=int, default=5, help="1천 청크 기준 반복 횟수 (기본값: 5)")
+    p.set_defaults(func=bench_keyword)
+
+    p = sub.add_parser("server", help="standalone 서버 동시 접속 부하 테스트")
+    p.add_argument("--clients", type=int, default=20, help="동시 클라이언트 수 (기본값: 20)")
+    p.add_argument("--requests", type=int, default=10, help="클라이언트당 요청 수 (기본값: 10)")
+    p.add_argument("--slow-seconds", type=float, default=2.0, help="느린 클라이언트 지연 시간 (기본값: 2초)")
+    p.add_argument("--max-sessions", type=int, default=1000, help="세션 표 상한 (기본값: 1000)")
+    p.set_defaults(func=bench_server)
+
+    p = sub.add_parser("http", help="standalone 서버 전송 비용 (지속 연결, gzip, 원문 제외)")
+    p.add_argument("--requests", type=int, default=200, help="요청 수 (기본값: 200)")
+    p.set_defaults(func=bench_http)
+
+    p = sub.add_parser("sparse", help="simple_app 검색: 전체 스캔 vs 희소 행렬")
+    p.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000], help="청크 수 목록")
+    p.add_argument("--scoring", choices=["bm25", "tfidf"], default="bm25", help="가중치 방식 (기본값: bm25)")
+    p.add_argument("--repeat", type=int, default=5, help="1천 청크 기준 반복 횟수 (기본값: 5)")
+    p.set_defaults(func=bench_sparse)
+
+    p = sub.add_parser("chunker", help="대용량 텍스트 청크 분할: 전체 읽기 vs 스트리밍")
+    p.add_argument("--megabytes", type=int, default=100, help="합성 로그 크기 MB (기본값: 100)")
+    p.set_defaults(func=bench_chunker)
+
+    p = sub.add_parser("poll", help="폴링 파일 워쳐: 폴더 크기별 폴링 비용")
+    p.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000], help="파일 수 목록")
+    p.add_argument("--repeat", type=int, default=5, help="반복 횟수 (기본값: 5)")
+    p.set_defaults(func=bench_poll)
+
+    p = sub.add_parser("quantize", help="임베딩 fp32 vs 동적 int8: 처리량, 지연 시간, top-k 일치율")
+    p.add_argument("--model", default="jhgan/ko-sroberta-multitask", help="임베딩 모델")
+    p.add_argument("--docs", type=int, default=2000, help="인코딩할 청크 수 (기본값: 2000)")
+    p.add_argument("--chunk-len", type=int, default=300, help="합성 청크 길이 (기본값: 300자)")
+    p.add_argument("--batch-size", type=int, default=64, help="배치 크기 (기본값: 64)")
+    p.add_argument("--threads", type=int, default=0, help="intra-op 스레드 수 (기본값: 자동)")
+    p.add_argument("--k", type=int, default=10, help="일치율 계산용 top-k (기본값: 10)")
+    p.add_argument("--repeat", type=int, default=3, help="단건 지연 시간 반복 횟수 (기본값: 3)")
+    p.set_defaults(func=bench_quantize)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -48,6 +48,15 @@ print('✅ 기본 인덱스 파일이 생성되었습니다.')
 "
 fi
 
+# 서버리스 번들 (인덱스·청크 저장소·모델을 미리 내보내 콜드 스타트 단축)
+echo "📦 서버리스 번들 생성 중..."
+if [ "$EMBED_BACKEND" = "onnx" ]; then
+    # 질의 인코딩을 onnxruntime으로 실행 - torch 모델 대신 ONNX 모델만 포함
+    python serverless_bundle.py build --onnx --skip-model || echo "⚠️ 번들 생성 실패 - 실행 시 onnx_model/을 사용합니다"
+else
+    python serverless_bundle.py build || echo "⚠️ 번들 생성 실패 - 실행 시 index/와 허브 모델을 사용합니다"
+fi
+
 if [ -d "data" ]; then
     echo "✅ data 디렉토리 존재"
     ls -la data/
@@ -3,6 +3,7 @@
 
 import json
 from pathlib import Path
+from query_expansion import expander
 
 def load_documents():
     """문서 로드 테스트"""
@@ -46,31 +47,8 @@ def load_documents():
         return [], []
 
 def expand_query(query):
-    """쿼리 확장 테스트"""
-    KEYWORD_EXPANSION = {
-        "다자녀가정": ["다자녀", "셋째아이", "3자녀", "3명 이상", "많은 자녀", "자녀 3명", "세 자녀"],
-        "다자녀": ["다자녀가정", "셋째아이", "3자녀", "3명 이상", "많은 자녀"],
-        "혜택": ["지원", "보조", "급여", "수당", "할인", "감면", "우대", "바우처"],
-        "지원": ["혜택", "보조", "급여", "수당", "지원금", "보조금"],
-    }
-    
-    expanded_terms = []
-    query_lower = query.lower()
-    
-    for keyword, synonyms in KEYWORD_EXPANSION.items():
-        if keyword in query_lower:
-            expanded_terms.extend(synonyms)
-        for synonym in synonyms:
-            if synonym in query_lower and keyword not in expanded_terms:
-                expanded_terms.append(keyword)
-                expanded_terms.extend([s for s in synonyms if s != synonym])
-    
-    if expanded_terms:
-        unique_terms = list(set(expanded_terms))
-        expanded_query = f"{query} {' '.join(unique_terms[:5])}"
-        return expanded_query
-    
-    return query
+    """쿼리 확장 테스트 (공용 확장 모듈 사용)"""
+    return expander.expand(query)
 
 def search_documents(query, texts, metas, top_k=5):
     """문서 검색 테스트"""
@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+# embedding_backend.py - 임베딩 모델 백엔드 선택 (torch / onnx)
+#
+# 검색 시 질의 인코딩은 트랜스포머 forward 한 번이면 되므로, PyTorch + sentence-transformers 전체 대신
+# ONNX Runtime으로 내보낸 모델을 쓸 수 있다 (서버리스 패키지 크기와 import 시간 절약).
+#   torch - SentenceTransformer를 torch.inference_mode로 실행 (기본값)
+#           EMBED_QUANTIZE=int8이면 Linear 층을 동적 int8로 양자화 (CPU 서빙용)
+#   onnx  - export로 한 번 내보낸 model.onnx + tokenizer.json을 onnxruntime / tokenizers로 실행
+# 두 백엔드 모두 SentenceTransformer.encode와 같은 방식으로 호출한다
+# (풀링은 내보낼 때의 Pooling 설정(mean/cls)을 그대로 따르고, normalize_embeddings=True면 L2 정규화).
+#
+# 사용법:
+#   python embedding_backend.py export             # 모델 → onnx_model/ (torch 필요, 한 번만)
+#   python embedding_backend.py parity             # torch 백엔드와 코사인 유사도 비교 (기준: 0.999 초과)
+
+import inspect
+import json
+import os
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Union
+
+import numpy as np
+
+EMB_MODEL_NAME = "jhgan/ko-sroberta-multitask"
+EMBED_BACKEND = os.environ.get("EMBED_BACKEND", "torch").lower()  # torch / onnx
+ONNX_MODEL_DIR = Path(os.environ.get("ONNX_MODEL_DIR", "onnx_model"))
+EMBED_QUANTIZE = os.environ.get("EMBED_QUANTIZE", "none").lower()  # none / int8 (torch 백엔드)
+EMBED_THREADS = int(os.environ.get("EMBED_THREADS", 0))  # 인코딩 intra-op 스레드 수 (0이면 자동, torch/onnx 공통)
+
+BACKENDS = ("torch", "onnx")
+QUANTIZE_MODES = ("none", "int8")
+ONNX_CONFIG_NAME = "embedding_config.json"
+PARITY_THRESHOLD = 0.999
+
+# 패리티 확인용 문장 (짧은 질의, 긴 문서 청크, 최대 길이를 넘는 입력 포함)
+PARITY_SENTENCES = [
+    "출산 지원금 신청 방법",
+    "다자녀가정 지원 정책이 무엇인가요?",
+    "기초연금 수급 자격과 소득인정액 기준을 알려주세요",
+    "청년 월세 지원",
+    "장애인 활동지원 서비스는 어디에서 신청하나요? 필요한 서류도 알려주세요.",
+    "Emergency welfare support for low-income households",
+    "아동수당은 만 8세 미만 아동에게 매월 10만원을 지급합니다. " * 20,
+    "ㅋ",
+]
+
+
+class OnnxEmbedder:
+    """export_onnx로 내보낸 모델을 onnxruntime으로 실행 (torch 불필요)"""
+
+    def __init__(self, model_dir: Path = ONNX_MODEL_DIR, threads: int = EMBED_THREADS):
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        model_dir = Path(model_dir)
+        with open(model_dir / ONNX_CONFIG_NAME, "r", encoding="utf-8") as f:
+            self.config = json.load(f)
+        self.pooling = self.config["pooling"]
+        self.tokenizer = Tokenizer.from_file(str(model_dir / "tokenizer.json"))
+        self.tokenizer.enable_truncation(max_length=self.config["max_seq_length"])
+        self.tokenizer.enable_padding(pad_id=self.config["pad_token_id"], pad_token=self.config["pad_token"])
+
+        options = ort.SessionOptions()
+        if threads > 0:
+            options.intra_op_num_threads = threads
+        self.session = ort.InferenceSession(str(model_dir / "model.onnx"), options,
+                                            providers=["CPUExecutionProvider"])
+        self.input_names = [i.name for i in self.session.get_inputs()]
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.config["dim"]
+
+    def _encode_batch(self, sentences: List[str]) -> np.ndarray:
+        encodings = self.tokenizer.encode_batch(sentences)
+        mask = np.array([e.attention_mask for e in encodings], dtype="int64")
+        feed = {
+            "input_ids": np.array([e.ids for e in encodings], dtype="int64"),
+            "attention_mask": mask,
+            "token_type_ids": np.array([e.type_ids for e in encodings], dtype="int64"),
+        }
+        tokens = self.session.run(None, {name: feed[name] for name in self.input_names})[0]
+        if self.pooling == "cls":
+            return tokens[:, 0]
+        # mean pooling: sentence-transformers Pooling과 같이 패딩을 제외한 토큰 평균
+        weights = mask[:, :, None].astype(tokens.dtype)
+        return (tokens * weights).sum(axis=1) / np.maximum(weights.sum(axis=1), 1e-9)
+
+    def encode(self, sentences: Union[str, Sequence[str]], batch_size: int = 32, show_progress_bar: bool = None,
+               normalize_embeddings: bool = False, **kwargs) -> np.ndarray:
+        """SentenceTransformer.encode와 같은 결과 (numpy 배열만 지원)"""
+        single = isinstance(sentences, str)
+        if single:
+            sentences = [sentences]
+        sentences = list(sentences)
+        out = np.zeros((len(sentences), self.config["dim"]), dtype="float32")
+        # 길이가 비슷한 문장끼리 묶어 패딩을 줄인다 (sentence-transformers와 같은 방식)
+        order = np.argsort([-len(s) for s in sentences], kind="stable")
+        for start in range(0, len(sentences), batch_size):
+            idx = order[start:start + batch_size]
+            out[idx] = self._encode_batch([sentences[i] for i in idx])
+        if normalize_embeddings:
+            out /= np.maximum(np.linalg.norm(out, axis=1, keepdims=True), 1e-12)
+        return out[0] if single else out
+
+
+class TorchEmbedder:
+    """SentenceTransformer를 torch.inference_mode로 실행 (quantize="int8"이면 동적 int8 양자화)
+
+    동적 양자화는 Linear 층 가중치를 int8로 바꾸고 활성값은 배치마다 양자화하므로
+    보정 데이터 없이 CPU에서 바로 쓸 수 있다. 나머지 속성은 SentenceTransformer에 위임한다.
+    """
+
+    def __init__(self, model_name: str = EMB_MODEL_NAME, device: Optional[str] = None,
+                 quantize: str = "none", threads: int = EMBED_THREADS):
+        import torch
+        from sentence_transformers import SentenceTransformer
+
+        if threads > 0:
+            torch.set_num_threads(threads)
+        if quantize == "int8":
+            device = "cpu"  # 양자화된 Linear 층은 CPU 전용
+        model = SentenceTransformer(model_name, device=device).eval()
+        if quantize == "int8":
+            torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8, inplace=True)
+        self.model = model
+        self.quantize = quantize
+        self._torch = torch
+
+    def encode(self, sentences, **kwargs):
+        with self._torch.inference_mode():
+            return self.model.encode(sentences, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self.__dict__["model"], name)
+
+
+def load_embedder(backend: str = EMBED_BACKEND, model_name: str = EMB_MODEL_NAME,
+                  onnx_dir: Path = ONNX_MODEL_DIR, device: Optional[str] = None,
+                  quantize: str = EMBED_QUANTIZE, threads: int = EMBED_THREADS):
+    """설정된 백엔드의 임베딩 모델 (둘 다 .encode(texts, normalize_embeddings=...) 사용)"""
+    if quantize not in QUANTIZE_MODES:
+        raise ValueError(f"알 수 없는 EMBED_QUANTIZE: {quantize} (가능한 값: {', '.join(QUANTIZE_MODES)})")
+    if backend == "onnx":
+        if quantize != "none":
+            print("⚠️ EMBED_QUANTIZE는 torch 백엔드에만 적용됩니다 - onnx 모델은 그대로 실행합니다")
+        return OnnxEmbedder(onnx_dir, threads)
+    if backend == "torch":
+        return TorchEmbedder(model_name, device, quantize, threads)
+    raise ValueError(f"알 수 없는 EMBED_BACKEND: {backend} (가능한 값: {', '.join(BACKENDS)})")
+
+
+def export_onnx(model_name: str, out_dir: Path, opset: int = 14) -> Dict:
+    """SentenceTransformer의 트랜스포머 부분을 ONNX로, 토크나이저를 tokenizer.json으로 내보내기"""
+    import torch
+    from sentence_transformers import SentenceTransformer
+
+    st_model = SentenceTransformer(model_name, device="cpu")
+    transformer, pooling = st_model[0], st_model[1]
+    tokenizer = transformer.tokenizer
+    if not tokenizer.is_fast:
+        raise ValueError("fast 토크나이저(tokenizer.json)가 없는 모델은 내보낼 수 없습니다")
+    pooling_config = pooling.get_config_dict()
+    if pooling_config.get("pooling_mode_mean_tokens"):
+        pooling_mode = "mean"
+    elif pooling_config.get("pooling_mode_cls_token"):
+        pooling_mode = "cls"
+    else:
+        raise ValueError(f"지원하지 않는 풀링 방식: {pooling_config}")
+
+    sample = tokenizer(["출산 지원금 신청 방법", "청년 월세"], padding=True, return_tensors="pt")
+    input_names = [name for name in ("input_ids", "attention_mask", "token_type_ids") if name in sample]
+    hf_model = transformer.auto_model.eval()
+
+    class TokenEmbeddings(torch.nn.Module):
+        def __init__(self):
+            super().__init__()
+            self.model = hf_model
+
+        def forward(self, *inputs):
+            return self.model(**dict(zip(input_names, inputs)))[0]
+
+    out_dir.mkdir(parents=True, exist_ok=True)
+    axes = {0: "batch", 1: "sequence"}
+    options = {}
+    if "dynamo" in inspect.signature(torch.onnx.export).parameters:
+        options["dynamo"] = False  # 최신 torch의 기본 exporter는 onnxscript가 필요 - TorchScript 방식 사용
+    with torch.no_grad():
+        torch.onnx.export(TokenEmbeddings(), tuple(sample[name] for name in input_names), str(out_dir / "model.onnx"),
+                          input_names=input_names, output_names=["token_embeddings"],
+                          dynamic_axes={name: axes for name in input_names + ["token_embeddings"]},
+                          opset_version=opset, do_constant_folding=True, **options)
+    tokenizer.backend_tokenizer.save(str(out_dir / "tokenizer.json"))
+
+    config = {
+        "model": model_name,
+        "dim": st_model.get_sentence_embedding_dimension(),
+        "max_seq_length": st_model.max_seq_length,
+        "pooling": pooling_mode,
+        "pad_token": tokenizer.pad_token,
+        "pad_token_id": tokenizer.pad_token_id,
+        "opset": opset,
+    }
+    with open(out_dir / ONNX_CONFIG_NAME, "w", encoding="utf-8") as f:
+        json.dump(config, f, ensure_ascii=False, indent=2)
+    return config
+
+
+def check_parity(model_name: str, onnx_dir: Path, sentences: Sequence[str] = PARITY_SENTENCES) -> np.ndarray:
+    """문장별 torch 백엔드 대비 onnx 백엔드 임베딩의 코사인 유사도"""
+    reference = load_embedder("torch", model_name, quantize="none").encode(list(sentences), normalize_embeddings=True)
+    candidate = load_embedder("onnx", onnx_dir=onnx_dir).encode(list(sentences), normalize_embeddings=True)
+    return (reference * candidate).sum(axis=1)
+
+
+def main():
+    import argparse
+    import sys
+
+    parser = argparse.ArgumentParser(description="임베딩 모델 ONNX 내보내기 / 패리티 확인")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("export", help="모델 → ONNX (model.onnx, tokenizer.json, embedding_config.json)")
+    p.add_argument("--model", default=EMB_MODEL_NAME, help="임베딩 모델 이름 또는 경로")
+    p.add_argument("--out", default=str(ONNX_MODEL_DIR), help="출력 폴더 (기본값: onnx_model)")
+    p.add_argument("--opset", type=int, default=14)
+
+    p = sub.add_parser("parity", help="torch 백엔드와 임베딩 비교")
+    p.add_argument("--model", default=EMB_MODEL_NAME, help="임베딩 모델 이름 또는 경로")
+    p.add_argument("--onnx-dir", default=str(ONNX_MODEL_DIR))
+    p.add_argument("--threshold", type=float, default=PARITY_THRESHOLD)
+
+    args = parser.parse_args()
+    if args.command == "export":
+        config = export_onnx(args.model, Path(args.out), args.opset)
+        size = (Path(args.out) / "model.onnx").stat().st_size
+        print(f"✅ ONNX 내보내기 완료: {args.out} (차원 {config['dim']}, {config['pooling']} 풀링, {size / 1024 / 1024:.1f}MB)")
+    else:
+        cosines = check_parity(args.model, Path(args.onnx_dir))
+        for sentence, cos in zip(PARITY_SENTENCES, cosines):
+            print(f"  {cos:.6f}  {sentence[:40]}")
+        ok = cosines.min() > args.threshold
+        print(f"{'✅' if ok else '❌'} 최소 코사인 {cosines.min():.6f}, 평균 {cosines.mean():.6f} (기준: > {args.threshold})")
+        sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
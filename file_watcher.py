@@ -1,115 +1,310 @@
 # file_watcher.py
+import os
 import time
 import asyncio
+import concurrent.futures
+import queue
 from pathlib import Path
 from watchdog.observers import Observer
 from watchdog.events import FileSystemEventHandler
+from poll_watcher import PollingObserver, parse_ignore, WATCH_IGNORE
 import threading
-from typing import Set
+from typing import Dict, List, Optional, Tuple
 import logging
 
 # 로깅 설정
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# 디바운스/배치 설정
+WATCH_SETTLE_SECONDS = float(os.environ.get("WATCH_SETTLE_SECONDS", 2.0))  # 크기·수정 시각이 이 시간 동안 그대로면 쓰기 완료로 판단
+WATCH_TICK_SECONDS = float(os.environ.get("WATCH_TICK_SECONDS", 0.5))  # 대기 파일 확인 주기
+WATCH_MAX_DELAY = float(os.environ.get("WATCH_MAX_DELAY", 60.0))  # 계속 바뀌는 파일도 이 시간이 지나면 인덱싱
+WATCH_BATCH_SIZE = int(os.environ.get("WATCH_BATCH_SIZE", 32))  # 한 번에 인덱싱할 최대 파일 수
+SUPPORTED_EXTENSIONS = {'.txt', '.md', '.docx', '.xlsx', '.pdf'}
+
+# 감시 방식 (native: OS 파일 이벤트, polling: 주기적 scandir 비교 - SMB/NFS 공유 폴더용)
+WATCH_BACKEND = os.environ.get("WATCH_BACKEND", "native")
+
+
+def file_signature(path: Path) -> Optional[Tuple[int, int]]:
+    """(크기, 수정 시각 ns) - 파일이 없으면 None"""
+    try:
+        st = path.stat()
+    except OSError:
+        return None
+    return st.st_size, st.st_mtime_ns
+
+class PendingFile:
+    """디바운스 중인 파일 상태"""
+    __slots__ = ("first_seen", "last_event", "signature", "stable_since", "complete")
+
+    def __init__(self, now: float):
+        self.first_seen = now  # 첫 이벤트 시각 (인덱싱 지연 시간 기준)
+        self.last_event = now
+        self.signature = None
+        self.stable_since = now
+        self.complete = False  # 쓰기 완료가 확실한 파일 (FTP 전송 완료 등) - 디바운스 없이 바로 인덱싱
+
+class WatcherMetrics:
+    """큐 길이와 인덱싱 지연 시간 통계"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.events = 0
+        self.batches = 0
+        self.files_indexed = 0
+        self.errors = 0
+        self.last_latency = None  # 첫 이벤트 → 인덱싱 완료 (초)
+        self.max_latency = 0.0
+        self.total_latency = 0.0
+        self.last_batch_seconds = None  # 콜백 실행 시간 (초)
+
+    def count_event(self):
+        with self._lock:
+            self.events += 1
+
+    def record_batch(self, latencies: List[float], batch_seconds: float, ok: bool):
+        with self._lock:
+            self.batches += 1
+            self.last_batch_seconds = batch_seconds
+            if not ok:
+                self.errors += 1
+                return
+            self.files_indexed += len(latencies)
+            self.total_latency += sum(latencies)
+            self.max_latency = max([self.max_latency] + latencies)
+            self.last_latency = latencies[-1] if latencies else None
+
+    def summary(self) -> Dict:
+        with self._lock:
+            return {
+                "events": self.events,
+                "batches": self.batches,
+                "files_indexed": self.files_indexed,
+                "errors": self.errors,
+                "avg_latency_seconds": round(self.total_latency / self.files_indexed, 3) if self.files_indexed else None,
+                "max_latency_seconds": round(self.max_latency, 3),
+                "last_latency_seconds": round(self.last_latency, 3) if self.last_latency is not None else None,
+                "last_batch_seconds": round(self.last_batch_seconds, 3) if self.last_batch_seconds is not None else None,
+            }
+
+class IndexingPipeline:
+    """감지된 경로 → 스레드 안전 큐 → 디바운스 → 배치 → 인덱싱 콜백
+
+    watchdog 스레드는 submit()으로 경로만 큐에 넣고, 나머지는 전용 작업 스레드 하나가 처리한다.
+    콜백이 코루틴 함수이면 서버 이벤트 루프에서 run_coroutine_threadsafe로 실행하고 끝날 때까지 기다리므로
+    배치는 항상 하나씩 순서대로 인덱싱된다.
+    """
+
+    def __init__(self, callback_func, loop: Optional[asyncio.AbstractEventLoop] = None):
+        self.callback_func = callback_func
+        self.loop = loop
+        self.events: "queue.Queue[Optional[Tuple[Path, bool]]]" = queue.Queue()
+        self.pending: Dict[Path, PendingFile] = {}  # 작업 스레드만 접근
+        self.metrics = WatcherMetrics()
+        self.indexing = False
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="indexing-pipeline", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self.events.put(None)  # 대기 중인 get()을 깨움
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+
+    def submit(self, path: Path, complete: bool = False):
+        """파일 변경 알림 (어느 스레드에서든 호출 가능) - complete면 쓰기 완료 대기 없이 다음 배치에 포함"""
+        self.metrics.count_event()
+        self.events.put((path, complete))
+
+    def queue_depth(self) -> Dict:
+        return {
+            "queued_events": self.events.qsize(),
+            "pending_files": len(self.pending),
+            "indexing": self.indexing,
+        }
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._drain_events()
+            ready = self._collect_ready(time.monotonic())
+            for start in range(0, len(ready), WATCH_BATCH_SIZE):
+                if self._stop.is_set():
+                    return
+                self._process_batch(ready[start:start + WATCH_BATCH_SIZE])
+
+    def _drain_events(self):
+        """다음 확인 시각까지 이벤트를 받아 대기 목록에 합침 (같은 경로는 하나로)"""
+        try:
+            item = self.events.get(timeout=WATCH_TICK_SECONDS)
+        except queue.Empty:
+            return
+        while True:
+            if item is not None:
+                path, complete = item
+                now = time.monotonic()
+                pending = self.pending.get(path)
+                if pending is None:
+                    pending = self.pending[path] = PendingFile(now)
+                else:
+                    pending.last_event = now
+                pending.complete = pending.complete or complete
+            try:
+                item = self.events.get_nowait()
+            except queue.Empty:
+                return
+
+    def _collect_ready(self, now: float) -> List[Tuple[Path, PendingFile]]:
+        """크기·수정 시각(삭제된 파일은 없음 상태)이 WATCH_SETTLE_SECONDS 동안 그대로인 파일
+
+        삭제된 경로도 넘기므로 콜백은 존재하지 않는 경로를 인덱스에서 제거해야 한다.
+        """
+        ready = []
+        for path, pending in list(self.pending.items()):
+            signature = file_signature(path)
+            if signature != pending.signature:
+                pending.signature = signature
+                pending.stable_since = now
+            quiet_since = max(pending.stable_since, pending.last_event)
+            if (pending.complete or now - quiet_since >= WATCH_SETTLE_SECONDS
+                    or now - pending.first_seen >= WATCH_MAX_DELAY):
+                del self.pending[path]
+                ready.append((path, pending))
+        return ready
+
+    def _process_batch(self, batch: List[Tuple[Path, PendingFile]]):
+        paths = [path for path, _ in batch]
+        logger.info(f"🔄 {len(paths)}개 파일 자동 인덱싱 시작...")
+        self.indexing = True
+        start = time.monotonic()
+        ok = True
+        try:
+            self._call(paths)
+        except Exception as e:
+            ok = False
+            logger.error(f"❌ 자동 인덱싱 오류: {e}")
+        finally:
+            self.indexing = False
+        done = time.monotonic()
+        self.metrics.record_batch([done - pending.first_seen for _, pending in batch], done - start, ok)
+
+    def _call(self, paths: List[Path]):
+        """인덱싱 콜백 실행 (코루틴이면 서버 루프에서 실행하고 완료까지 대기)"""
+        if asyncio.iscoroutinefunction(self.callback_func):
+            if self.loop is None or self.loop.is_closed():
+                raise RuntimeError("인덱싱 콜백을 실행할 이벤트 루프가 없습니다")
+            future = asyncio.run_coroutine_threadsafe(self.callback_func(paths), self.loop)
+            while True:
+                try:
+                    return future.result(timeout=WATCH_TICK_SECONDS)
+                except concurrent.futures.TimeoutError:
+                    # 서버 루프에서 stop()을 호출해 기다리는 중이면 루프가 콜백을 실행할 수 없으므로 취소
+                    if self._stop.is_set():
+                        future.cancel()
+                        raise RuntimeError("워쳐 중지로 인덱싱 취소")
+        else:
+            self.callback_func(paths)
+
 class DocumentWatcher(FileSystemEventHandler):
-    """문서 폴더 감시 및 자동 인덱싱"""
-    
-    def __init__(self, data_dir: Path, callback_func):
+    """문서 폴더 감시 → 인덱싱 파이프라인에 경로 전달"""
+
+    def __init__(self, data_dir: Path, pipeline: IndexingPipeline):
         self.data_dir = data_dir
-        self.callback_func = callback_func
-        self.supported_extensions = {'.txt', '.md', '.docx', '.xlsx', '.pdf'}
-        self.pending_files: Set[Path] = set()
-        self.processing = False
-        
+        self.pipeline = pipeline
+        self.supported_extensions = SUPPORTED_EXTENSIONS
+        self.is_ignored = parse_ignore(WATCH_IGNORE)
+
+    def _ignored(self, file_path: Path) -> bool:
+        """data_dir 기준 경로의 파일/폴더 이름 중 하나라도 무시 패턴에 맞으면 True (임시·숨김 파일 등)"""
+        try:
+            parts = file_path.relative_to(self.data_dir).parts
+        except ValueError:
+            parts = (file_path.name,)
+        return any(self.is_ignored(part) for part in parts)
+
+    def _submit(self, path: str, message: str):
+        file_path = Path(path)
+        if file_path.suffix.lower() in self.supported_extensions and not self._ignored(file_path):
+            logger.info(f"{message}: {file_path.name}")
+            self.pipeline.submit(file_path)
+
     def on_created(self, event):
         """파일 생성 시 호출"""
         if not event.is_directory:
-            file_path = Path(event.src_path)
-            if file_path.suffix.lower() in self.supported_extensions:
-                logger.info(f"📁 새 파일 감지: {file_path.name}")
-                self.pending_files.add(file_path)
-                self._schedule_processing()
-    
+            self._submit(event.src_path, "📁 새 파일 감지")
+
     def on_modified(self, event):
         """파일 수정 시 호출"""
         if not event.is_directory:
-            file_path = Path(event.src_path)
-            if file_path.suffix.lower() in self.supported_extensions:
-                logger.info(f"📝 파일 수정 감지: {file_path.name}")
-                self.pending_files.add(file_path)
-                self._schedule_processing()
-    
+            self._submit(event.src_path, "📝 파일 수정 감지")
+
     def on_moved(self, event):
-        """파일 이동/이름변경 시 호출"""
+        """파일 이동/이름변경 시 호출 (이전 경로는 제거, 새 경로는 추가 대상)"""
         if not event.is_directory:
-            new_path = Path(event.dest_path)
-            if new_path.suffix.lower() in self.supported_extensions:
-                logger.info(f"📦 파일 이동 감지: {new_path.name}")
-                self.pending_files.add(new_path)
-                self._schedule_processing()
-    
-    def _schedule_processing(self):
-        """파일 처리 스케줄링 (중복 방지)"""
-        if not self.processing:
-            self.processing = True
-            # 3초 후 처리 (파일 쓰기 완료 대기)
-            threading.Timer(3.0, self._process_pending_files).start()
-    
-    def _process_pending_files(self):
-        """대기 중인 파일들 처리"""
-        if self.pending_files:
-            files_to_process = list(self.pending_files)
-            self.pending_files.clear()
-            
-            # 실제로 존재하는 파일들만 필터링
-            existing_files = [f for f in files_to_process if f.exists()]
-            
-            if existing_files:
-                logger.info(f"🔄 {len(existing_files)}개 파일 자동 인덱싱 시작...")
-                try:
-                    # 비동기 콜백 실행
-                    asyncio.create_task(self.callback_func(existing_files))
-                except Exception as e:
-                    logger.error(f"❌ 자동 인덱싱 오류: {e}")
-        
-        self.processing = False
+            self._submit(event.src_path, "📦 파일 이동 감지 (이전 이름)")
+            self._submit(event.dest_path, "📦 파일 이동 감지")
+
+    def on_deleted(self, event):
+        """파일 삭제 시 호출"""
+        if not event.is_directory:
+            self._submit(event.src_path, "🗑️ 파일 삭제 감지")
 
 class FileWatcherManager:
     """파일 워쳐 관리자"""
-    
-    def __init__(self, data_dir: Path):
+
+    def __init__(self, data_dir: Path, backend: str = WATCH_BACKEND):
         self.data_dir = data_dir
+        self.backend = backend
         self.observer = None
         self.watcher = None
+        self.pipeline = None
         self.callback_func = None
-        
-    def set_callback(self, callback_func):
-        """인덱싱 콜백 함수 설정"""
+        self.loop = None
+
+    def set_callback(self, callback_func, loop: Optional[asyncio.AbstractEventLoop] = None):
+        """인덱싱 콜백 함수 설정 (코루틴 함수면 loop에서 실행)"""
         self.callback_func = callback_func
-        
+        self.loop = loop
+
     def start_watching(self):
         """파일 감시 시작"""
         if self.observer is not None:
             logger.warning("⚠️ 파일 워쳐가 이미 실행 중입니다.")
             return
-            
+
         if not self.callback_func:
             logger.error("❌ 콜백 함수가 설정되지 않았습니다.")
             return
-            
+
+        # 서버 루프 안에서 시작하면 그 루프를 인덱싱 콜백 실행에 사용
+        if self.loop is None:
+            try:
+                self.loop = asyncio.get_running_loop()
+            except RuntimeError:
+                pass
+
         # 데이터 폴더 생성
         self.data_dir.mkdir(exist_ok=True)
-        
-        # 워쳐 및 관찰자 생성
-        self.watcher = DocumentWatcher(self.data_dir, self.callback_func)
-        self.observer = Observer()
+
+        # 인덱싱 파이프라인, 워쳐 및 관찰자 생성
+        self.pipeline = IndexingPipeline(self.callback_func, self.loop)
+        self.pipeline.start()
+        self.watcher = DocumentWatcher(self.data_dir, self.pipeline)
+        self.observer = PollingObserver() if self.backend == "polling" else Observer()
+        # 인덱스·manifest가 파일 이름(meta["source"])을 키로 쓰므로 data_dir 바로 아래 파일만 감시한다
         self.observer.schedule(self.watcher, str(self.data_dir), recursive=False)
-        
+
         # 감시 시작
         self.observer.start()
-        logger.info(f"👁️ 파일 워쳐 시작: {self.data_dir}")
-        
+        logger.info(f"👁️ 파일 워쳐 시작 ({self.backend}): {self.data_dir}")
+
     def stop_watching(self):
         """파일 감시 중지"""
         if self.observer:
@@ -117,8 +312,9 @@ class FileWatcherManager:
             self.observer.join()
             self.observer = None
             self.watcher = None
+            self.pipeline.stop()
             logger.info("🛑 파일 워쳐 중지")
-            
+
     def is_watching(self):
         """감시 상태 확인"""
         return self.observer is not None and self.observer.is_alive()
@@ -126,13 +322,13 @@ class FileWatcherManager:
 # 전역 파일 워쳐 인스턴스
 file_watcher_manager = None
 
-def init_file_watcher(data_dir: Path, callback_func):
+def init_file_watcher(data_dir: Path, callback_func, loop: Optional[asyncio.AbstractEventLoop] = None):
     """파일 워쳐 초기화"""
     global file_watcher_manager
-    
+
     file_watcher_manager = FileWatcherManager(data_dir)
-    file_watcher_manager.set_callback(callback_func)
-    
+    file_watcher_manager.set_callback(callback_func, loop)
+
     return file_watcher_manager
 
 def start_file_watcher():
@@ -149,12 +345,27 @@ def stop_file_watcher():
         return True
     return False
 
+def enqueue_files(paths: List[Path], complete: bool = False):
+    """경로들을 인덱싱 파이프라인에 넣기 (시작 시 대조 결과, FTP 업로드 완료 등) - 워쳐가 꺼져 있으면 False"""
+    if file_watcher_manager is None or file_watcher_manager.pipeline is None or not file_watcher_manager.is_watching():
+        return False
+    for path in paths:
+        file_watcher_manager.pipeline.submit(path, complete)
+    return True
+
 def get_watcher_status():
-    """워쳐 상태 반환"""
+    """워쳐 상태 반환 (큐 길이, 인덱싱 지연 시간 포함)"""
     if file_watcher_manager:
-        return {
+        status = {
             "active": file_watcher_manager.is_watching(),
-            "data_dir": str(file_watcher_manager.data_dir)
+            "data_dir": str(file_watcher_manager.data_dir),
+            "backend": file_watcher_manager.backend,
         }
+        if isinstance(file_watcher_manager.observer, PollingObserver):
+            status["polling"] = file_watcher_manager.observer.status()
+        pipeline = file_watcher_manager.pipeline
+        if pipeline is not None:
+            status["queue"] = pipeline.queue_depth()
+            status["metrics"] = pipeline.metrics.summary()
+        return status
     return {"active": False, "data_dir": None}
-
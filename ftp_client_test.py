@@ -2,11 +2,23 @@
 """
 FTP 클라이언트 테스트 스크립트
 FTP 서버에 연결하여 파일 업로드/다운로드를 테스트합니다.
+--bulk 옵션을 주면 여러 연결로 파일을 동시에 올려 처리량(MB/s, files/s)을 측정합니다.
+--interrupt-test 옵션은 업로드 도중 연결을 끊어 잘린 파일이 게시·인덱싱되지 않는지 확인합니다.
 """
 
 import ftplib
+import io
+import json
 import os
+import socket
+import struct
+import subprocess
+import sys
 import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 
 def test_ftp_connection(host="127.0.0.1", port=2121, username="admin", password="admin"):
@@ -85,6 +97,222 @@ def test_ftp_connection(host="127.0.0.1", port=2121, username="admin", password=
         print(f"✗ 예상치 못한 오류 발생: {e}")
         return False
 
+def _upload_worker(host, port, username, password, names, payload, latencies, errors, lock):
+    """연결 하나로 names의 파일을 차례로 업로드"""
+    try:
+        ftp = ftplib.FTP()
+        ftp.connect(host, port, timeout=30)
+        ftp.login(username, password)
+    except ftplib.all_errors as e:
+        with lock:
+            errors.append(f"로그인 실패: {e}")
+        return []
+    uploaded = []
+    try:
+        for name in names:
+            start = time.perf_counter()
+            try:
+                ftp.storbinary(f"STOR {name}", io.BytesIO(payload), blocksize=64 * 1024)
+            except ftplib.all_errors as e:
+                with lock:
+                    errors.append(f"{name}: {e}")
+                continue
+            with lock:
+                latencies.append(time.perf_counter() - start)
+            uploaded.append(name)
+        ftp.quit()
+    except ftplib.all_errors:
+        ftp.close()
+    return uploaded
+
+def bulk_upload_test(host="127.0.0.1", port=2121, username="admin", password="admin",
+                     files=200, size_kb=256, workers=8, extension=".bin", keep=False):
+    """
+    여러 FTP 연결로 파일을 동시에 업로드해 처리량을 측정합니다.
+    
+    Args:
+        files (int): 업로드할 파일 수
+        size_kb (int): 파일 하나의 크기 (KB)
+        workers (int): 동시 연결 수
+        extension (str): 파일 확장자 (.txt 등 인덱싱 대상 확장자를 주면 인덱싱 부하까지 포함)
+        keep (bool): 측정 후 업로드한 파일을 남길지 여부
+    
+    Returns:
+        dict: 측정 결과 (mb_per_sec, files_per_sec, p50/p95 파일당 지연, 오류 수)
+    """
+    run_id = uuid.uuid4().hex[:6]
+    payload = os.urandom(size_kb * 1024)
+    names = [f"bulk_{run_id}_{i:05d}{extension}" for i in range(files)]
+    shares = [names[i::workers] for i in range(workers)]
+    latencies, errors = [], []
+    lock = threading.Lock()
+    
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        results = list(pool.map(
+            lambda share: _upload_worker(host, port, username, password, share, payload, latencies, errors, lock),
+            shares))
+    elapsed = time.perf_counter() - start
+    uploaded = [name for share in results for name in share]
+    
+    if not keep and uploaded:
+        try:
+            ftp = ftplib.FTP()
+            ftp.connect(host, port)
+            ftp.login(username, password)
+            for name in uploaded:
+                ftp.delete(name)
+            ftp.quit()
+        except ftplib.all_errors as e:
+            print(f"⚠️ 업로드한 파일 정리 실패: {e}")
+    
+    latencies.sort()
+    def percentile(q):
+        return latencies[min(len(latencies) - 1, int(len(latencies) * q))] * 1000 if latencies else 0.0
+    total_mb = len(uploaded) * size_kb / 1024
+    return {
+        "files": len(uploaded),
+        "errors": len(errors),
+        "error_samples": errors[:3],
+        "seconds": elapsed,
+        "mb_per_sec": total_mb / elapsed if elapsed else 0.0,
+        "files_per_sec": len(uploaded) / elapsed if elapsed else 0.0,
+        "p50_ms": percentile(0.5),
+        "p95_ms": percentile(0.95),
+    }
+
+def start_local_server(mode, port, directory, workers, server_args=()):
+    """ftp_server.py를 하위 프로세스로 실행하고 접속 가능해질 때까지 대기"""
+    script = os.path.join(os.path.dirname(os.path.abspath(__file__)), "ftp_server.py")
+    process = subprocess.Popen(
+        [sys.executable, script, "--port", str(port), "--directory", directory, "--mode", mode,
+         "--max-cons-per-ip", str(workers * 2 + 2), *server_args],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.time() + 10
+    while time.time() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.5).close()
+            return process
+        except OSError:
+            if process.poll() is not None:
+                break
+            time.sleep(0.1)
+    process.kill()
+    raise RuntimeError(f"로컬 FTP 서버({mode})를 시작하지 못했습니다")
+
+def _start_notify_recorder():
+    """업로드 완료 알림(POST /admin/index-queue)을 받아 기록하는 로컬 HTTP 서버 - (서버, 받은 경로 목록)"""
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+    received = []
+
+    class Recorder(BaseHTTPRequestHandler):
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            paths = json.loads(body.decode("utf-8")).get("paths", [])
+            received.extend(paths)
+            reply = json.dumps({"queued": paths, "rejected": []}).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(reply)))
+            self.end_headers()
+            self.wfile.write(reply)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Recorder)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, received
+
+def _reset(sock):
+    """SO_LINGER 0으로 닫아 FIN 대신 RST를 보낸다 (클라이언트가 강제 종료된 것처럼)"""
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_LINGER, struct.pack("ii", 1, 0))
+    sock.close()
+
+def interrupted_upload_test(port=2121, mode="async", username="admin", password="admin"):
+    """
+    로컬 서버에 업로드하다가 연결을 끊어, 잘린 파일이 원래 이름으로 바뀌거나 알림으로 전달되지 않는지 확인합니다.
+    
+    - 제어 연결 끊김: 데이터를 절반 보낸 뒤 제어 연결을 리셋하고 데이터 연결을 닫음
+    - 데이터 연결 리셋: 데이터를 절반 보낸 뒤 데이터 연결을 리셋 (426 응답이어야 함)
+    - 정상 업로드: 대조군 (원래 이름으로 저장되고 알림이 가야 함)
+    
+    Returns:
+        bool: 모든 경우가 기대대로 동작하면 True
+    """
+    recorder, notified = _start_notify_recorder()
+    notify_url = f"http://127.0.0.1:{recorder.server_address[1]}/admin/index-queue"
+    payload = os.urandom(256 * 1024)
+    ok = True
+    with tempfile.TemporaryDirectory() as directory:
+        server = start_local_server(mode, port, directory, 1, ["--notify-url", notify_url])
+        try:
+            def begin(name):
+                ftp = ftplib.FTP()
+                ftp.connect("127.0.0.1", port, timeout=10)
+                ftp.login(username, password)
+                ftp.voidcmd("TYPE I")
+                conn = ftp.transfercmd(f"STOR {name}")
+                conn.sendall(payload[:len(payload) // 2])
+                time.sleep(0.3)
+                return ftp, conn
+            
+            # 1) 제어 연결이 먼저 끊김
+            ftp, conn = begin("control_drop.txt")
+            ftp.file.close()  # makefile이 소켓을 붙잡고 있으면 close()해도 연결이 닫히지 않는다
+            _reset(ftp.sock)
+            time.sleep(0.3)
+            try:
+                conn.close()
+            except OSError:
+                pass
+            
+            # 2) 데이터 연결 리셋
+            ftp, conn = begin("data_reset.txt")
+            _reset(conn)
+            try:
+                reply = ftp.voidresp()
+            except ftplib.all_errors as e:
+                reply = str(e)
+            ftp.close()
+            if not reply.startswith("426"):
+                print(f"✗ 데이터 연결 리셋에 대한 응답이 426이 아닙니다: {reply}")
+                ok = False
+            
+            # 3) 정상 업로드 (대조군)
+            ftp = ftplib.FTP()
+            ftp.connect("127.0.0.1", port, timeout=10)
+            ftp.login(username, password)
+            ftp.storbinary("STOR complete.txt", io.BytesIO(payload))
+            ftp.quit()
+            time.sleep(1.0)  # notifier 배치 전송 대기
+        finally:
+            server.terminate()
+            server.wait()
+            recorder.shutdown()
+        
+        files = sorted(os.listdir(directory))
+        notified_names = sorted(os.path.basename(path) for path in notified)
+    
+    print(f"남은 파일: {files}")
+    print(f"알림 받은 파일: {notified_names}")
+    if files != ["complete.txt"]:
+        print("✗ 잘린 업로드가 게시되었거나 임시 파일이 남았습니다")
+        ok = False
+    if notified_names != ["complete.txt"]:
+        print("✗ 잘린 업로드가 인덱싱 큐에 전달되었습니다")
+        ok = False
+    if ok:
+        print("✓ 끊긴 업로드는 버려지고, 정상 업로드만 게시·알림되었습니다")
+    return ok
+
+def print_bulk_result(label, result):
+    print(f"{label:>12} | {result['files']:>5} | {result['errors']:>4} | {result['seconds']:>7.2f}s | "
+          f"{result['mb_per_sec']:>7.1f} | {result['files_per_sec']:>8.1f} | "
+          f"{result['p50_ms']:>7.1f}ms | {result['p95_ms']:>7.1f}ms")
+    for sample in result["error_samples"]:
+        print(f"{'':>12}   ✗ {sample}")
+
 def main():
     """메인 함수"""
     import argparse
@@ -94,9 +322,45 @@ def main():
     parser.add_argument("--port", type=int, default=2121, help="FTP 서버 포트 (기본값: 2121)")
     parser.add_argument("--username", default="admin", help="FTP 사용자명 (기본값: admin)")
     parser.add_argument("--password", default="admin", help="FTP 비밀번호 (기본값: admin)")
+    parser.add_argument("--bulk", type=int, default=0, help="대량 업로드 벤치마크 파일 수 (기본값: 0 = 기본 테스트)")
+    parser.add_argument("--size-kb", type=int, default=256, help="대량 업로드 파일 크기 KB (기본값: 256)")
+    parser.add_argument("--workers", type=int, default=8, help="동시 업로드 연결 수 (기본값: 8)")
+    parser.add_argument("--extension", default=".bin", help="대량 업로드 파일 확장자 (기본값: .bin)")
+    parser.add_argument("--keep", action="store_true", help="업로드한 파일을 삭제하지 않음")
+    parser.add_argument("--local-server", nargs="+", metavar="MODE",
+                        help="임시 폴더로 로컬 서버를 모드별로 띄워 측정 (예: async threaded multiprocess)")
+    parser.add_argument("--interrupt-test", action="store_true",
+                        help="로컬 서버로 업로드 도중 연결 끊김 처리 확인 (--local-server로 모드 지정)")
+    parser.add_argument("--server-args", default="",
+                        help="로컬 서버에 넘길 추가 옵션 (예: \"--upload-limit 2048 --max-sessions-per-user 4\")")
     
     args = parser.parse_args()
     
+    if args.interrupt_test:
+        results = []
+        for mode in args.local_server or ["async"]:
+            print(f"=== 업로드 중단 테스트 ({mode}) ===")
+            results.append(interrupted_upload_test(args.port, mode, args.username, args.password))
+        sys.exit(0 if all(results) else 1)
+    
+    if args.bulk:
+        print(f"=== FTP 대량 업로드 벤치마크 ({args.bulk}개 × {args.size_kb}KB, 동시 연결 {args.workers}) ===")
+        print(f"{'서버':>12} | {'파일':>5} | {'오류':>4} | {'시간':>8} | {'MB/s':>7} | {'files/s':>8} | {'p50':>9} | {'p95':>9}")
+        bulk_args = dict(username=args.username, password=args.password, files=args.bulk, size_kb=args.size_kb,
+                         workers=args.workers, extension=args.extension, keep=args.keep)
+        if not args.local_server:
+            print_bulk_result(f"{args.host}:{args.port}", bulk_upload_test(args.host, args.port, **bulk_args))
+            return
+        for mode in args.local_server:
+            with tempfile.TemporaryDirectory() as directory:
+                server = start_local_server(mode, args.port, directory, args.workers, args.server_args.split())
+                try:
+                    print_bulk_result(mode, bulk_upload_test("127.0.0.1", args.port, **bulk_args))
+                finally:
+                    server.terminate()
+                    server.wait()
+        return
+    
     print("=== FTP 클라이언트 테스트 ===")
     print(f"서버: {args.host}:{args.port}")
     print(f"사용자: {args.username}")
@@ -2,20 +2,394 @@
 """
 간단한 FTP 서버
 pyftpdlib을 사용하여 로컬 FTP 서버를 실행합니다.
+업로드는 임시 이름으로 받았다가 전송이 끝나면 원래 이름으로 바꾸고, 챗봇 인덱싱 큐에 바로 알립니다.
+대량 업로드용으로 스레드/프로세스 서버 모드와 사용자별 동시 접속·대역폭 제한을 지원합니다.
 """
 
+import errno
 import os
 import sys
+import json
+import queue
+import socket
+import threading
+import time
+import uuid
+import multiprocessing
+import urllib.request
+from array import array
 from pyftpdlib.authorizers import DummyAuthorizer
-from pyftpdlib.handlers import FTPHandler
-from pyftpdlib.servers import FTPServer
+from pyftpdlib.handlers import FTPHandler, DTPHandler
+from pyftpdlib.servers import FTPServer, ThreadedFTPServer
 import logging
 
 # 로깅 설정
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-def create_ftp_server(host="127.0.0.1", port=2121, username="admin", password="admin", directory="."):
+# 업로드 완료 알림 설정 (앱의 인덱싱 큐 엔드포인트, 비우면 알리지 않고 파일 워쳐에 맡김)
+FTP_NOTIFY_URL = os.environ.get("FTP_NOTIFY_URL", "")  # 예: http://127.0.0.1:8000/admin/index-queue
+ADMIN_PASSWORD = os.environ.get("ADMIN_PASSWORD", "admin123")
+
+# 서버 모드 / 접속 제한 (대량 업로드가 챗봇 서버의 CPU를 다 쓰지 않도록)
+FTP_MODE = os.environ.get("FTP_MODE", "async")  # async: 단일 스레드, threaded: 접속마다 스레드, multiprocess: 접속마다 프로세스 (POSIX)
+FTP_MAX_CONS = int(os.environ.get("FTP_MAX_CONS", 256))  # 전체 최대 접속 수 (threaded/multiprocess에서는 스레드·프로세스 수 상한)
+FTP_MAX_CONS_PER_IP = int(os.environ.get("FTP_MAX_CONS_PER_IP", 5))
+FTP_MAX_SESSIONS_PER_USER = int(os.environ.get("FTP_MAX_SESSIONS_PER_USER", 0))  # 사용자별 동시 로그인 수 (0: 제한 없음)
+FTP_UPLOAD_LIMIT_KB = int(os.environ.get("FTP_UPLOAD_LIMIT_KB", 0))  # 사용자별 업로드 대역폭 KB/s (0: 제한 없음)
+FTP_DOWNLOAD_LIMIT_KB = int(os.environ.get("FTP_DOWNLOAD_LIMIT_KB", 0))  # 사용자별 다운로드 대역폭 KB/s
+FTP_USER_LIMITS = os.environ.get("FTP_USER_LIMITS", "")  # 사용자별 예외 JSON, 예: {"anonymous": {"sessions": 2, "download_kb": 256}}
+FTP_NICE = int(os.environ.get("FTP_NICE", 0))  # 서버 프로세스 우선순위 낮추기 (POSIX nice 값)
+
+# 전송 중인 파일 이름 (숨김 + .part라서 파일 워쳐의 무시 패턴에 걸린다)
+PARTIAL_PREFIX = ".ftp-"
+PARTIAL_SUFFIX = ".part"
+
+class UploadNotifier:
+    """완료된 업로드 경로를 앱의 /admin/index-queue로 전달
+
+    FTP 이벤트 루프를 막지 않도록 notify()는 큐에 넣기만 하고, 전송은 별도 스레드가 모아서 한다.
+    전송에 실패해도 파일 워쳐가 같은 파일을 감지하므로 경고만 남긴다.
+    """
+
+    def __init__(self, url, password, batch_seconds=0.2):
+        self.url = url
+        self.password = password
+        self.batch_seconds = batch_seconds
+        self.paths = queue.Queue()
+        self._pid = os.getpid()
+        self._thread = threading.Thread(target=self._run, name="upload-notifier", daemon=True)
+        self._thread.start()
+
+    def notify(self, path):
+        if os.getpid() != self._pid:
+            # multiprocess 모드의 접속 프로세스에는 전송 스레드가 없으므로 바로 보낸다 (그 접속만 잠시 대기)
+            self._send([path])
+            return
+        self.paths.put(path)
+
+    def stop(self):
+        self.paths.put(None)
+        self._thread.join()
+
+    def _run(self):
+        while True:
+            path = self.paths.get()
+            if path is None:
+                return
+            batch = [path]
+            # 대량 업로드는 짧은 시간 동안 모아서 요청 하나로 보낸다
+            try:
+                while True:
+                    path = self.paths.get(timeout=self.batch_seconds)
+                    if path is None:
+                        self._send(batch)
+                        return
+                    batch.append(path)
+            except queue.Empty:
+                pass
+            self._send(batch)
+
+    def _send(self, paths):
+        request = urllib.request.Request(
+            self.url,
+            data=json.dumps({"paths": paths}).encode("utf-8"),
+            headers={"Content-Type": "application/json", "X-Admin-Password": self.password},
+            method="POST",
+        )
+        try:
+            with urllib.request.urlopen(request, timeout=10) as response:
+                result = json.loads(response.read().decode("utf-8"))
+            logger.info(f"📨 인덱싱 큐에 {len(result.get('queued', []))}개 파일 전달")
+            if result.get("rejected"):
+                logger.warning(f"⚠️ 앱이 거부한 경로 (data 폴더 밖): {result['rejected']}")
+        except Exception as e:
+            logger.warning(f"⚠️ 인덱싱 큐 알림 실패 (파일 워쳐가 대신 처리): {e}")
+
+class InProcessNotifier:
+    """같은 프로세스에서 실행 중인 파일 워쳐의 인덱싱 큐로 바로 전달"""
+
+    def notify(self, path):
+        from pathlib import Path
+        from file_watcher import enqueue_files
+        if not enqueue_files([Path(path)], complete=True):
+            logger.warning(f"⚠️ 파일 워쳐가 실행 중이 아닙니다: {path}")
+
+UPLOAD, DOWNLOAD = 0, 1  # UserLimits 대역폭 방향
+
+class UserLimits:
+    """사용자별 동시 로그인 수와 대역폭 제한
+
+    대역폭은 사용자마다 토큰 버킷 하나(초당 limit 바이트, 최대 1초 분량 누적)를 두고
+    그 사용자의 모든 데이터 연결이 나눠 쓴다. 작은 파일을 연결 여러 개로 올려도 합계가 제한을 넘지 않는다.
+    카운터와 버킷은 공유 메모리(multiprocessing.Array)에 두어 threaded/multiprocess 모드에서도 같은 값을 본다.
+    """
+
+    def __init__(self, users, max_sessions=0, upload_kb=0, download_kb=0, overrides=None):
+        self.index = {user: i for i, user in enumerate(users)}
+        self.rules = []  # (동시 로그인 수, 업로드 bytes/s, 다운로드 bytes/s)
+        for user in users:
+            rule = (overrides or {}).get(user, {})
+            self.rules.append((
+                int(rule.get("sessions", max_sessions)),
+                int(rule.get("upload_kb", upload_kb)) * 1024,
+                int(rule.get("download_kb", download_kb)) * 1024,
+            ))
+        try:
+            self.lock = multiprocessing.Lock()
+            self.sessions = multiprocessing.Array("i", len(users), lock=False)
+            self.buckets = multiprocessing.Array("d", 4 * len(users), lock=False)  # 방향별 [남은 토큰, 마지막 시각]
+        except OSError:
+            # 공유 메모리를 쓸 수 없는 환경 - 한 프로세스 안에서만 센다
+            self.lock = threading.Lock()
+            self.sessions = array("i", [0] * len(users))
+            self.buckets = array("d", [0.0] * (4 * len(users)))
+
+    @property
+    def throttled(self):
+        return any(upload or download for _, upload, download in self.rules)
+
+    def acquire_session(self, user):
+        i = self.index.get(user)
+        if i is None:
+            return True
+        with self.lock:
+            max_sessions = self.rules[i][0]
+            if max_sessions and self.sessions[i] >= max_sessions:
+                return False
+            self.sessions[i] += 1
+        return True
+
+    def release_session(self, user):
+        i = self.index.get(user)
+        if i is not None:
+            with self.lock:
+                self.sessions[i] = max(0, self.sessions[i] - 1)
+
+    def rate(self, user, direction):
+        """direction: UPLOAD / DOWNLOAD - 제한이 없으면 0"""
+        i = self.index.get(user)
+        return 0 if i is None else self.rules[i][1 + direction]
+
+    def consume(self, user, direction, nbytes):
+        """nbytes를 전송했다고 기록하고, 제한을 넘었으면 쉬어야 할 시간(초)을 반환"""
+        limit = self.rate(user, direction)
+        if not limit or not nbytes:
+            return 0.0
+        slot = 4 * self.index[user] + 2 * direction
+        now = time.monotonic()
+        with self.lock:
+            tokens = min(limit, self.buckets[slot] + (now - self.buckets[slot + 1]) * limit) - nbytes
+            self.buckets[slot] = tokens
+            self.buckets[slot + 1] = now
+        return -tokens / limit if tokens < 0 else 0.0
+
+    def summary(self):
+        with self.lock:
+            return {user: self.sessions[i] for user, i in self.index.items()}
+
+# 데이터 연결이 끊긴 것으로 보는 errno (pyftpdlib 내부 목록과 같음 - 비공개 이름에 의존하지 않도록 직접 정의)
+DISCONNECTED_ERRNOS = {errno.ECONNRESET, errno.ENOTCONN, errno.ESHUTDOWN, errno.ECONNABORTED,
+                       errno.EPIPE, errno.EBADF, errno.ETIMEDOUT}
+DISCONNECTED_ERRNOS |= {getattr(errno, name) for name in ("WSAECONNRESET", "WSAECONNABORTED") if hasattr(errno, name)}
+
+
+class AtomicDTPHandler(DTPHandler):
+    """전송이 끝나면 226 응답을 보내기 전에 임시 파일을 원래 이름으로 바꾸는 데이터 채널
+
+    (on_file_received는 응답 뒤에 호출되므로 거기서 바꾸면 클라이언트가 바로 LIST했을 때 임시 이름이 보인다)
+    데이터 연결이 리셋되었거나 제어 연결이 이미 끊긴 업로드는 완료로 보지 않고 임시 파일을 지운다.
+    """
+
+    _connection_reset = False
+
+    def recv(self, buffer_size):
+        # 기본 recv는 연결 리셋(ECONNRESET 등)도 정상 종료(EOF)처럼 처리해 226을 보내므로 여기서 구분한다
+        try:
+            data = self.socket.recv(buffer_size)
+        except OSError as err:
+            if err.errno in DISCONNECTED_ERRNOS:
+                self._connection_reset = True
+                self.handle_close()
+                return b""
+            # EAGAIN 등 나머지는 기본 recv에 맡긴다 (다시 읽고, 재시도·오류 처리는 pyftpdlib 방식대로)
+            return super().recv(buffer_size)
+        if not data:
+            self.handle_close()
+        return data
+
+    def close(self):
+        if not self._closed and self.receive and self.file_obj is not None:
+            control_lost = self.cmd_channel.control_connection_lost()
+            if self._connection_reset or control_lost:
+                # 잘린 업로드 - on_incomplete_file_received가 임시 파일을 지운다 (이름 변경·알림 없음)
+                self.transfer_finished = False
+                self._resp = None if control_lost else ("426 Connection reset; transfer aborted.", logger.warning)
+            elif self.transfer_finished:
+                self.file_obj.close()
+                if not self.cmd_channel.finish_upload(self.file_obj.name):
+                    self._resp = ("451 Could not store file.", logger.error)
+        super().close()
+
+class ThrottledAtomicDTPHandler(AtomicDTPHandler):
+    """AtomicDTPHandler + 사용자별 대역폭 제한 (UserLimits 토큰 버킷이 비면 채널을 잠시 쉬게 함)"""
+
+    def __init__(self, sock, cmd_channel):
+        self._limits = cmd_channel.limits
+        self._limited_user = cmd_channel.username
+        self._throttler = None
+        super().__init__(sock, cmd_channel)
+
+    def use_sendfile(self):
+        # sendfile은 보낸 양을 셀 수 없으므로 다운로드 제한이 있으면 사용하지 않는다
+        return not self._limits.rate(self._limited_user, DOWNLOAD) and super().use_sendfile()
+
+    def recv(self, buffer_size):
+        chunk = super().recv(buffer_size)
+        self._throttle(self._limits.consume(self._limited_user, UPLOAD, len(chunk)))
+        return chunk
+
+    def send(self, data):
+        num_sent = super().send(data)
+        self._throttle(self._limits.consume(self._limited_user, DOWNLOAD, num_sent))
+        return num_sent
+
+    def _throttle(self, delay):
+        if delay <= 0 or self._closed:
+            return
+
+        def resume():
+            self.add_channel(events=self.ioloop.READ if self.receive else self.ioloop.WRITE)
+
+        self.del_channel()
+        self._throttler = self.ioloop.call_later(delay, resume, _errback=self.handle_error)
+
+    def close(self):
+        if self._throttler is not None and not self._throttler.cancelled:
+            self._throttler.cancel()
+        super().close()
+
+class IndexingFTPHandler(FTPHandler):
+    """업로드를 임시 이름으로 받고, 전송이 끝나면 원래 이름으로 바꾼 뒤 notifier에 알리는 핸들러
+
+    끊긴 업로드의 임시 파일은 지운다. APPE/REST(이어 올리기)는 기존 파일에 직접 쓴다.
+    """
+
+    dtp_handler = AtomicDTPHandler
+    notifier = None  # notify(path)를 가진 객체 (UploadNotifier / InProcessNotifier)
+    limits = None  # UserLimits (없으면 사용자별 제한 없음)
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._session_user = None
+        self._uploads = {}  # 전송 중: 임시 경로 → 최종 경로
+        self._finished = {}  # 이름을 바꾼 뒤 on_file_received 전: 임시 경로 → 최종 경로
+
+    def handle_auth_success(self, home, password, msg_login):
+        if self.limits is not None:
+            if not self.limits.acquire_session(self.username):
+                logger.warning(f"⚠️ 사용자 '{self.username}' 동시 접속 수 초과 - 로그인 거부")
+                self.respond("421 Too many sessions for this user, try again later.")
+                self.close_when_done()
+                return
+            self._session_user = self.username
+        super().handle_auth_success(home, password, msg_login)
+
+    def _release_session(self):
+        if self._session_user is not None:
+            self.limits.release_session(self._session_user)
+            self._session_user = None
+
+    def on_logout(self, username):
+        self._release_session()
+
+    def ftp_STOR(self, file, mode="w"):
+        if mode != "w" or self._restart_position:
+            return super().ftp_STOR(file, mode)
+        directory, name = os.path.split(file)
+        partial = os.path.join(directory, f"{PARTIAL_PREFIX}{uuid.uuid4().hex[:8]}-{name}{PARTIAL_SUFFIX}")
+        self._uploads[partial] = file
+        if super().ftp_STOR(partial, mode) is None:
+            del self._uploads[partial]
+            return None
+        return file
+
+    def control_connection_lost(self):
+        """제어 연결이 이미 닫혔거나 끊겼는지 (전송 중에는 제어 연결을 읽지 않으므로 소켓을 직접 들여다본다)"""
+        if self._closed:
+            return True
+        try:
+            data = self.socket.recv(1, socket.MSG_PEEK | getattr(socket, "MSG_DONTWAIT", 0))
+        except (BlockingIOError, InterruptedError):
+            return False  # 읽을 것이 없을 뿐 연결은 살아 있음
+        except OSError:
+            return True  # ECONNRESET 등
+        return not data  # 빈 응답은 상대가 연결을 닫았다는 뜻 (대기 중인 명령이 있으면 살아 있음)
+
+    def finish_upload(self, partial):
+        """임시 파일을 원래 이름으로 교체 (같은 폴더 안이라 원자적) - 실패하면 임시 파일을 지우고 False"""
+        final = self._uploads.pop(partial, None)
+        if final is None:
+            return True  # 이어 올리기로 직접 쓴 파일
+        try:
+            os.replace(partial, final)
+        except OSError as e:
+            logger.error(f"❌ 업로드 파일 이름 변경 실패 ({final}): {e}")
+            discard_partial(partial)
+            return False
+        self._finished[partial] = final
+        return True
+
+    def on_file_received(self, file):
+        final = self._finished.pop(file, file)
+        if is_partial(final):
+            return  # 이름 변경에 실패한 업로드
+        logger.info(f"📥 업로드 완료: {final}")
+        if self.notifier is not None:
+            self.notifier.notify(final)
+
+    def on_incomplete_file_received(self, file):
+        final = self._uploads.pop(file, None)
+        if final is not None:
+            logger.warning(f"⚠️ 업로드 중단 - 임시 파일 삭제: {final}")
+            discard_partial(file)
+
+    def on_disconnect(self):
+        self._release_session()
+        # 데이터 연결 전에 끊긴 업로드의 임시 파일 정리
+        for partial in self._uploads:
+            discard_partial(partial)
+        self._uploads.clear()
+
+def is_partial(path):
+    name = os.path.basename(path)
+    return name.startswith(PARTIAL_PREFIX) and name.endswith(PARTIAL_SUFFIX)
+
+def discard_partial(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+def cleanup_partial_uploads(directory):
+    """서버가 업로드 도중 종료되어 남은 임시 파일 삭제"""
+    removed = 0
+    for root, _, files in os.walk(directory):
+        for name in files:
+            if is_partial(name):
+                discard_partial(os.path.join(root, name))
+                removed += 1
+    if removed:
+        logger.info(f"🧹 이전에 끊긴 업로드 임시 파일 {removed}개 삭제")
+
+SERVER_MODES = {"async": FTPServer, "threaded": ThreadedFTPServer}
+if os.name == "posix":
+    from pyftpdlib.servers import MultiprocessFTPServer
+    SERVER_MODES["multiprocess"] = MultiprocessFTPServer
+
+def create_ftp_server(host="127.0.0.1", port=2121, username="admin", password="admin", directory=".",
+                      notifier=None, mode=FTP_MODE, max_cons=FTP_MAX_CONS, max_cons_per_ip=FTP_MAX_CONS_PER_IP,
+                      limits=None, nice=FTP_NICE):
     """
     FTP 서버를 생성하고 실행합니다.
     
@@ -25,6 +399,12 @@ def create_ftp_server(host="127.0.0.1", port=2121, username="admin", password="a
         username (str): FTP 사용자명 (기본값: admin)
         password (str): FTP 비밀번호 (기본값: admin)
         directory (str): FTP 루트 디렉토리 (기본값: 현재 디렉토리)
+        notifier: 업로드 완료 시 notify(경로)를 호출할 객체 (기본값: 알리지 않음)
+        mode (str): 서버 모드 async / threaded / multiprocess (기본값: async)
+        max_cons (int): 전체 최대 접속 수 (기본값: 256)
+        max_cons_per_ip (int): IP당 최대 접속 수 (기본값: 5)
+        limits (UserLimits): 사용자별 동시 로그인·대역폭 제한 (기본값: 제한 없음)
+        nice (int): 서버 프로세스 nice 값 - 챗봇보다 CPU 우선순위를 낮출 때 사용 (기본값: 0)
     """
     
     # 현재 디렉토리를 절대 경로로 변환
@@ -35,6 +415,11 @@ def create_ftp_server(host="127.0.0.1", port=2121, username="admin", password="a
         logger.error(f"FTP 디렉토리가 존재하지 않습니다: {ftp_directory}")
         return False
     
+    server_class = SERVER_MODES.get(mode)
+    if server_class is None:
+        logger.error(f"지원하지 않는 서버 모드입니다: {mode} (가능: {', '.join(SERVER_MODES)})")
+        return False
+    
     # 인증자 생성
     authorizer = DummyAuthorizer()
     
@@ -44,16 +429,23 @@ def create_ftp_server(host="127.0.0.1", port=2121, username="admin", password="a
     # 익명 사용자 추가 (읽기 전용)
     authorizer.add_anonymous(ftp_directory, perm="elr")
     
-    # FTP 핸들러 생성
-    handler = FTPHandler
+    # FTP 핸들러 생성 (업로드는 임시 이름으로 받고 완료 시 원래 이름으로 변경)
+    cleanup_partial_uploads(ftp_directory)
+    handler = IndexingFTPHandler
     handler.authorizer = authorizer
+    handler.notifier = notifier
+    handler.limits = limits
+    handler.dtp_handler = ThrottledAtomicDTPHandler if limits is not None and limits.throttled else AtomicDTPHandler
+    
+    if nice and hasattr(os, "nice"):
+        os.nice(nice)
     
     # 서버 생성
-    server = FTPServer((host, port), handler)
+    server = server_class((host, port), handler)
     
     # 서버 설정
-    server.max_cons = 256
-    server.max_cons_per_ip = 5
+    server.max_cons = max_cons
+    server.max_cons_per_ip = max_cons_per_ip
     
     logger.info(f"FTP 서버가 시작되었습니다.")
     logger.info(f"호스트: {host}")
@@ -62,6 +454,13 @@ def create_ftp_server(host="127.0.0.1", port=2121, username="admin", password="a
     logger.info(f"비밀번호: {password}")
     logger.info(f"FTP 루트 디렉토리: {ftp_directory}")
     logger.info(f"익명 접속 가능: 예")
+    logger.info(f"서버 모드: {mode} (최대 접속 {max_cons}, IP당 {max_cons_per_ip})")
+    if limits is not None:
+        for user, i in limits.index.items():
+            sessions, upload, download = limits.rules[i]
+            logger.info(f"사용자 제한 [{user}]: 동시 로그인 {sessions or '무제한'}, "
+                        f"업로드 {upload // 1024 or '무제한'}KB/s, 다운로드 {download // 1024 or '무제한'}KB/s")
+    logger.info(f"업로드 완료 알림: {getattr(notifier, 'url', type(notifier).__name__) if notifier else '없음'}")
     logger.info("서버를 중지하려면 Ctrl+C를 누르세요.")
     
     try:
@@ -85,17 +484,44 @@ def main():
     parser.add_argument("--username", default="admin", help="FTP 사용자명 (기본값: admin)")
     parser.add_argument("--password", default="admin", help="FTP 비밀번호 (기본값: admin)")
     parser.add_argument("--directory", default=".", help="FTP 루트 디렉토리 (기본값: 현재 디렉토리)")
+    parser.add_argument("--notify-url", default=FTP_NOTIFY_URL,
+                        help="업로드 완료를 알릴 앱 주소 (예: http://127.0.0.1:8000/admin/index-queue)")
+    parser.add_argument("--admin-password", default=ADMIN_PASSWORD, help="앱 관리자 비밀번호")
+    parser.add_argument("--mode", default=FTP_MODE, choices=sorted(SERVER_MODES), help="서버 모드 (기본값: async)")
+    parser.add_argument("--max-cons", type=int, default=FTP_MAX_CONS, help="전체 최대 접속 수 (기본값: 256)")
+    parser.add_argument("--max-cons-per-ip", type=int, default=FTP_MAX_CONS_PER_IP, help="IP당 최대 접속 수 (기본값: 5)")
+    parser.add_argument("--max-sessions-per-user", type=int, default=FTP_MAX_SESSIONS_PER_USER,
+                        help="사용자별 동시 로그인 수 (기본값: 0 = 제한 없음)")
+    parser.add_argument("--upload-limit", type=int, default=FTP_UPLOAD_LIMIT_KB,
+                        help="사용자별 업로드 대역폭 KB/s (기본값: 0 = 제한 없음)")
+    parser.add_argument("--download-limit", type=int, default=FTP_DOWNLOAD_LIMIT_KB,
+                        help="사용자별 다운로드 대역폭 KB/s (기본값: 0 = 제한 없음)")
+    parser.add_argument("--nice", type=int, default=FTP_NICE, help="서버 프로세스 nice 값 (기본값: 0)")
     
     args = parser.parse_args()
     
+    notifier = UploadNotifier(args.notify_url, args.admin_password) if args.notify_url else None
+    limits = None
+    if args.max_sessions_per_user or args.upload_limit or args.download_limit or FTP_USER_LIMITS:
+        limits = UserLimits([args.username, "anonymous"], args.max_sessions_per_user, args.upload_limit,
+                            args.download_limit, json.loads(FTP_USER_LIMITS) if FTP_USER_LIMITS else None)
+    
     # FTP 서버 시작
     success = create_ftp_server(
         host=args.host,
         port=args.port,
         username=args.username,
         password=args.password,
-        directory=args.directory
+        directory=args.directory,
+        notifier=notifier,
+        mode=args.mode,
+        max_cons=args.max_cons,
+        max_cons_per_ip=args.max_cons_per_ip,
+        limits=limits,
+        nice=args.nice
     )
+    if notifier is not None:
+        notifier.stop()
     
     if success:
         sys.exit(0)
@@ -1,15 +1,19 @@
 # ingest.py
-import os, json, re, glob
+import os, json, re, glob, hashlib
 from pathlib import Path
 # from tqdm import tqdm  # tqdm 대신 간단한 진행 표시 사용
 import faiss
 import numpy as np
-from sentence_transformers import SentenceTransformer
+from embedding_backend import load_embedder, EMBED_BACKEND, EMBED_QUANTIZE
 from markdown import markdown
 from bs4 import BeautifulSoup  # markdown -> text 정제를 위한 보조
 import pandas as pd
 import docx
 
+from text_stream import STREAM_BLOCK_SIZE, iter_lines_blocks, iter_text_blocks, stream_chunks
+from program_blocks import ProgramChunk, iter_structured_chunks, looks_like_program_list
+from reconcile import save_manifest
+
 DATA_DIR = Path("data")
 INDEX_DIR = Path("index")
 INDEX_DIR.mkdir(exist_ok=True)
@@ -17,18 +21,45 @@ INDEX_DIR.mkdir(exist_ok=True)
 EMB_MODEL_NAME = "jhgan/ko-sroberta-multitask"
 CHUNK_SIZE = 1000   # 문자 기준(간단), 필요 시 토큰화 기반으로 개선
 CHUNK_OVERLAP = 200
+# 이보다 큰 마크다운은 문단 묶음 단위로 변환 (작은 파일은 기존처럼 문서 전체를 한 번에 변환)
+MD_STREAM_THRESHOLD = int(os.environ.get("MD_STREAM_THRESHOLD", str(64 * 1024 * 1024)))
+# 청크 분할 방식: auto(사업 목록 문서면 사업 단위, 아니면 고정 길이) / program / fixed
+CHUNK_STRATEGY = os.environ.get("CHUNK_STRATEGY", "auto").lower()
 
 def read_txt(path: Path) -> str:
     """텍스트 파일 읽기"""
     return path.read_text(encoding="utf-8", errors="ignore")
 
+def markdown_to_text(raw: str) -> str:
+    """markdown → html → text"""
+    html = markdown(raw)
+    return BeautifulSoup(html, "html.parser").get_text("\n")
+
 def read_md(path: Path) -> str:
     """마크다운 파일 읽기 및 HTML 변환 후 텍스트 추출"""
     raw = path.read_text(encoding="utf-8", errors="ignore")
-    # markdown → html → text
-    html = markdown(raw)
-    text = BeautifulSoup(html, "html.parser").get_text("\n")
-    return text
+    return markdown_to_text(raw)
+
+def iter_md_sections(path: Path, min_size=STREAM_BLOCK_SIZE):
+    """큰 마크다운을 min_size 이상인 문단 묶음으로 나눠 변환 (코드 블록 밖의 빈 줄에서만 나눈다)
+
+    문단 묶음 사이에는 빈 줄을 넣어 문단 경계를 유지한다.
+    문서 전체를 참조하는 요소(다른 묶음에 정의된 참조형 링크 등)는 묶음 안에서만 해석된다.
+    """
+    section = []
+    section_size = 0
+    in_fence = False
+    for block in iter_lines_blocks(iter_text_blocks(path)):
+        for line in block.splitlines(keepends=True):
+            if line.lstrip().startswith(("```", "~~~")):
+                in_fence = not in_fence
+            if section_size >= min_size and not in_fence and not line.strip():
+                yield markdown_to_text("".join(section)) + "\n\n"
+                section, section_size = [], 0
+            section.append(line)
+            section_size += len(line)
+    if section:
+        yield markdown_to_text("".join(section))
 
 def read_docx(path: Path) -> str:
     """Word 문서 읽기"""
@@ -77,6 +108,70 @@ def chunk_text(text: str, size=CHUNK_SIZE, overlap=CHUNK_OVERLAP):
         start = end - overlap
     return chunks
 
+def iter_source_blocks(path: Path):
+    """파일에서 추출한 텍스트를 블록 스트림으로
+
+    .txt는 블록 단위로 읽어 파일 크기와 무관하게 청크 크기 정도의 메모리만 쓰고,
+    MD_STREAM_THRESHOLD보다 큰 .md는 문단 묶음 단위로 변환한다.
+    .docx/.xlsx는 파서가 문서 전체를 읽으므로 추출한 텍스트 하나를 그대로 쓴다.
+    """
+    ext = path.suffix.lower()
+    if ext == ".txt":
+        return iter_text_blocks(path)
+    if ext == ".md" and path.stat().st_size > MD_STREAM_THRESHOLD:
+        return iter_md_sections(path)
+    text = load_and_extract(path)
+    return [text] if text else []
+
+def iter_file_chunks(path: Path, size=CHUNK_SIZE, overlap=CHUNK_OVERLAP):
+    """파일을 고정 길이 청크로 분할 - chunk_text(load_and_extract(path))와 같은 결과"""
+    return stream_chunks(iter_source_blocks(path), size, overlap)
+
+def iter_file_records(path: Path, size=CHUNK_SIZE, overlap=CHUNK_OVERLAP, strategy=None):
+    """CHUNK_STRATEGY에 따라 파일을 ProgramChunk(text, fields)로 분할
+
+    사업 목록 문서는 사업 하나를 청크 하나로 만들고 파싱된 필드를 함께 돌려준다.
+    사업 경계에서 나누므로 겹침이 필요 없고, 필드는 메타데이터로 저장해 질의 시 다시 파싱하지 않는다.
+    """
+    strategy = (strategy or CHUNK_STRATEGY).lower()
+    blocks = iter_source_blocks(path)
+    if strategy == "auto":
+        is_program_list, blocks = looks_like_program_list(blocks)
+        strategy = "program" if is_program_list else "fixed"
+    if strategy == "program":
+        return iter_structured_chunks(blocks, size, overlap)
+    return (ProgramChunk(chunk, None) for chunk in stream_chunks(blocks, size, overlap))
+
+def file_hash(path: Path) -> str:
+    """파일 내용의 SHA-256 (1MB씩 읽음) - 증분 인덱싱에서 변경 여부 판단용"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def file_fingerprint(path: Path) -> dict:
+    """manifest 항목 (크기, 수정 시각, 내용 해시)
+
+    stat을 해시보다 먼저 하므로, 해시 도중 파일이 바뀌면 다음 대조 때 크기·시각이 달라 다시 확인된다.
+    """
+    st = path.stat()
+    return {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "content_hash": file_hash(path)}
+
+def chunk_metadata(uid: int, path: Path, chunk_id: int, record: ProgramChunk, content_hash: str = None) -> dict:
+    """청크 메타데이터 (사업 청크면 비어 있지 않은 필드를 program에 저장)"""
+    meta = {
+        "uid": uid,
+        "source": path.name,
+        "chunk_id": chunk_id,
+        "path": str(path.resolve())
+    }
+    if content_hash is not None:
+        meta["content_hash"] = content_hash
+    if record.fields is not None:
+        meta["program"] = {name: value for name, value in record.fields.items() if value}
+    return meta
+
 def main():
     """메인 인덱싱 파이프라인"""
     print("문서 수집 및 파싱 시작...")
@@ -97,34 +192,30 @@ def main():
         print(f"  - {f.name}")
 
     # 임베딩 모델 로드
-    print(f"🤖 임베딩 모델 로딩: {EMB_MODEL_NAME}")
-    model = SentenceTransformer(EMB_MODEL_NAME)
+    print(f"🤖 임베딩 모델 로딩: {EMB_MODEL_NAME} ({EMBED_BACKEND}, 양자화: {EMBED_QUANTIZE})")
+    model = load_embedder(model_name=EMB_MODEL_NAME)
     
     vectors = []
     metadatas = []
     corpus_texts = []
+    manifest = {}  # 파일별 크기·수정 시각·내용 해시 (서버 시작 시 data/와 대조)
 
     uid = 0
     for i, f in enumerate(files):
         print(f"파싱 중... ({i+1}/{len(files)}) {f.name}")
-        text = load_and_extract(f)
-        if not text: 
+        # 청크를 읽는 대로 추가 (파일 전체를 메모리에 올리지 않음)
+        first = len(corpus_texts)
+        fingerprint = file_fingerprint(f)
+        manifest[f.name] = fingerprint
+        for i, record in enumerate(iter_file_records(f)):
+            corpus_texts.append(record.text)
+            metadatas.append(chunk_metadata(uid, f, i, record, fingerprint["content_hash"]))
+            uid += 1
+
+        if len(corpus_texts) == first:
             print(f"⚠️  {f.name}: 텍스트 추출 실패")
             continue
-            
-        chunks = chunk_text(text)
-        print(f"📄 {f.name}: {len(chunks)}개 청크 생성")
-        
-        for i, ch in enumerate(chunks):
-            meta = {
-                "uid": uid,
-                "source": f.name,
-                "chunk_id": i,
-                "path": str(f.resolve())
-            }
-            corpus_texts.append(ch)
-            metadatas.append(meta)
-            uid += 1
+        print(f"📄 {f.name}: {len(corpus_texts) - first}개 청크 생성")
 
     print(f"✅ 총 청크 수: {len(corpus_texts)}")
     if not corpus_texts:
@@ -144,6 +235,7 @@ def main():
     faiss.write_index(index, str(INDEX_DIR / "faiss.index"))
     with open(INDEX_DIR / "meta.json", "w", encoding="utf-8") as f:
         json.dump({"metas": metadatas, "texts": corpus_texts}, f, ensure_ascii=False)
+    save_manifest(INDEX_DIR, manifest)
 
     print("✅ 완료! 인덱스가 ./index에 저장되었습니다.")
     print(f"📊 통계:")
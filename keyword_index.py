@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+# keyword_index.py - 문자 n-gram 역색인 키워드 검색 (Python 내장 모듈만 사용)
+#
+# 청크마다 text.lower().count(keyword)를 돌리던 전체 스캔 대신,
+# 로드 시점에 문자 bigram → 청크 번호 postings를 만들어 두고
+# 질의 시에는 키워드의 가장 드문 bigram을 가진 청크만 확인한다.
+# 점수는 기존 방식과 같은 "키워드 등장 횟수 합"이다.
+
+import heapq
+import threading
+from array import array
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+
+class NgramIndex:
+    """문자 n-gram 역색인 + 키워드별 등장 횟수 캐시 (여러 스레드에서 동시에 검색 가능)"""
+
+    MAX_CACHED_TERMS = 2048
+
+    def __init__(self, texts: Iterable[str], n: int = 2, lowered: Optional[List[str]] = None):
+        self.n = n
+        # 소문자 텍스트는 한 번만 만들어 둔다
+        self.texts_lower: List[str] = lowered if lowered is not None else [t.lower() for t in texts]
+        self.postings: Dict[str, array] = {}
+        self._term_counts: "OrderedDict[str, List[Tuple[int, int]]]" = OrderedDict()
+        self._cache_lock = threading.Lock()
+
+        postings = {}
+        for doc_id, text in enumerate(self.texts_lower):
+            grams = set(map(str.__add__, text[:-1], text[1:])) if n == 2 else \
+                {text[i:i + n] for i in range(len(text) - n + 1)}
+            for gram in grams:
+                posting = postings.get(gram)
+                if posting is None:
+                    posting = postings[gram] = array("I")
+                posting.append(doc_id)
+        self.postings = postings
+
+    @classmethod
+    def from_postings(cls, texts_lower: List[str], postings, n: int = 2) -> "NgramIndex":
+        """미리 만든 postings(gram → 청크 번호 목록, get/len 지원)로 생성 - 코퍼스 순회 없음
+
+        search_artifact의 postings는 단어 안의 bigram만 담고 있으므로
+        공백이 없는 키워드(질문을 공백으로 나눈 단어)에만 사용한다.
+        """
+        self = cls.__new__(cls)
+        self.n = n
+        self.texts_lower = texts_lower
+        self.postings = postings
+        self._term_counts = OrderedDict()
+        self._cache_lock = threading.Lock()
+        return self
+
+    def __len__(self):
+        return len(self.texts_lower)
+
+    def candidates(self, term: str):
+        """term을 포함할 수 있는 청크 번호 목록 (가장 드문 n-gram의 postings)"""
+        if len(term) < self.n:
+            return range(len(self.texts_lower))
+        rarest = None
+        for i in range(len(term) - self.n + 1):
+            posting = self.postings.get(term[i:i + self.n])
+            if posting is None:
+                return ()
+            if rarest is None or len(posting) < len(rarest):
+                rarest = posting
+        return rarest
+
+    def term_counts(self, term: str) -> List[Tuple[int, int]]:
+        """term이 등장하는 (청크 번호, 등장 횟수) 목록"""
+        with self._cache_lock:
+            cached = self._term_counts.get(term)
+            if cached is not None:
+                self._term_counts.move_to_end(term)
+                return cached
+
+        texts = self.texts_lower
+        counts = []
+        for doc_id in self.candidates(term):
+            c = texts[doc_id].count(term)
+            if c:
+                counts.append((doc_id, c))
+
+        # 세기는 잠금 밖에서 하고 캐시 갱신만 잠금 안에서
+        with self._cache_lock:
+            self._term_counts[term] = counts
+            if len(self._term_counts) > self.MAX_CACHED_TERMS:
+                self._term_counts.popitem(last=False)
+        return counts
+
+    def search(self, keywords: List[str], top_k: int = 5) -> List[Tuple[int, int]]:
+        """키워드 등장 횟수 합이 큰 순서로 (청크 번호, 점수) 상위 top_k개
+
+        동점이면 앞 번호 청크가 먼저 온다 (기존 안정 정렬과 동일).
+        """
+        scores: Dict[int, int] = {}
+        for keyword in keywords:
+            for doc_id, c in self.term_counts(keyword):
+                scores[doc_id] = scores.get(doc_id, 0) + c
+        return heapq.nsmallest(top_k, scores.items(), key=lambda item: (-item[1], item[0]))
@@ -0,0 +1,106 @@
+# netlify/functions/api.py - Netlify Functions(AWS Lambda) 진입점
+#
+# netlify.toml이 /api/*를 이 함수로 보내면 app_serverless.app을 Mangum으로 감싸 처리한다.
+# 컨테이너가 살아 있는 동안(웜 호출) 모듈 전역 상태 - 인덱스, 임베딩 모델, 세션, 검색 캐시 - 를 그대로 재사용하고,
+# 무거운 로드는 컨테이너가 처음 뜰 때 한 번만 한다. Mangum의 lifespan은 호출마다 startup을 다시 실행하므로 끈다.
+#
+#   GET /api/ping    - ASGI 앱을 거치지 않고 컨테이너 상태만 반환 (웜 여부, 호출 수, 초기화 시간)
+#   GET /api/warmup  - 지연 로드되는 임베딩 모델까지 미리 로드 (배포 직후나 외부 모니터에서 주기적으로 호출)
+
+import asyncio
+import json
+import os
+import sys
+import time
+from pathlib import Path
+
+_init_start = time.perf_counter()
+
+# index/, bundle/ 등 상대 경로가 프로젝트 루트 기준이 되도록
+ROOT = Path(__file__).resolve().parents[2]
+sys.path.insert(0, str(ROOT))
+os.chdir(ROOT)
+os.environ.setdefault("NETLIFY", "true")
+
+from mangum import Mangum
+
+import app_serverless
+
+PATH_PREFIXES = ("/.netlify/functions/api", "/api")
+
+asgi_handler = Mangum(app_serverless.app, lifespan="off")
+# import 시점에는 실행 중인 루프가 없으므로 직접 만들어 현재 루프로 등록한 뒤 자원을 로드한다
+# (Mangum은 호출마다 현재 루프를 가져다 쓰므로 이후 호출도 이 루프에서 실행된다)
+loop = asyncio.new_event_loop()
+asyncio.set_event_loop(loop)
+loop.run_until_complete(app_serverless.load_resources())
+
+init_ms = (time.perf_counter() - _init_start) * 1000
+started_at = time.time()
+invocations = 0
+print(f"✅ 함수 초기화 완료: {init_ms:.0f}ms")
+
+
+def strip_prefix(path: str) -> str:
+    """/.netlify/functions/api/ask, /api/ask → /ask"""
+    for prefix in PATH_PREFIXES:
+        if path == prefix or path.startswith(prefix + "/"):
+            return path[len(prefix):] or "/"
+    return path or "/"
+
+
+def to_asgi_event(event: dict, path: str) -> dict:
+    """Netlify 이벤트 → Mangum이 API Gateway(v1)로 인식하는 이벤트"""
+    event = dict(event, path=path)
+    event.setdefault("resource", path)
+    event.setdefault("requestContext", {})
+    event.setdefault("httpMethod", "GET")
+    return event
+
+
+def warm_up() -> float:
+    """임베딩 모델을 로드하고 한 번 인코딩 (소요 시간 ms)"""
+    start = time.perf_counter()
+    app_serverless.get_emb_model().encode(["warmup"], normalize_embeddings=True)
+    return (time.perf_counter() - start) * 1000
+
+
+def container_state() -> dict:
+    return {
+        "invocations": invocations,
+        "init_ms": round(init_ms, 1),
+        "uptime_s": round(time.time() - started_at, 1),
+        "index_loaded": app_serverless.index is not None,
+        "model_loaded": app_serverless.emb_model is not None,
+        "sessions": len(app_serverless.sessions),
+        "cold_start": app_serverless.cold_start.summary(),
+    }
+
+
+def json_response(status: int, body: dict) -> dict:
+    return {
+        "statusCode": status,
+        "headers": {"content-type": "application/json"},
+        "body": json.dumps(body, ensure_ascii=False),
+        "isBase64Encoded": False,
+    }
+
+
+def handler(event, context):
+    """Lambda 핸들러 - 첫 호출이면 응답 헤더 x-cold-start: 1"""
+    global invocations
+    invocations += 1
+    cold = invocations == 1
+    path = strip_prefix(event.get("path") or event.get("rawPath") or "/")
+
+    if path == "/ping":
+        response = json_response(200, {"status": "ok", "cold": cold, **container_state()})
+    elif path == "/warmup":
+        warmup_ms = warm_up()
+        response = json_response(200, {"status": "warm", "cold": cold, "warmup_ms": round(warmup_ms, 1),
+                                       **container_state()})
+    else:
+        response = asgi_handler(to_asgi_event(event, path), context)
+
+    response.setdefault("headers", {})["x-cold-start"] = "1" if cold else "0"
+    return response
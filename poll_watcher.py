@@ -0,0 +1,197 @@
+# poll_watcher.py - 네트워크 드라이브용 폴링 파일 워쳐 (watchdog 이벤트 클래스만 사용)
+#
+# data/가 SMB/NFS 공유 폴더이면 inotify 이벤트가 오지 않아 watchdog Observer가 아무것도 감지하지 못한다.
+# 여기서는 주기적으로 os.scandir로 폴더를 훑어 이전 스냅샷과 비교하고, 바뀐 파일을
+# watchdog 이벤트(생성/수정/삭제/이동)로 만들어 기존 핸들러(DocumentWatcher)에 그대로 넘긴다.
+#
+# 스냅샷은 폴더별로 (파일명 목록, array('q') [크기, 수정 시각 ns, inode] × 파일 수)만 가지고 있어서
+# 파일마다 튜플/딕셔너리를 만들지 않는다. 바뀌지 않은 폴더는 리스트·배열 비교(C 수준) 한 번으로 넘어가고,
+# 달라진 폴더만 파일 단위로 비교한다. 변경이 없으면 폴링 간격을 최대 간격까지 두 배씩 늘린다.
+
+import fnmatch
+import logging
+import os
+import re
+import threading
+import time
+from array import array
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from watchdog.events import FileCreatedEvent, FileDeletedEvent, FileModifiedEvent, FileMovedEvent
+
+logger = logging.getLogger(__name__)
+
+WATCH_POLL_INTERVAL = float(os.environ.get("WATCH_POLL_INTERVAL", 2.0))  # 변경이 있을 때의 폴링 간격 (초)
+WATCH_POLL_MAX_INTERVAL = float(os.environ.get("WATCH_POLL_MAX_INTERVAL", 30.0))  # 변경이 없을 때 늘어나는 최대 간격
+WATCH_IGNORE = os.environ.get("WATCH_IGNORE", ".*,~$*,*.tmp,*.part")  # 무시할 파일/폴더 이름 패턴 (쉼표 구분)
+
+_INODE_MASK = (1 << 63) - 1  # array('q')에 넣기 위해 64비트 inode의 최상위 비트 제거
+
+
+def compile_ignore(patterns: Iterable[str]) -> Callable[[str], bool]:
+    """fnmatch 패턴 목록 → 이름 하나를 검사하는 함수 (패턴들을 정규식 하나로 합침)"""
+    patterns = [p.strip() for p in patterns if p.strip()]
+    if not patterns:
+        return lambda name: False
+    regex = re.compile("|".join(fnmatch.translate(p) for p in patterns))
+    return lambda name: regex.match(name) is not None
+
+
+def parse_ignore(value: str = WATCH_IGNORE) -> Callable[[str], bool]:
+    """쉼표로 구분된 WATCH_IGNORE 값 → 검사 함수"""
+    return compile_ignore(value.split(","))
+
+
+class DirSnapshot(NamedTuple):
+    names: List[str]  # 파일명 (scandir 순서)
+    stats: array      # names[i]의 크기·수정 시각·inode가 stats[3i:3i+3]
+
+
+class ScanError(Exception):
+    """폴더를 읽지 못함 (공유 폴더 연결 끊김 등) - 이번 폴링 결과를 버린다"""
+
+
+def scan_dir(path: str, is_ignored: Callable[[str], bool]) -> Tuple[DirSnapshot, List[str]]:
+    """폴더 하나의 파일 스냅샷과 하위 폴더 경로"""
+    names: List[str] = []
+    stats = array("q")
+    add_name, add_stat = names.append, stats.append
+    subdirs = []
+    try:
+        with os.scandir(path) as it:
+            for entry in it:
+                name = entry.name
+                if is_ignored(name):
+                    continue
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        subdirs.append(entry.path)
+                        continue
+                    st = entry.stat()
+                except OSError:
+                    continue  # 훑는 도중 삭제된 항목
+                add_name(name)
+                add_stat(st.st_size)
+                add_stat(st.st_mtime_ns)
+                add_stat(st.st_ino & _INODE_MASK)
+    except OSError as e:
+        raise ScanError(f"{path}: {e}") from e
+    return DirSnapshot(names, stats), subdirs
+
+
+def take_snapshot(root: str, is_ignored: Callable[[str], bool], recursive: bool) -> Dict[str, DirSnapshot]:
+    """폴더 경로 → DirSnapshot (recursive면 하위 폴더 포함)"""
+    snapshot = {}
+    stack = [root]
+    while stack:
+        path = stack.pop()
+        snapshot[path], subdirs = scan_dir(path, is_ignored)
+        if recursive:
+            stack.extend(subdirs)
+    return snapshot
+
+
+def diff_snapshots(old: Dict[str, DirSnapshot], new: Dict[str, DirSnapshot]) -> List:
+    """두 스냅샷의 차이를 watchdog 이벤트 목록으로 (삭제+생성이 같은 inode면 이동)"""
+    created: List[Tuple[str, int]] = []
+    deleted: List[Tuple[str, int]] = []
+    events = []
+    empty = DirSnapshot([], array("q"))
+    for dir_path in old.keys() | new.keys():
+        before = old.get(dir_path, empty)
+        after = new.get(dir_path, empty)
+        if before.names == after.names and before.stats == after.stats:
+            continue
+        previous = {name: i for i, name in enumerate(before.names)}
+        for j, name in enumerate(after.names):
+            path = os.path.join(dir_path, name)
+            i = previous.pop(name, None)
+            if i is None:
+                created.append((path, after.stats[3 * j + 2]))
+            elif before.stats[3 * i:3 * i + 3] != after.stats[3 * j:3 * j + 3]:
+                events.append(FileModifiedEvent(path))
+        for name, i in previous.items():
+            deleted.append((os.path.join(dir_path, name), before.stats[3 * i + 2]))
+
+    # inode가 0인 파일 시스템(일부 SMB)에서는 이동을 판별하지 않는다
+    deleted_by_inode = {inode: path for path, inode in deleted if inode}
+    for path, inode in created:
+        src_path = deleted_by_inode.pop(inode, None) if inode else None
+        if src_path is None:
+            events.append(FileCreatedEvent(path))
+        else:
+            events.append(FileMovedEvent(src_path, path))
+    moved_sources = {e.src_path for e in events if isinstance(e, FileMovedEvent)}
+    events.extend(FileDeletedEvent(path) for path, _ in deleted if path not in moved_sources)
+    return events
+
+
+def count_files(snapshot: Dict[str, DirSnapshot]) -> int:
+    return sum(len(d.names) for d in snapshot.values())
+
+
+class PollingObserver(threading.Thread):
+    """scandir 스냅샷 비교로 변경을 감지하는 옵저버 (watchdog Observer와 같은 schedule/start/stop/join 사용법)"""
+
+    def __init__(self, interval: float = WATCH_POLL_INTERVAL, max_interval: float = WATCH_POLL_MAX_INTERVAL,
+                 ignore: str = WATCH_IGNORE):
+        super().__init__(name="polling-observer", daemon=True)
+        self.min_interval = interval
+        self.max_interval = max(interval, max_interval)
+        self.interval = interval
+        self.is_ignored = parse_ignore(ignore)
+        self.handler = None
+        self.root: Optional[str] = None
+        self.recursive = False
+        self.snapshot: Dict[str, DirSnapshot] = {}
+        self.polls = 0
+        self.errors = 0
+        self.last_poll_ms = 0.0
+        self._stopped = threading.Event()
+
+    def schedule(self, handler, path: str, recursive: bool = False):
+        self.handler = handler
+        self.root = path
+        self.recursive = recursive
+
+    def stop(self):
+        self._stopped.set()
+
+    def poll(self) -> List:
+        """한 번 훑고 이전 스냅샷과 비교 (폴더를 읽지 못하면 이전 스냅샷 유지, 이벤트 없음)"""
+        start = time.perf_counter()
+        try:
+            snapshot = take_snapshot(self.root, self.is_ignored, self.recursive)
+        except ScanError as e:
+            # 연결이 잠시 끊긴 공유 폴더를 '전부 삭제됨'으로 처리하지 않도록 이번 결과는 버린다
+            self.errors += 1
+            logger.warning(f"⚠️ 폴링 실패 (다음 주기에 재시도): {e}")
+            return []
+        events = diff_snapshots(self.snapshot, snapshot)
+        self.snapshot = snapshot
+        self.polls += 1
+        self.last_poll_ms = (time.perf_counter() - start) * 1000
+        return events
+
+    def run(self):
+        try:
+            self.snapshot = take_snapshot(self.root, self.is_ignored, self.recursive)
+        except ScanError as e:
+            self.errors += 1
+            logger.warning(f"⚠️ 첫 폴링 실패: {e}")
+        while not self._stopped.wait(self.interval):
+            events = self.poll()
+            for event in events:
+                self.handler.dispatch(event)
+            # 변경이 있으면 바로 촘촘하게, 없으면 간격을 점점 늘린다
+            self.interval = self.min_interval if events else min(self.interval * 2, self.max_interval)
+
+    def status(self) -> Dict:
+        return {
+            "files": count_files(self.snapshot),
+            "directories": len(self.snapshot),
+            "polls": self.polls,
+            "errors": self.errors,
+            "last_poll_ms": round(self.last_poll_ms, 2),
+            "interval": self.interval,
+        }
@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+# program_blocks.py - 복지 사업 블록 분리 및 필드 파싱 (Python 내장 모듈만 사용)
+#
+# 문서는 "1. 사업명 / □ 대상: / □ 내용: / □ 방법: / □ 문의:" 형태의 사업 목록이다.
+# 질의마다 청크를 다시 나누고 파싱하지 않도록, 로드 시점에 블록과 필드를 한 번만 만들어 둔다.
+# 인덱싱 시점에는 iter_program_chunks로 사업 하나를 청크 하나로 만들 수도 있다 (ingest.py).
+
+from itertools import chain
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional
+
+from text_stream import STREAM_BLOCK_SIZE, iter_chunks, iter_lines
+
+PROGRAM_FIELDS = ("title", "target", "content", "amount", "method", "contact", "note")
+
+# 검색 색인 파일(search_artifact)에 저장하는 블록 필드 순서 (lower는 로드 시 다시 계산)
+BLOCK_ROW_FIELDS = ("chunk_index", "text", "heading") + PROGRAM_FIELDS
+
+# 사업 목록 문서인지 판단하는 필드 표시 (문서 앞부분에서 찾음)
+PROGRAM_MARKERS = ('□ 대상:', '□ 내용:', '□ 방법:', '□ 문의:')
+
+
+class ProgramBlock(NamedTuple):
+    """사업 블록 하나 (원문, 소문자 캐시, 파싱된 필드)"""
+    chunk_index: int
+    text: str
+    lower: str
+    heading: str  # 넘버링을 포함한 첫 줄 (중복 판정용)
+    title: str
+    target: str
+    content: str
+    amount: str
+    method: str
+    contact: str
+    note: str
+
+
+def is_program_start(line: str, has_current: bool) -> bool:
+    """새로운 사업 시작 줄인지 판단 (번호 목록 또는 □ 대상: 표시)"""
+    return is_numbered(line) or \
+        ('□ 대상:' in line and has_current)
+
+
+def is_numbered(line: str) -> bool:
+    """번호 목록 줄인지 ("1. 사업명")"""
+    return line.startswith(tuple('0123456789')) and '. ' in line
+
+
+def split_program_blocks(text: str) -> List[str]:
+    """청크 텍스트를 사업 블록 단위로 분리"""
+    program_blocks = []
+    current_block = []
+
+    for line in text.split('\n'):
+        line = line.strip()
+        if not line:
+            continue
+
+        if is_program_start(line, bool(current_block)):
+            if current_block:
+                program_blocks.append('\n'.join(current_block))
+                current_block = []
+
+        current_block.append(line)
+
+    if current_block:
+        program_blocks.append('\n'.join(current_block))
+
+    return program_blocks
+
+
+def parse_program_fields(block: str) -> Dict[str, str]:
+    """블록에서 제목/대상/내용/금액/방법/문의/참고 필드를 추출"""
+    fields = {name: '' for name in PROGRAM_FIELDS}
+
+    for line in block.split('\n'):
+        line = line.strip()
+        # 넘버링 제거 (숫자. 형태)
+        if line and '.' in line and line.split('.', 1)[0].isdigit():
+            line = line.split('.', 1)[1].strip()
+
+        if '대상:' in line:
+            fields['target'] = line.replace('□ 대상:', '').strip()
+        elif '내용:' in line:
+            fields['content'] = line.replace('□ 내용:', '').strip()
+        elif '금액:' in line or '지원액:' in line:
+            fields['amount'] = line.replace('□ 금액:', '').replace('□ 지원액:', '').strip()
+        elif '방법:' in line:
+            fields['method'] = line.replace('□ 방법:', '').strip()
+        elif '문의:' in line:
+            fields['contact'] = line.replace('□ 문의:', '').strip()
+        elif '※' in line:
+            fields['note'] = line.replace('※', '').strip()
+        elif line and not line.startswith('□') and not fields['title']:
+            fields['title'] = line
+
+    return fields
+
+
+def block_heading(block: str) -> str:
+    """□ 로 시작하지 않는 첫 줄 (없으면 빈 문자열)"""
+    for line in block.split('\n'):
+        if line.strip() and not line.strip().startswith('□'):
+            return line.strip()
+    return ''
+
+
+def make_block(chunk_index: int, block: str) -> ProgramBlock:
+    """블록 텍스트로 ProgramBlock 생성"""
+    return ProgramBlock(chunk_index, block, block.lower(), block_heading(block), **parse_program_fields(block))
+
+
+class ProgramChunk(NamedTuple):
+    """인덱싱용 청크 (사업 블록이면 fields에 파싱된 필드, 일반 텍스트면 None)"""
+    text: str
+    fields: Optional[Dict[str, str]]
+
+
+def split_programs(lines: Iterable[str]) -> Iterator[str]:
+    """줄 스트림을 사업 단위로 분리 (인덱싱용)
+
+    split_program_blocks와 달리 "1. 사업명" 다음의 □ 대상: 줄은 같은 사업으로 묶고,
+    번호 없는 목록에서는 이미 대상: 줄이 있는 사업에 □ 대상:이 다시 나올 때 새 사업으로 본다.
+    빈 줄은 버리고 각 줄의 앞뒤 공백을 제거한다 (질의 시 블록 분리와 같은 정리).
+    """
+    current = []
+    has_target = False
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        if current and (is_numbered(line) or ('□ 대상:' in line and has_target)):
+            yield '\n'.join(current)
+            current = []
+            has_target = False
+        current.append(line)
+        has_target = has_target or '대상:' in line
+    if current:
+        yield '\n'.join(current)
+
+
+def iter_program_chunks(lines: Iterable[str], size: int, overlap: int) -> Iterator[ProgramChunk]:
+    """사업 하나당 청크 하나 (필드 포함)
+
+    - 필드(대상/내용/금액/방법/문의/참고)가 있는 블록은 그대로 청크가 되고, size보다 길면
+      size/overlap 규칙으로 나누되 조각마다 같은 필드를 붙인다.
+    - 필드가 없는 블록(문서 머리말, 분류 제목 등)은 이어 붙여 일반 텍스트 청크로 만든다.
+    """
+    plain = ''  # 아직 내보내지 않은 일반 텍스트
+
+    for block in split_programs(lines):
+        fields = parse_program_fields(block)
+        if not any(fields[name] for name in PROGRAM_FIELDS if name != 'title'):
+            if plain and len(plain) + 1 + len(block) > size:
+                yield from (ProgramChunk(piece, None) for piece in iter_chunks([plain], size, overlap))
+                plain = ''
+            plain = plain + '\n' + block if plain else block
+            continue
+
+        if plain:
+            yield from (ProgramChunk(piece, None) for piece in iter_chunks([plain], size, overlap))
+            plain = ''
+        for piece in iter_chunks([block], size, overlap):
+            yield ProgramChunk(piece, fields)
+
+    if plain:
+        yield from (ProgramChunk(piece, None) for piece in iter_chunks([plain], size, overlap))
+
+
+def looks_like_program_list(blocks: Iterable[str], sample_size: int = STREAM_BLOCK_SIZE):
+    """문서 앞부분(sample_size 글자)에 사업 필드 표시가 있는지 판단
+
+    (판단 결과, 앞부분을 다시 붙인 블록 스트림)을 반환하므로 파일을 두 번 읽지 않는다.
+    """
+    blocks = iter(blocks)
+    head = []
+    head_size = 0
+    for block in blocks:
+        head.append(block)
+        head_size += len(block)
+        if head_size >= sample_size:
+            break
+    sample = ''.join(head)
+    return any(marker in sample for marker in PROGRAM_MARKERS), chain(head, blocks)
+
+
+def iter_structured_chunks(blocks: Iterable[str], size: int, overlap: int) -> Iterator[ProgramChunk]:
+    """원문 블록 스트림을 사업 단위 청크로 분할"""
+    return iter_program_chunks(iter_lines(blocks), size, overlap)
+
+
+class ProgramBlockTable:
+    """전체 청크의 사업 블록 표
+
+    blocks는 청크 순서대로 이어 붙인 블록 목록이고,
+    offsets[i]:offsets[i+1] 구간이 i번째 청크의 블록이다.
+    """
+
+    def __init__(self, texts: List[str]):
+        self.blocks: List[ProgramBlock] = []
+        self.offsets: List[int] = [0]
+        for chunk_index, text in enumerate(texts):
+            for block in split_program_blocks(text):
+                self.blocks.append(make_block(chunk_index, block))
+            self.offsets.append(len(self.blocks))
+
+    @classmethod
+    def from_rows(cls, rows: List[list], offsets) -> "ProgramBlockTable":
+        """검색 색인 파일에 저장된 블록 행(BLOCK_ROW_FIELDS 순서)으로 생성 - 분리·파싱 없음"""
+        self = cls.__new__(cls)
+        self.blocks = [ProgramBlock(row[0], row[1], row[1].lower(), *row[2:]) for row in rows]
+        self.offsets = list(offsets)
+        return self
+
+    def to_rows(self) -> List[list]:
+        """검색 색인 파일 저장용 블록 행 목록"""
+        return [[getattr(block, name) for name in BLOCK_ROW_FIELDS] for block in self.blocks]
+
+    def __len__(self):
+        return len(self.blocks)
+
+    def for_chunk(self, chunk_index: int) -> List[ProgramBlock]:
+        """chunk_index번째 청크의 블록 목록"""
+        return self.blocks[self.offsets[chunk_index]:self.offsets[chunk_index + 1]]
@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+# query_expansion.py - 키워드 확장 엔진 (Python 내장 모듈만 사용, 모든 진입점 공용)
+#
+# keyword_expansion.json의 동의어 표를 Aho–Corasick 오토마톤으로 한 번만 컴파일해 두고,
+# 질문은 한 번만 훑어서 걸린 키워드/동의어를 모두 찾는다.
+
+import json
+import os
+import threading
+import time
+from collections import deque
+from pathlib import Path
+from typing import Dict, List, Optional, Set
+
+DEFAULT_TABLE_PATH = Path(__file__).resolve().parent / "keyword_expansion.json"
+
+
+class AhoCorasick:
+    """여러 패턴을 텍스트 한 번 순회로 찾는 Aho–Corasick 오토마톤"""
+
+    def __init__(self, patterns):
+        self.goto: List[Dict[str, int]] = [{}]
+        self.fail: List[int] = [0]
+        self.output: List[List[str]] = [[]]
+
+        for pattern in patterns:
+            if not pattern:
+                continue
+            state = 0
+            for ch in pattern:
+                nxt = self.goto[state].get(ch)
+                if nxt is None:
+                    nxt = len(self.goto)
+                    self.goto[state][ch] = nxt
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.output.append([])
+                state = nxt
+            self.output[state].append(pattern)
+
+        # BFS로 실패 링크 구성, 출력은 실패 링크를 따라 합쳐 둠.
+        # 실패 전이를 미리 펼쳐 두어(DFA) 검색 시에는 문자당 dict 조회 한 번만 한다.
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in list(self.goto[state].items()):
+                queue.append(nxt)
+                self.fail[nxt] = self.goto[self.fail[state]].get(ch, 0) if state else 0
+                self.output[nxt] = self.output[nxt] + self.output[self.fail[nxt]]
+            if state:
+                for ch, target in self.goto[self.fail[state]].items():
+                    self.goto[state].setdefault(ch, target)
+        self.output_sets = [frozenset(out) for out in self.output]
+
+    def find(self, text: str) -> Set[str]:
+        """텍스트에 등장하는 패턴 집합"""
+        goto, output = self.goto, self.output_sets
+        root = goto[0]
+        found = set()
+        state = 0
+        for ch in text:
+            state = goto[state].get(ch) or root.get(ch, 0)
+            if output[state]:
+                found |= output[state]
+        return found
+
+
+class _CompiledTable:
+    """동의어 표 + 오토마톤 + 패턴→그룹 역참조 (교체 단위)"""
+
+    def __init__(self, table: Dict[str, List[str]]):
+        self.groups = [(keyword.lower(), [s.lower() for s in synonyms]) for keyword, synonyms in table.items()]
+        self.pattern_groups: Dict[str, List[int]] = {}
+        for gi, (keyword, synonyms) in enumerate(self.groups):
+            for term in [keyword] + synonyms:
+                groups = self.pattern_groups.setdefault(term, [])
+                if not groups or groups[-1] != gi:
+                    groups.append(gi)
+        self.automaton = AhoCorasick(self.pattern_groups.keys())
+        # 같은 질문이 반복 확장되는 경우(블록별 점수 계산 등)를 위한 결과 캐시
+        self.terms_cache: Dict[str, tuple] = {}
+
+    def expanded_terms(self, query_lower: str) -> List[str]:
+        """캐시 없이 확장 용어 계산 (걸린 그룹만 표 순서대로 처리)"""
+        matched = self.automaton.find(query_lower)
+        if not matched:
+            return []
+
+        groups = set()
+        for term in matched:
+            groups.update(self.pattern_groups[term])
+
+        expanded: List[str] = []
+        seen = set()
+        for gi in sorted(groups):
+            keyword, synonyms = self.groups[gi]
+            if keyword in matched:
+                expanded.extend(synonyms)
+                seen.update(synonyms)
+            for synonym in synonyms:
+                if synonym in matched and keyword not in seen:
+                    expanded.append(keyword)
+                    seen.add(keyword)
+                    others = [s for s in synonyms if s != synonym]
+                    expanded.extend(others)
+                    seen.update(others)
+        return list(dict.fromkeys(expanded))
+
+
+class KeywordExpander:
+    """질문 확장기 - 표는 파일에서 읽고, 파일이 바뀌면 재시작 없이 다시 컴파일"""
+
+    MAX_CACHED_QUERIES = 4096
+
+    def __init__(self, table_path=DEFAULT_TABLE_PATH, table: Optional[Dict[str, List[str]]] = None,
+                 check_interval: float = 5.0):
+        self.table_path = Path(table_path) if table_path else None
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._mtime = None
+        self._last_check = time.monotonic()
+        if table is not None:
+            self._compiled = _CompiledTable(table)
+        else:
+            self._compiled = _CompiledTable({})
+            self.reload()
+
+    @property
+    def table(self) -> Dict[str, List[str]]:
+        return {keyword: list(synonyms) for keyword, synonyms in self._compiled.groups}
+
+    def reload(self) -> bool:
+        """표 파일을 다시 읽어 컴파일 (실패 시 기존 표 유지)"""
+        if not self.table_path:
+            return False
+        with self._lock:
+            try:
+                mtime = os.stat(self.table_path).st_mtime
+                with open(self.table_path, "r", encoding="utf-8") as f:
+                    table = json.load(f)
+                compiled = _CompiledTable(table)
+            except Exception as e:
+                print(f"❌ 키워드 확장 표 로드 실패 ({self.table_path}): {e}")
+                return False
+            # 참조 교체는 원자적이므로 검색 중인 스레드는 이전 표를 그대로 사용
+            self._compiled = compiled
+            self._mtime = mtime
+            return True
+
+    def _maybe_reload(self):
+        """check_interval마다 파일 수정 시각을 확인해 바뀌었으면 재컴파일"""
+        if not self.table_path or self.check_interval is None:
+            return
+        now = time.monotonic()
+        if now - self._last_check < self.check_interval:
+            return
+        self._last_check = now
+        try:
+            mtime = os.stat(self.table_path).st_mtime
+        except OSError:
+            return
+        if mtime != self._mtime:
+            self.reload()
+
+    def matched_terms(self, text: str) -> Set[str]:
+        """텍스트에 등장하는 키워드/동의어 집합 (한 번의 순회)"""
+        self._maybe_reload()
+        return self._compiled.automaton.find(text.lower())
+
+    def expanded_terms(self, query: str) -> List[str]:
+        """확장 용어 목록 (기존 expand_query의 중첩 스캔과 같은 규칙, 순서는 결정적)"""
+        self._maybe_reload()
+        compiled = self._compiled
+        cached = compiled.terms_cache.get(query)
+        if cached is None:
+            cached = tuple(compiled.expanded_terms(query.lower()))
+            if len(compiled.terms_cache) >= self.MAX_CACHED_QUERIES:
+                compiled.terms_cache.clear()
+            compiled.terms_cache[query] = cached
+        return list(cached)
+
+    def expand(self, query: str, max_terms: int = 5) -> str:
+        """질문 뒤에 확장 용어를 최대 max_terms개 덧붙인다"""
+        terms = self.expanded_terms(query)
+        if terms:
+            return f"{query} {' '.join(terms[:max_terms])}"
+        return query
+
+    def variants(self, query: str, max_variants: int = 4) -> List[str]:
+        """원본 질문 + 질문에 걸린 동의어 그룹마다 하나씩 만든 변형 질문 목록
+
+        동의어를 한 문자열에 모두 이어 붙이면 임베딩이 흐려지므로 그룹별로 나눈다.
+        """
+        self._maybe_reload()
+        compiled = self._compiled
+        query_lower = query.lower()
+        groups = set()
+        for term in compiled.automaton.find(query_lower):
+            groups.update(compiled.pattern_groups[term])
+
+        variants = [query]
+        for gi in sorted(groups):
+            if len(variants) >= max_variants:
+                break
+            keyword, synonyms = compiled.groups[gi]
+            extra = [term for term in [keyword] + synonyms if term not in query_lower]
+            if extra:
+                variants.append(f"{query} {' '.join(extra)}")
+        return variants
+
+
+# 전역 확장기 인스턴스 (KEYWORD_EXPANSION_FILE 환경변수로 표 파일 경로 변경 가능)
+expander = KeywordExpander(os.environ.get("KEYWORD_EXPANSION_FILE", DEFAULT_TABLE_PATH))
+
+
+def expand_query(query: str, max_terms: int = 5) -> str:
+    """질문을 확장하여 더 나은 검색 결과를 얻기"""
+    return expander.expand(query, max_terms)
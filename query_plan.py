@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+# query_plan.py - 질문 1건당 한 번만 만드는 질의 계획 (Python 내장 모듈만 사용)
+#
+# 소문자 변환, 키워드 확장, 대상 유형/의도 판단을 질문마다 한 번만 수행하고
+# 답변 파이프라인(검색 → 블록 점수 → 분류 → 포맷팅)에는 이 계획 객체를 넘긴다.
+
+import re
+from typing import Iterable, List, Optional
+
+from query_expansion import AhoCorasick, expander
+
+
+class TermMatcher:
+    """여러 용어 중 하나라도 포함되는지 검사 (정규식 하나로 컴파일)"""
+
+    def __init__(self, terms: Iterable[str]):
+        self.terms = tuple(terms)
+        self._pattern = re.compile('|'.join(map(re.escape, self.terms)))
+
+    def __call__(self, text: str) -> bool:
+        return self._pattern.search(text) is not None
+
+
+class ClassificationRule:
+    """대상 유형별 전용/우대/관련 판정 규칙"""
+
+    def __init__(self, primary, exclusive, prefer, related, exclusive_pair=None):
+        self.primary = TermMatcher(primary)      # 해당 대상 정책임을 나타내는 용어
+        self.exclusive = TermMatcher(exclusive)  # 전용 정책 표현
+        self.exclusive_pair = exclusive_pair     # 함께 있으면 전용으로 보는 용어 쌍
+        self.prefer = TermMatcher(prefer)        # 우대 판정 시 대상 용어
+        self.related = TermMatcher(related)      # 관련 판정 용어
+
+
+PREFERENCE_MATCHER = TermMatcher(['우대', '가점', '우선', '추가 지원'])
+
+CLASSIFICATION_RULES = {
+    "다자녀": ClassificationRule(
+        primary=['다자녀가정', '다자녀 가정', '셋째아이', '3자녀'],
+        exclusive=['만을 대상', '다자녀만', '다자녀가정 대상'],
+        exclusive_pair=('다자녀', '대상'),
+        prefer=['다자녀'],
+        related=['다자녀', '셋째', '3자녀'],
+    ),
+    "한부모": ClassificationRule(
+        primary=['한부모가정', '한부모 가정', '모자가정', '부자가정'],
+        exclusive=['만을 대상', '한부모만', '한부모가정 대상'],
+        exclusive_pair=('한부모', '대상'),
+        prefer=['한부모'],
+        related=['한부모', '모자', '부자'],
+    ),
+    "임신출산": ClassificationRule(
+        primary=['임산부', '임신부', '출산', '신생아', '임신', '해산', '분만', '산후조리', '출산비', '임신축하'],
+        exclusive=['임산부 대상', '출산 지원', '임산부', '출산'],
+        prefer=['임산부', '출산', '임신', '해산', '분만', '산후조리'],
+        related=['임신', '임산부', '출산', '신생아', '해산', '분만', '산후조리', '출산비', '임신축하'],
+    ),
+    "보육": ClassificationRule(
+        primary=['어린이집', '보육료', '보육지원'],
+        exclusive=['보육 대상', '어린이집 대상'],
+        prefer=['보육', '어린이집'],
+        related=['보육', '어린이집', '아동'],
+    ),
+}
+
+# 특정 정책 상세 설명 요청 패턴
+DETAIL_PATTERNS = (
+    '설명해줘', '설명해', '알려줘', '알려주세요', '뭐야', '뭔가요', '무엇인가요',
+    '자세히', '상세히', '구체적으로', '어떤 내용', '어떤거야', '어떤건가요',
+    '에 대해서', '에 대해', '관해서', '관해'
+)
+
+# 추가/더보기 요청 패턴
+MORE_PATTERNS = (
+    '다른거', '더 있어', '더 있나', '또 있어', '또 있나', '다른', '추가로',
+    '더', '또', '외에', '말고', '이외에'
+)
+
+# 질문에서 찾는 대상 용어 (우선순위 순서)
+TARGET_TERMS = ('다자녀', '한부모', '임신', '임산부', '출산', '보육', '어린이집', '부모급여')
+
+# 질문 분석용 용어를 한 번에 찾는 오토마톤 (질문 1회 순회)
+_QUERY_AUTOMATON = AhoCorasick(set(DETAIL_PATTERNS) | set(MORE_PATTERNS) | set(TARGET_TERMS))
+
+
+def _target_type(found) -> str:
+    """분류용 대상 유형 (임신/출산은 하나로, 어린이집은 보육으로 묶음)"""
+    if '다자녀' in found:
+        return "다자녀"
+    if '한부모' in found:
+        return "한부모"
+    if '임신' in found or '임산부' in found or '출산' in found:
+        return "임신출산"
+    if '보육' in found or '어린이집' in found:
+        return "보육"
+    return ""
+
+
+def _target_name(found) -> str:
+    """답변 인사말에 쓰는 대상 이름"""
+    if '다자녀' in found:
+        return "다자녀가정"
+    if '한부모' in found:
+        return "한부모가정"
+    if '임신' in found or '임산부' in found:
+        return "임신·출산"
+    if '보육' in found:
+        return "보육"
+    return "관련"
+
+
+def _intent(found):
+    """질문 의도 (detail / more / list)와 상세 설명 대상 정책"""
+    # 특정 정책명이 포함되어 있고 상세 설명 요청인 경우
+    if any(pattern in found for pattern in DETAIL_PATTERNS):
+        potential_policy = ""
+        if '부모급여' in found:
+            potential_policy = "부모급여"
+        elif '다자녀' in found:
+            potential_policy = "다자녀"
+        elif '한부모' in found:
+            potential_policy = "한부모"
+        elif '임신' in found or '임산부' in found:
+            potential_policy = "임신출산"
+        elif '보육' in found:
+            potential_policy = "보육"
+
+        if potential_policy:
+            return "detail", potential_policy
+
+    # 추가 정보 요청인 경우
+    if any(pattern in found for pattern in MORE_PATTERNS):
+        return "more", ""
+
+    # 기본은 목록 요청
+    return "list", ""
+
+
+class QueryPlan:
+    """질문 1건의 분석 결과 (답변 파이프라인 전체에서 재사용)
+
+    - text / lower: 원문과 소문자 질문
+    - keywords: 질문 단어 목록 (블록 점수용)
+    - expanded / expanded_keywords: 확장 질문과 그 단어 목록 (검색·블록 점수용)
+    - target_type / target_name: 분류용 대상 유형, 인사말용 대상 이름
+    - intent / policy: 질문 의도와 상세 설명 대상 정책
+    - rule: 대상 유형의 분류 규칙 (대상이 없으면 None)
+    """
+
+    def __init__(self, text: str):
+        self.text = text
+        self.lower = text.lower()
+        self.keywords: List[str] = self.lower.split()
+        self.expanded = expander.expand(text)
+        self.expanded_keywords: List[str] = self.expanded.lower().split()
+
+        found = _QUERY_AUTOMATON.find(self.lower)
+        self.target_type = _target_type(found)
+        self.target_name = _target_name(found)
+        self.intent, self.policy = _intent(found)
+        self.rule: Optional[ClassificationRule] = CLASSIFICATION_RULES.get(self.target_type)
+
+    def classify(self, content_lower: str) -> str:
+        """프로그램을 전용/우대/관련/무관련으로 분류 (content_lower는 소문자 블록 텍스트)"""
+        rule = self.rule
+        if rule is None:
+            return "관련"
+
+        # 전용 정책 판단 (대상이 명시적으로 해당 대상만을 위한 것)
+        if rule.primary(content_lower):
+            if rule.exclusive(content_lower):
+                return "전용"
+            if rule.exclusive_pair and all(term in content_lower for term in rule.exclusive_pair):
+                return "전용"
+
+        # 우대 정책 판단 (일반 정책에서 우대 조건)
+        if PREFERENCE_MATCHER(content_lower) and rule.prefer(content_lower):
+            return "우대"
+
+        # 키워드가 있으면 관련, 없으면 무관련
+        if rule.related(content_lower):
+            return "관련"
+        return "무관련"
@@ -0,0 +1,111 @@
+# reconcile.py - 서버 시작 시 data/ 폴더와 인덱스 대조 (Python 내장 모듈만 사용)
+#
+# 서버가 꺼져 있는 동안 추가·수정·삭제된 파일은 파일 워쳐 이벤트가 없으므로,
+# 시작할 때 data/를 os.scandir로 훑어 index/manifest.json(파일별 크기·수정 시각·내용 해시)과 비교하고
+# 달라진 파일만 증분 인덱싱 대상으로 돌려준다. 내용은 읽지 않고 stat만 하므로 파일이 많아도 빠르다.
+
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
+
+MANIFEST_NAME = "manifest.json"
+SCAN_WORKERS = int(os.environ.get("SCAN_WORKERS", 8))  # stat 병렬 처리 스레드 수 (네트워크 드라이브에서 효과가 큼)
+SCAN_BATCH = 256  # 스레드 하나가 한 번에 stat하는 항목 수
+
+
+class FileStat(NamedTuple):
+    path: str
+    size: int
+    mtime_ns: int
+
+
+def _stat_entries(entries: List[os.DirEntry]) -> List[Tuple[str, FileStat]]:
+    stats = []
+    for entry in entries:
+        try:
+            st = entry.stat()
+        except OSError:
+            continue  # 훑는 도중 삭제된 파일
+        stats.append((entry.name, FileStat(entry.path, st.st_size, st.st_mtime_ns)))
+    return stats
+
+
+def scan_files(data_dir: Path, extensions: Iterable[str], workers: int = SCAN_WORKERS,
+               is_ignored: Optional[Callable[[str], bool]] = None) -> Dict[str, FileStat]:
+    """data_dir 바로 아래의 대상 파일 (이름 → 경로·크기·수정 시각)
+
+    파일 워쳐와 같은 범위(하위 폴더 제외, 같은 무시 패턴)와 같은 키(파일 이름)를 쓴다.
+    목록은 os.scandir 한 번으로 얻고, 항목별 stat은 SCAN_BATCH개씩 스레드 풀에서 병렬로 수행한다.
+    """
+    extensions = {e.lower() for e in extensions}
+    try:
+        with os.scandir(data_dir) as it:
+            entries = [entry for entry in it
+                       if os.path.splitext(entry.name)[1].lower() in extensions
+                       and not (is_ignored and is_ignored(entry.name)) and entry.is_file()]
+    except FileNotFoundError:
+        return {}
+
+    batches = [entries[i:i + SCAN_BATCH] for i in range(0, len(entries), SCAN_BATCH)]
+    if len(batches) <= 1 or workers <= 1:
+        return dict(_stat_entries(entries))
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="scan") as pool:
+        return {name: stat for stats in pool.map(_stat_entries, batches) for name, stat in stats}
+
+
+def load_manifest(index_dir: Path) -> Dict[str, Dict]:
+    """index/manifest.json (이름 → {size, mtime_ns, content_hash}) - 없거나 깨졌으면 빈 dict"""
+    try:
+        with open(index_dir / MANIFEST_NAME, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_manifest(index_dir: Path, manifest: Dict[str, Dict]):
+    """manifest.json 저장 (임시 파일에 쓴 뒤 교체)"""
+    path = index_dir / MANIFEST_NAME
+    tmp_path = path.with_name(path.name + ".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def seed_manifest(scanned: Dict[str, FileStat], indexed_sources: Set[str]) -> Dict[str, Dict]:
+    """manifest가 없던 이전 버전 인덱스용 - 이미 인덱스에 있는 파일은 현재 크기·수정 시각을 기준으로 기록
+
+    content_hash는 비워 두므로 이후 파일이 바뀌면 해시 비교 없이 다시 임베딩된다.
+    (이 기록 전에, 서버가 꺼져 있는 동안 바뀐 파일은 다음 수정 때까지 반영되지 않는다)
+    """
+    return {name: {"size": stat.size, "mtime_ns": stat.mtime_ns, "content_hash": None}
+            for name, stat in scanned.items() if name in indexed_sources}
+
+
+class ReconcilePlan(NamedTuple):
+    added: List[str]    # 인덱스에 없는 파일
+    changed: List[str]  # 크기·수정 시각이 manifest와 다른 파일 (내용 해시는 인덱싱 시 확인)
+    removed: List[str]  # 인덱스에는 있지만 디스크에 없는 파일
+    unchanged: int
+
+    def paths(self, data_dir: Path) -> List[Path]:
+        """증분 인덱싱에 넘길 경로 (삭제된 파일은 존재하지 않는 경로로 넘겨 제거되게 함)"""
+        return [data_dir / name for name in self.added + self.changed + self.removed]
+
+
+def plan_reconcile(scanned: Dict[str, FileStat], manifest: Dict[str, Dict],
+                   indexed_sources: Set[str]) -> ReconcilePlan:
+    """디스크 상태와 manifest/인덱스를 비교해 다시 인덱싱할 파일 목록 생성"""
+    added, changed = [], []
+    unchanged = 0
+    for name, stat in sorted(scanned.items()):
+        entry: Optional[Dict] = manifest.get(name)
+        if entry is None:
+            added.append(name)
+        elif entry.get("size") != stat.size or entry.get("mtime_ns") != stat.mtime_ns:
+            changed.append(name)
+        else:
+            unchanged += 1
+    removed = sorted((set(manifest) | indexed_sources) - set(scanned))
+    return ReconcilePlan(added, changed, removed, unchanged)
@@ -0,0 +1,258 @@
+# retrieval.py - 벡터 검색 보조 기능: 다중 질의, MMR 다양화, 메타데이터 필터, 적응형 top-k (app.py / app_serverless.py 공용)
+import threading
+import numpy as np
+from pathlib import Path
+from collections import defaultdict, deque, Counter
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+
+def fuse_max_scores(D: np.ndarray, I: np.ndarray):
+    """여러 질의의 검색 결과(D, I 행렬)를 문서별 최대 점수로 합친다
+
+    반환값은 점수 내림차순으로 정렬된 (ids, scores) 배열.
+    """
+    ids = I.ravel()
+    scores = D.ravel()
+    valid = ids >= 0
+    ids, scores = ids[valid], scores[valid]
+    # 점수 내림차순 정렬 후 각 id의 첫 등장(=최대 점수)만 남김
+    order = np.argsort(-scores, kind="stable")
+    ids, scores = ids[order], scores[order]
+    _, first = np.unique(ids, return_index=True)
+    first.sort()
+    return ids[first], scores[first]
+
+
+def search_candidates(
+    index,
+    q_emb: np.ndarray,
+    fetch_k: int,
+    candidate_count: int,
+    min_score: float,
+    search_params=None,
+    metas: Optional[Sequence[Dict]] = None,
+    k: int = 0,
+    max_per_source: Optional[int] = None,
+    max_widen: int = 0,
+) -> List[Tuple[int, float]]:
+    """index.search로 유사도 min_score 이상인 후보 (위치, 점수) 목록 (점수 내림차순)
+
+    q_emb에 변형 질문이 여러 개면 위치별 최고 점수로 합친다.
+    metas를 넘기면(MMR 사용 시) 문서당 상한 max_per_source를 적용하고도 k개를 고를 수 있을 때까지
+    fetch_k를 두 배씩 늘려 최대 max_widen번 다시 검색한다.
+    임계값에 걸려 잘린 후보가 있으면 더 넓혀도 임계값 아래 후보만 늘어나므로 멈춘다.
+    """
+    for widen in range(max_widen + 1):
+        D, I = index.search(q_emb, fetch_k, params=search_params)
+        ids, scores = fuse_max_scores(D, I) if len(q_emb) > 1 else (I[0], D[0])
+        hits = [(int(i), float(score)) for i, score in zip(ids, scores) if i >= 0 and score >= min_score]
+        if (metas is None or widen == max_widen or fetch_k >= candidate_count
+                or len(hits) < np.count_nonzero(ids >= 0)):
+            break
+        per_source = Counter(metas[i]["source"] for i, _ in hits)
+        if not max_per_source or sum(min(n, max_per_source) for n in per_source.values()) >= k:
+            break
+        fetch_k = min(fetch_k * 2, candidate_count)
+    return hits
+
+
+def mmr_select(
+    query_vec: np.ndarray,
+    cand_vecs: np.ndarray,
+    k: int,
+    lambda_mult: float = 0.7,
+    rel_scores: Optional[np.ndarray] = None,
+    sources: Optional[Sequence[str]] = None,
+    max_per_source: Optional[int] = None,
+) -> List[int]:
+    """Maximal Marginal Relevance로 관련성과 다양성을 함께 고려해 후보를 고른다
+
+    query_vec와 cand_vecs는 정규화된 벡터라고 가정하므로 내적이 곧 코사인 유사도다.
+    반환값은 cand_vecs 안에서의 위치(선택 순서대로)이다.
+    max_per_source 상한 때문에 남은 후보가 모자라면 상한에 걸린 후보로 나머지를 채워
+    후보가 k개 이상이면 항상 k개를 돌려준다 (상한은 앞 순위의 다양성만 보장).
+    """
+    n = cand_vecs.shape[0]
+    k = min(k, n)
+    if k <= 0:
+        return []
+
+    cand_vecs = np.asarray(cand_vecs, dtype="float32")
+    if rel_scores is None:
+        rel_scores = cand_vecs @ np.asarray(query_vec, dtype="float32").reshape(-1)
+    rel_scores = np.asarray(rel_scores, dtype="float32")
+
+    # 후보 간 유사도 행렬은 한 번만 계산
+    pairwise = cand_vecs @ cand_vecs.T
+    max_sim = np.zeros(n, dtype="float32")
+    available = np.ones(n, dtype=bool)
+
+    source_codes = None
+    source_counts = None
+    if sources is not None and max_per_source:
+        _, source_codes = np.unique(np.asarray(sources, dtype=object), return_inverse=True)
+        source_counts = np.zeros(source_codes.max() + 1, dtype=np.int64)
+
+    selected: List[int] = []
+    for _ in range(k):
+        if not available.any():
+            # 상한에 걸려 빠진 후보로 나머지를 채운다
+            available[:] = True
+            available[selected] = False
+            source_codes = None
+        mmr = lambda_mult * rel_scores - (1.0 - lambda_mult) * max_sim
+        mmr[~available] = -np.inf
+        j = int(np.argmax(mmr))
+        selected.append(j)
+        available[j] = False
+        np.maximum(max_sim, pairwise[j], out=max_sim)
+
+        # 출처별 상한에 도달하면 같은 문서의 나머지 청크는 후보에서 제외
+        if source_codes is not None:
+            code = source_codes[j]
+            source_counts[code] += 1
+            if source_counts[code] >= max_per_source:
+                available[source_codes == code] = False
+
+    return selected
+
+
+def adaptive_cutoff(
+    scores: Sequence[float],
+    min_k: int = 1,
+    max_k: Optional[int] = None,
+    mode: str = "knee",
+    threshold: float = 0.35,
+    min_gap: float = 0.05,
+) -> int:
+    """내림차순 유사도 점수에서 실제로 사용할 결과 개수를 고른다
+
+    - knee: 연속한 점수 사이의 낙폭이 가장 큰 지점에서 자른다 (낙폭이 min_gap 미만이면 자르지 않음)
+    - threshold: 보정된 절대 임계값 이상인 결과만 남긴다
+    - 그 외(fixed): max_k개를 모두 사용
+    결과는 항상 [min_k, max_k] 범위로 제한된다.
+    """
+    s = np.asarray(scores, dtype="float32")
+    if max_k is not None:
+        s = s[:max_k]
+    n = len(s)
+    min_k = min(max(min_k, 1), n)
+    if n <= min_k:
+        return n
+
+    if mode == "knee":
+        # gaps[c-1]은 c번째와 c+1번째 결과 사이의 낙폭 → c개에서 자르는 경우
+        gaps = s[:-1] - s[1:]
+        window = gaps[min_k - 1:]
+        best = int(np.argmax(window))
+        if window[best] >= min_gap:
+            return min_k + best
+        return n
+    if mode == "threshold":
+        return int(min(max(int((s >= threshold).sum()), min_k), n))
+    return n
+
+
+class RetrievalStats:
+    """요청별로 선택된 k, 프롬프트 토큰 수, LLM 지연 시간을 기록 (최근 N건)"""
+
+    def __init__(self, maxlen: int = 1000):
+        self._records = deque(maxlen=maxlen)
+        self._lock = threading.Lock()
+
+    def record(self, k: int, prompt_tokens: Optional[int] = None, llm_ms: Optional[float] = None):
+        with self._lock:
+            self._records.append({
+                "k": k,
+                "prompt_tokens": prompt_tokens,
+                "llm_ms": llm_ms,
+            })
+
+    def summary(self) -> Dict:
+        with self._lock:
+            records = list(self._records)
+        if not records:
+            return {"requests": 0}
+
+        def avg(key):
+            values = [r[key] for r in records if r[key] is not None]
+            return round(sum(values) / len(values), 2) if values else None
+
+        return {
+            "requests": len(records),
+            "avg_k": avg("k"),
+            "avg_prompt_tokens": avg("prompt_tokens"),
+            "avg_llm_ms": avg("llm_ms"),
+            "k_histogram": dict(sorted(Counter(r["k"] for r in records).items())),
+        }
+
+
+class SourceFilterIndex:
+    """출처(파일명)·확장자 → 벡터 위치 역색인
+
+    필터 조건을 FAISS ID 선택자(비트맵)로 바꿔 index.search 안에서 걸러내므로
+    상위 k개를 뽑은 뒤 후처리로 버리는 것보다 결과가 비지 않는다.
+    """
+
+    MAX_CACHED_FILTERS = 128
+
+    def __init__(self, metas: List[Dict]):
+        self.ntotal = len(metas)
+        by_source = defaultdict(list)
+        by_extension = defaultdict(list)
+        for pos, meta in enumerate(metas):
+            by_source[meta["source"]].append(pos)
+            by_extension[Path(meta["source"]).suffix.lower()].append(pos)
+        self.by_source = {s: np.array(p, dtype="int64") for s, p in by_source.items()}
+        self.by_extension = {e: np.array(p, dtype="int64") for e, p in by_extension.items()}
+        self._cache = {}
+        self._cache_lock = threading.Lock()  # FastAPI 스레드풀의 동시 요청이 캐시를 함께 조회·추가·제거
+
+    @staticmethod
+    def _normalize_extensions(extensions: Iterable[str]) -> frozenset:
+        return frozenset(e.lower() if e.startswith(".") else f".{e.lower()}" for e in extensions)
+
+    def mask(self, sources: Optional[Iterable[str]] = None, extensions: Optional[Iterable[str]] = None) -> np.ndarray:
+        """조건에 맞는 위치의 불리언 마스크 (출처 조건과 확장자 조건은 AND)"""
+        mask = np.ones(self.ntotal, dtype=bool)
+        if sources:
+            selected = np.zeros(self.ntotal, dtype=bool)
+            for source in sources:
+                if source in self.by_source:
+                    selected[self.by_source[source]] = True
+            mask &= selected
+        if extensions:
+            selected = np.zeros(self.ntotal, dtype=bool)
+            for ext in self._normalize_extensions(extensions):
+                if ext in self.by_extension:
+                    selected[self.by_extension[ext]] = True
+            mask &= selected
+        return mask
+
+    def search_params(self, sources: Optional[Iterable[str]] = None, extensions: Optional[Iterable[str]] = None):
+        """필터 조건에 대한 (faiss.SearchParameters, 대상 벡터 수)를 반환
+
+        필터가 없으면 (None, ntotal). 같은 조건은 캐시된 비트맵을 재사용한다.
+        """
+        if not sources and not extensions:
+            return None, self.ntotal
+
+        key = (frozenset(sources or ()), self._normalize_extensions(extensions or ()))
+        with self._cache_lock:
+            cached = self._cache.get(key)
+        if cached is None:
+            # 비트맵 생성은 잠금 밖에서 (같은 조건을 동시에 만들면 먼저 넣은 쪽을 쓴다)
+            mask = self.mask(sources, extensions)
+            bitmap = np.packbits(mask, bitorder="little")
+            import faiss  # 필터 검색에서만 필요 (서버리스 콜드 스타트 때 import 시간 절약)
+            selector = faiss.IDSelectorBitmap(len(bitmap), faiss.swig_ptr(bitmap))
+            params = faiss.SearchParameters(sel=selector)
+            # SWIG 객체가 참조하는 비트맵/선택자가 GC되지 않도록 함께 보관
+            built = (params, int(mask.sum()), bitmap, selector)
+            with self._cache_lock:
+                cached = self._cache.get(key)
+                if cached is None:
+                    if len(self._cache) >= self.MAX_CACHED_FILTERS:
+                        self._cache.pop(next(iter(self._cache)))
+                    cached = self._cache[key] = built
+        return cached[0], cached[1]
@@ -0,0 +1,242 @@
+#!/usr/bin/env python3
+# search_artifact.py - 빌드 시점 검색 색인 파일 (Python 내장 모듈만 사용)
+#
+# simple_ingest.py가 simple_meta.json과 함께 index/simple_search.idx를 만든다.
+# 용어 사전, 용어별 postings(청크 번호·등장 횟수), 청크 길이, 사업 블록을 담고 있어서
+# standalone_chatbot / simple_app은 시작할 때 코퍼스를 다시 토큰화하지 않는다.
+#
+# 파일 구조: MAGIC(8) | 헤더 길이(uint32) | JSON 헤더 | 8바이트 정렬된 uint32 배열 구역들 | 사업 블록(zlib JSON)
+# 배열 구역은 mmap 위에서 복사 없이 memoryview(또는 numpy.frombuffer)로 읽는다.
+
+import json
+import mmap
+import os
+import struct
+import sys
+import zlib
+from array import array
+from collections import Counter
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+MAGIC = b"RAGSIDX\0"
+ARTIFACT_VERSION = 1
+ARTIFACT_NAME = "simple_search.idx"
+
+_ARRAY_SECTIONS = ("doc_lengths", "offsets", "docs", "tfs", "block_offsets")
+
+
+def tokenize(text: str) -> List[str]:
+    """소문자 변환 후 공백 단위 단어를 문자 bigram으로 분해 (한 글자 단어는 그대로)"""
+    tokens = []
+    for word in text.lower().split():
+        if len(word) == 1:
+            tokens.append(word)
+        else:
+            tokens.extend(map(str.__add__, word[:-1], word[1:]))
+    return tokens
+
+
+class Postings:
+    """용어별 postings를 이어 붙인 배열 (용어 i의 구간은 offsets[i]:offsets[i+1])
+
+    용어 번호는 코퍼스에서 처음 등장한 순서이고, 각 구간의 청크 번호는 오름차순이다.
+    """
+
+    def __init__(self, vocab: List[str], offsets, docs, tfs, doc_lengths):
+        self.vocab = vocab
+        self.term_ids: Dict[str, int] = {term: i for i, term in enumerate(vocab)}
+        self.offsets = offsets
+        self.docs = docs
+        self.tfs = tfs
+        self.doc_lengths = doc_lengths
+
+    def __len__(self):
+        return len(self.vocab)
+
+    def get(self, term: str, default=None):
+        """term이 등장하는 청크 번호 목록 (복사 없는 슬라이스)"""
+        i = self.term_ids.get(term)
+        if i is None:
+            return default
+        return self.docs[self.offsets[i]:self.offsets[i + 1]]
+
+
+def build_postings(texts: Sequence[str]) -> Postings:
+    """코퍼스를 토큰화해 Postings 생성 (인덱싱 시점에 한 번)"""
+    vocab: Dict[str, int] = {}
+    docs_by_term: List[array] = []
+    tfs_by_term: List[array] = []
+    doc_lengths = array("I")
+
+    for doc_id, text in enumerate(texts):
+        tf = Counter(tokenize(text))
+        doc_lengths.append(sum(tf.values()))
+        for token, count in tf.items():
+            term_id = vocab.get(token)
+            if term_id is None:
+                term_id = vocab[token] = len(vocab)
+                docs_by_term.append(array("I"))
+                tfs_by_term.append(array("I"))
+            docs_by_term[term_id].append(doc_id)
+            tfs_by_term[term_id].append(count)
+
+    offsets = array("I", [0])
+    docs = array("I")
+    tfs = array("I")
+    for term_docs, term_tfs in zip(docs_by_term, tfs_by_term):
+        docs.extend(term_docs)
+        tfs.extend(term_tfs)
+        offsets.append(len(docs))
+    return Postings(list(vocab), offsets, docs, tfs, doc_lengths)
+
+
+class SearchArtifact:
+    """로드된 검색 색인 파일 (mmap을 열어 둔 채로 배열을 참조)"""
+
+    def __init__(self, header: Dict, postings: Postings, block_offsets, buffer=None):
+        self.header = header
+        self.version = header["version"]
+        self.n_docs = header["n_docs"]
+        self.postings = postings
+        self.block_offsets = block_offsets
+        self.buffer = buffer  # mmap (numpy.frombuffer로 같은 메모리를 볼 때 사용)
+        self.sections: Dict[str, List[int]] = header["sections"]
+        self._blocks: Optional[List[list]] = None
+
+    @property
+    def blocks(self) -> List[list]:
+        """사업 블록 행 목록 (처음 접근할 때 압축 해제)"""
+        if self._blocks is None:
+            offset, size = self.header["blocks"]
+            self._blocks = json.loads(zlib.decompress(self.buffer[offset:offset + size]).decode("utf-8"))
+        return self._blocks
+
+    def is_fresh(self, meta_path) -> bool:
+        """simple_meta.json이 이 색인을 만든 뒤 바뀌지 않았는지 (크기·수정 시각 비교)"""
+        try:
+            st = os.stat(meta_path)
+        except OSError:
+            return False
+        source = self.header.get("source", {})
+        return source.get("size") == st.st_size and source.get("mtime_ns") == st.st_mtime_ns
+
+
+def write_artifact(path, texts: Sequence[str], meta_path=None, blocks: Optional[List[list]] = None,
+                   block_offsets: Optional[Sequence[int]] = None) -> Dict:
+    """검색 색인 파일 저장 (임시 파일에 쓴 뒤 교체) - 헤더를 반환
+
+    blocks는 [chunk_index, text, heading, title, target, content, amount, method, contact, note] 목록,
+    block_offsets[i]:block_offsets[i+1]이 i번째 청크의 블록 구간이다.
+    """
+    postings = build_postings(texts)
+    block_offsets = array("I", block_offsets if block_offsets is not None else [0] * (len(texts) + 1))
+
+    arrays = {
+        "doc_lengths": postings.doc_lengths,
+        "offsets": postings.offsets,
+        "docs": postings.docs,
+        "tfs": postings.tfs,
+        "block_offsets": block_offsets,
+    }
+    source = {}
+    if meta_path is not None:
+        st = os.stat(meta_path)
+        source = {"size": st.st_size, "mtime_ns": st.st_mtime_ns}
+
+    header = {
+        "format": "simple-search",
+        "version": ARTIFACT_VERSION,
+        "byteorder": sys.byteorder,
+        "n_docs": len(texts),
+        "tokenizer": "word-bigram",
+        "source": source,
+        "vocab": postings.vocab,
+        "sections": {},
+        "blocks": [],
+    }
+    # 블록은 원문과 필드가 겹쳐 크기가 크므로 압축해서 배열 구역 뒤에 둔다
+    blocks_bytes = zlib.compress(json.dumps(blocks or [], ensure_ascii=False, separators=(",", ":")).encode("utf-8"), 6)
+
+    # 헤더 크기가 구역 위치에 영향을 주므로 위치가 안정될 때까지 반복 계산
+    while True:
+        header_bytes = json.dumps(header, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        position = _align(len(MAGIC) + 4 + len(header_bytes))
+        sections = {}
+        for name in _ARRAY_SECTIONS:
+            sections[name] = [position, len(arrays[name])]
+            position = _align(position + len(arrays[name]) * 4)
+        blocks_section = [position, len(blocks_bytes)]
+        if sections == header["sections"] and blocks_section == header["blocks"]:
+            break
+        header["sections"] = sections
+        header["blocks"] = blocks_section
+
+    path = Path(path)
+    tmp_path = path.with_name(path.name + ".tmp")
+    with open(tmp_path, "wb") as f:
+        f.write(MAGIC)
+        f.write(struct.pack("<I", len(header_bytes)))
+        f.write(header_bytes)
+        for name in _ARRAY_SECTIONS:
+            offset = sections[name][0]
+            f.write(b"\0" * (offset - f.tell()))
+            arrays[name].tofile(f)
+        f.write(b"\0" * (header["blocks"][0] - f.tell()))
+        f.write(blocks_bytes)
+    os.replace(tmp_path, path)
+    return header
+
+
+def load_artifact(path) -> Optional[SearchArtifact]:
+    """검색 색인 파일 로드 (없거나 형식·버전이 다르면 None)"""
+    try:
+        with open(path, "rb") as f:
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        return None
+
+    try:
+        if buffer[:len(MAGIC)] != MAGIC:
+            print(f"⚠️ 검색 색인 형식이 아닙니다: {path}")
+            return None
+        (header_len,) = struct.unpack_from("<I", buffer, len(MAGIC))
+        start = len(MAGIC) + 4
+        header = json.loads(bytes(buffer[start:start + header_len]).decode("utf-8"))
+        if header.get("version") != ARTIFACT_VERSION:
+            print(f"⚠️ 검색 색인 버전 불일치: {header.get('version')} (필요: {ARTIFACT_VERSION}) - 다시 인덱싱하세요")
+            return None
+
+        view = memoryview(buffer)
+        if header["byteorder"] == sys.byteorder:
+            arrays = {name: view[offset:offset + count * 4].cast("I")
+                      for name, (offset, count) in header["sections"].items()}
+        else:
+            # 다른 바이트 순서에서 만든 파일은 복사 후 변환
+            arrays = {}
+            for name, (offset, count) in header["sections"].items():
+                values = array("I")
+                values.frombytes(view[offset:offset + count * 4])
+                values.byteswap()
+                arrays[name] = values
+    except (ValueError, KeyError, struct.error) as e:
+        print(f"⚠️ 검색 색인 로드 실패 ({path}): {e}")
+        return None
+
+    postings = Postings(header["vocab"], arrays["offsets"], arrays["docs"], arrays["tfs"], arrays["doc_lengths"])
+    return SearchArtifact(header, postings, arrays["block_offsets"], buffer)
+
+
+def load_fresh_artifact(index_dir, meta_path, n_docs: int) -> Optional[SearchArtifact]:
+    """index_dir의 검색 색인을 로드하되, simple_meta.json과 맞지 않으면 None"""
+    artifact = load_artifact(Path(index_dir) / ARTIFACT_NAME)
+    if artifact is None:
+        return None
+    if artifact.n_docs != n_docs or not artifact.is_fresh(meta_path):
+        print("⚠️ 검색 색인이 simple_meta.json보다 오래되었습니다 - 실행 중에 색인을 만듭니다")
+        return None
+    return artifact
+
+
+def _align(position: int, alignment: int = 8) -> int:
+    return (position + alignment - 1) // alignment * alignment
@@ -0,0 +1,292 @@
+#!/usr/bin/env python3
+# serverless_bundle.py - 서버리스 배포용 빌드 시점 번들과 콜드 스타트 측정
+#
+# 콜드 스타트마다 meta.json 전체를 파싱하고 Hugging Face 허브에서 모델을 받는 대신,
+# 빌드할 때 bundle/에 다음을 미리 만들어 함수 패키지에 포함한다.
+#   manifest.json   - 번들 정보 (모델 이름, 차원, 청크 수, 만든 시각)
+#   faiss.index     - 검색 인덱스 (index/faiss.index 복사)
+#   metas.json      - 청크 메타데이터만 (본문 제외)
+#   texts.bin       - 청크 본문을 UTF-8로 이어 붙인 파일 (mmap으로 열고 필요한 청크만 디코딩)
+#   text_offsets.npy - texts.bin에서 i번째 청크의 구간은 offsets[i]:offsets[i+1]
+#   model/          - SentenceTransformer.save()로 내보낸 모델 (네트워크 없이 로드)
+#   onnx/           - (--onnx) embedding_backend.py로 내보낸 ONNX 모델 (EMBED_BACKEND=onnx, torch 불필요)
+#
+# 사용법:
+#   python serverless_bundle.py build              # index/ → bundle/
+#   python serverless_bundle.py build --onnx --skip-model   # torch 모델 대신 ONNX 모델만 포함
+#   python serverless_bundle.py profile            # 새 프로세스에서 app_serverless 콜드 스타트 단계별 시간 측정
+#   python serverless_bundle.py invoke             # netlify/functions/api.py 핸들러를 콜드/웜 호출해 지연 시간 측정
+
+import json
+import mmap
+import os
+import shutil
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+BUNDLE_VERSION = 1
+BUNDLE_DIR = Path(os.environ.get("SERVERLESS_BUNDLE_DIR", "bundle"))
+
+
+class ColdStartProfiler:
+    """모듈 import부터 첫 응답까지 단계별 소요 시간 기록
+
+    phase가 중첩되면(first_query 안의 load_model 등) 바깥 단계에는 안쪽 단계를 뺀 시간만 기록해
+    단계 합계(total_ms)가 같은 시간을 두 번 세지 않는다.
+    """
+
+    def __init__(self, start: Optional[float] = None):
+        self.start = start if start is not None else time.perf_counter()
+        self._last = self.start
+        self.phases: Dict[str, float] = {}
+        self._local = threading.local()  # 스레드별 진행 중인 phase의 안쪽 단계 시간 스택
+
+    def mark(self, name: str):
+        """이전 mark 이후 경과 시간을 name 단계로 기록"""
+        now = time.perf_counter()
+        self.phases[name] = self.phases.get(name, 0.0) + (now - self._last) * 1000
+        self._last = now
+
+    @contextmanager
+    def phase(self, name: str):
+        """with 블록의 소요 시간(안쪽 phase 제외)을 name 단계로 기록"""
+        stack = self._local.__dict__.setdefault("stack", [])
+        stack.append(0.0)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            now = time.perf_counter()
+            elapsed = (now - start) * 1000
+            nested = stack.pop()
+            if stack:
+                stack[-1] += elapsed
+            self.phases[name] = self.phases.get(name, 0.0) + elapsed - nested
+            self._last = now
+
+    def summary(self) -> Dict:
+        return {
+            "phases_ms": {name: round(ms, 1) for name, ms in self.phases.items()},
+            "total_ms": round(sum(self.phases.values()), 1),
+        }
+
+
+class ChunkTexts(Sequence):
+    """texts.bin 위의 청크 본문 목록 (접근한 청크만 디코딩)"""
+
+    def __init__(self, blob, offsets: np.ndarray):
+        self.blob = blob
+        self.offsets = offsets
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        return self.blob[int(self.offsets[i]):int(self.offsets[i + 1])].decode("utf-8")
+
+
+def write_texts(bundle_dir: Path, texts: List[str]):
+    offsets = np.zeros(len(texts) + 1, dtype="int64")
+    with open(bundle_dir / "texts.bin", "wb") as f:
+        for i, text in enumerate(texts):
+            data = text.encode("utf-8")
+            f.write(data)
+            offsets[i + 1] = offsets[i] + len(data)
+    np.save(bundle_dir / "text_offsets.npy", offsets)
+
+
+def load_texts(bundle_dir: Path) -> ChunkTexts:
+    offsets = np.load(bundle_dir / "text_offsets.npy")
+    path = bundle_dir / "texts.bin"
+    if path.stat().st_size == 0:
+        return ChunkTexts(b"", offsets)  # 빈 파일은 mmap할 수 없음
+    with open(path, "rb") as f:
+        blob = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    return ChunkTexts(blob, offsets)
+
+
+def load_manifest(bundle_dir: Path = BUNDLE_DIR) -> Optional[Dict]:
+    """번들 정보 (번들이 없거나 버전이 다르면 None)"""
+    try:
+        with open(bundle_dir / "manifest.json", "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if manifest.get("version") != BUNDLE_VERSION:
+        print(f"⚠️ 번들 버전 불일치: {manifest.get('version')} (필요: {BUNDLE_VERSION}) - 다시 빌드하세요")
+        return None
+    return manifest
+
+
+def load_chunks(bundle_dir: Path = BUNDLE_DIR):
+    """(metas, texts) - texts는 ChunkTexts"""
+    with open(bundle_dir / "metas.json", "r", encoding="utf-8") as f:
+        metas = json.load(f)
+    return metas, load_texts(bundle_dir)
+
+
+def build_bundle(index_dir: Path, bundle_dir: Path, model_name: Optional[str], onnx_model: Optional[str] = None) -> Dict:
+    """index/의 인덱스·메타데이터와 (model_name이 있으면) 모델, (onnx_model이 있으면) ONNX 모델을 bundle_dir에 내보내기"""
+    import faiss
+
+    index = faiss.read_index(str(index_dir / "faiss.index"))
+    with open(index_dir / "meta.json", "r", encoding="utf-8") as f:
+        store = json.load(f)
+    metas, texts = store["metas"], store["texts"]
+    if index.ntotal != len(metas):
+        raise ValueError(f"인덱스 벡터 수({index.ntotal})와 메타데이터 수({len(metas)})가 다릅니다")
+
+    tmp_dir = bundle_dir.with_name(bundle_dir.name + ".tmp")
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    tmp_dir.mkdir(parents=True)
+    shutil.copyfile(index_dir / "faiss.index", tmp_dir / "faiss.index")
+    with open(tmp_dir / "metas.json", "w", encoding="utf-8") as f:
+        json.dump(metas, f, ensure_ascii=False, separators=(",", ":"))
+    write_texts(tmp_dir, texts)
+
+    manifest = {
+        "version": BUNDLE_VERSION,
+        "built_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "n_chunks": len(metas),
+        "dim": index.d,
+        "model": None,
+        "onnx_model": None,
+    }
+    if model_name:
+        from sentence_transformers import SentenceTransformer
+        print(f"📦 모델 내보내는 중: {model_name}")
+        SentenceTransformer(model_name, device="cpu").save(str(tmp_dir / "model"))
+        manifest["model"] = model_name
+    if onnx_model:
+        from embedding_backend import export_onnx
+        print(f"📦 ONNX 모델 내보내는 중: {onnx_model}")
+        export_onnx(onnx_model, tmp_dir / "onnx")
+        manifest["onnx_model"] = onnx_model
+    with open(tmp_dir / "manifest.json", "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+
+    # 완성된 번들로 한 번에 교체
+    shutil.rmtree(bundle_dir, ignore_errors=True)
+    tmp_dir.rename(bundle_dir)
+    return manifest
+
+
+def profile_cold_start(query: str) -> Dict:
+    """새 프로세스에서 app_serverless를 import → 자원 로드 → 첫 검색까지 측정한 결과"""
+    import subprocess
+    import sys
+
+    code = (
+        "import time, json, asyncio\n"
+        "t = time.perf_counter()\n"
+        "import app_serverless as a\n"
+        "asyncio.run(a.load_resources())\n"
+        "with a.cold_start.phase('first_query'):\n"
+        f"    hits = a.search_similar({query!r})\n"
+        "result = a.cold_start.summary()\n"
+        "result['wall_ms'] = round((time.perf_counter() - t) * 1000, 1)\n"
+        "result['hits'] = len(hits)\n"
+        "print('COLD_START ' + json.dumps(result))\n"
+    )
+    env = dict(os.environ, NETLIFY="true")
+    proc = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, env=env,
+                          cwd=os.path.dirname(os.path.abspath(__file__)))
+    for line in proc.stdout.splitlines():
+        if line.startswith("COLD_START "):
+            return json.loads(line[len("COLD_START "):])
+    raise RuntimeError(f"콜드 스타트 측정 실패:\n{proc.stdout}\n{proc.stderr}")
+
+
+def simulate_invocations(question: str, warm: int) -> Dict:
+    """새 프로세스(= 새 컨테이너)에서 함수 핸들러를 Netlify 이벤트로 호출: 초기화, 콜드 호출, 웜 호출 지연 시간"""
+    import subprocess
+    import sys
+
+    code = (
+        "import time, json, importlib.util\n"
+        "t = time.perf_counter()\n"
+        "spec = importlib.util.spec_from_file_location('api', 'netlify/functions/api.py')\n"
+        "api = importlib.util.module_from_spec(spec)\n"
+        "spec.loader.exec_module(api)\n"
+        "init_ms = (time.perf_counter() - t) * 1000\n"
+        f"body = json.dumps({{'question': {question!r}}})\n"
+        "event = {'path': '/api/ask', 'httpMethod': 'POST', 'headers': {'content-type': 'application/json'},\n"
+        "         'queryStringParameters': {}, 'body': body, 'isBase64Encoded': False}\n"
+        "latencies = []\n"
+        f"for _ in range({warm + 1}):\n"
+        "    t = time.perf_counter()\n"
+        "    response = api.handler(event, None)\n"
+        "    latencies.append((time.perf_counter() - t) * 1000)\n"
+        "    assert response['statusCode'] == 200, response\n"
+        "ping = api.handler({'path': '/api/ping', 'httpMethod': 'GET'}, None)\n"
+        "result = {'init_ms': init_ms, 'latencies_ms': latencies, 'state': json.loads(ping['body'])}\n"
+        "print('INVOKE ' + json.dumps(result))\n"
+    )
+    env = dict(os.environ, NETLIFY="true")
+    proc = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, env=env,
+                          cwd=os.path.dirname(os.path.abspath(__file__)))
+    for line in proc.stdout.splitlines():
+        if line.startswith("INVOKE "):
+            return json.loads(line[len("INVOKE "):])
+    raise RuntimeError(f"함수 호출 측정 실패:\n{proc.stdout}\n{proc.stderr}")
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="서버리스 번들 빌드 / 콜드 스타트 측정")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("build", help="index/ → bundle/ 내보내기")
+    p.add_argument("--index-dir", default="index", help="인덱스 폴더 (기본값: index)")
+    p.add_argument("--out", default=str(BUNDLE_DIR), help="번들 폴더 (기본값: bundle)")
+    p.add_argument("--model", default="jhgan/ko-sroberta-multitask", help="내보낼 임베딩 모델")
+    p.add_argument("--skip-model", action="store_true", help="모델은 내보내지 않음 (실행 시 허브에서 받음)")
+    p.add_argument("--onnx", action="store_true", help="ONNX 모델도 내보냄 (EMBED_BACKEND=onnx용)")
+
+    p = sub.add_parser("profile", help="콜드 스타트 단계별 시간 측정")
+    p.add_argument("--query", default="출산 지원금 신청 방법", help="첫 검색 질의")
+    p.add_argument("--runs", type=int, default=3, help="측정 횟수 (기본값: 3)")
+
+    p = sub.add_parser("invoke", help="함수 핸들러 콜드/웜 호출 지연 시간 측정")
+    p.add_argument("--question", default="출산 지원금 신청 방법", help="/api/ask 질문")
+    p.add_argument("--containers", type=int, default=3, help="콜드 스타트 횟수 (기본값: 3)")
+    p.add_argument("--warm", type=int, default=20, help="컨테이너당 웜 호출 수 (기본값: 20)")
+
+    args = parser.parse_args()
+    if args.command == "build":
+        manifest = build_bundle(Path(args.index_dir), Path(args.out), None if args.skip_model else args.model,
+                                args.model if args.onnx else None)
+        size = sum(f.stat().st_size for f in Path(args.out).rglob("*") if f.is_file())
+        print(f"✅ 번들 생성: {args.out} (청크 {manifest['n_chunks']}개, {size / 1024 / 1024:.1f}MB)")
+    elif args.command == "invoke":
+        warm_latencies = []
+        for run in range(args.containers):
+            result = simulate_invocations(args.question, args.warm)
+            cold_ms, warm = result["latencies_ms"][0], result["latencies_ms"][1:]
+            warm_latencies += warm
+            print(f"#{run + 1}: 초기화 {result['init_ms']:.0f}ms + 콜드 호출 {cold_ms:.0f}ms = {result['init_ms'] + cold_ms:.0f}ms, "
+                  f"웜 호출 평균 {np.mean(warm):.1f}ms (호출 {result['state']['invocations']}회)")
+        if warm_latencies:
+            p50, p95 = np.percentile(warm_latencies, [50, 95])
+            print(f"🔥 웜 호출 {len(warm_latencies)}회: p50 {p50:.1f}ms, p95 {p95:.1f}ms")
+    else:
+        for run in range(args.runs):
+            result = profile_cold_start(args.query)
+            phases = ", ".join(f"{name} {ms:.0f}ms" for name, ms in result["phases_ms"].items())
+            print(f"#{run + 1}: 전체 {result['wall_ms']:.0f}ms - {phases} (검색 결과 {result['hits']}개)")
+
+
+if __name__ == "__main__":
+    main()
@@ -3,12 +3,17 @@
 
 import os
 import json
+import threading
+import time
 from pathlib import Path
 from fastapi import FastAPI, HTTPException
 from fastapi.staticfiles import StaticFiles
 from fastapi.responses import FileResponse
 from pydantic import BaseModel
 
+from sparse_index import SparseSearchIndex
+from search_artifact import load_fresh_artifact
+
 app = FastAPI(title="RAG Chatbot (Simple MVP)", description="문서 기반 질의응답 챗봇 - 간단한 버전")
 
 # 정적 파일 서빙 (프론트엔드)
@@ -16,52 +21,84 @@ app.mount("/static", StaticFiles(directory="frontend"), name="static")
 
 INDEX_DIR = Path("index")
 
-# === 인덱스 로드 ===
-try:
-    with open(INDEX_DIR / "simple_meta.json", "r", encoding="utf-8") as f:
+# 검색 점수 방식: bm25(기본) 또는 tfidf
+SEARCH_SCORING = os.environ.get("SIMPLE_SEARCH_SCORING", "bm25")
+BM25_K1 = float(os.environ.get("BM25_K1", 1.5))
+BM25_B = float(os.environ.get("BM25_B", 0.75))
+
+class SearchState:
+    """청크, 메타데이터, 희소 행렬 색인 묶음 (재로드 시 객체째 교체)"""
+    
+    def __init__(self, texts, metas, artifact=None):
+        self.texts = texts
+        self.metas = metas
+        start = time.perf_counter()
+        if artifact is not None:
+            # simple_ingest.py가 만든 postings로 바로 행렬 구성 (코퍼스 토큰화 생략)
+            self.index = SparseSearchIndex.from_postings(artifact.postings, len(texts),
+                                                         scoring=SEARCH_SCORING, k1=BM25_K1, b=BM25_B)
+        else:
+            self.index = SparseSearchIndex(texts, scoring=SEARCH_SCORING, k1=BM25_K1, b=BM25_B)
+        self.build_seconds = time.perf_counter() - start
+        self.from_artifact = artifact is not None
+        self.loaded_at = time.time()
+
+def load_state():
+    """simple_meta.json을 읽어 새 SearchState 생성 (실패 시 예외)"""
+    meta_path = INDEX_DIR / "simple_meta.json"
+    with open(meta_path, "r", encoding="utf-8") as f:
         store = json.load(f)
-    metas = store["metas"]
-    texts = store["texts"]
+    artifact = load_fresh_artifact(INDEX_DIR, meta_path, len(store["texts"]))
+    state = SearchState(store["texts"], store["metas"], artifact)
     print("✅ 간단한 인덱스 로드 완료")
-    print(f"📊 로드된 청크: {len(texts)}개")
+    print(f"📊 로드된 청크: {len(state.texts)}개, 용어 {len(state.index.vocab)}개, "
+          f"행렬 구축 {state.build_seconds:.2f}초 ({SEARCH_SCORING}, "
+          f"{'검색 색인 파일' if state.from_artifact else '실행 중 토큰화'})")
+    return state
+
+# === 인덱스 로드 ===
+# 요청은 시작 시점의 state 참조를 한 번 잡아서 쓰므로, 재로드 중 교체되어도 섞이지 않는다
+try:
+    state = load_state()
 except Exception as e:
     print(f"❌ 인덱스 로드 실패: {e}")
     print("   먼저 python simple_ingest.py를 실행하여 인덱스를 생성하세요.")
-    metas = []
-    texts = []
+    state = SearchState([], [])
+reload_lock = threading.Lock()
+reload_status = {"state": "idle"}  # 마지막 재로드 결과 (/health, /stats에 표시)
 
 class AskReq(BaseModel):
     question: str
 
 def simple_search(query: str, k=5):
-    """간단한 키워드 기반 검색"""
-    if not texts:
+    """키워드 검색 - 미리 만든 희소 행렬과 질의 벡터의 곱 한 번 + argpartition 상위 k개"""
+    current = state
+    if not current.texts:
         return []
     
-    query_lower = query.lower()
+    doc_ids, scores = current.index.search(query, k)
     results = []
-    
-    for i, text in enumerate(texts):
-        text_lower = text.lower()
-        # 간단한 키워드 매칭 점수 계산
-        score = 0
-        query_words = query_lower.split()
-        for word in query_words:
-            if word in text_lower:
-                score += text_lower.count(word)
-        
-        if score > 0:
-            results.append({
-                "rank": len(results) + 1,
-                "score": score,
-                "text": text,
-                "source": metas[i]["source"],
-                "chunk_id": metas[i]["chunk_id"]
-            })
-    
-    # 점수순으로 정렬하고 상위 k개 반환
-    results.sort(key=lambda x: x["score"], reverse=True)
-    return results[:k]
+    for rank, (i, score) in enumerate(zip(doc_ids.tolist(), scores.tolist()), 1):
+        results.append({
+            "rank": rank,
+            "score": round(score, 4),
+            "text": current.texts[i],
+            "source": current.metas[i]["source"],
+            "chunk_id": current.metas[i]["chunk_id"]
+        })
+    return results
+
+def reload_state():
+    """백그라운드 재로드 - 새 행렬을 다 만든 뒤 state 참조만 교체 (실패하면 기존 state 유지)"""
+    global state, reload_status
+    try:
+        state = load_state()
+        reload_status = {"state": "ok", "at": time.time()}
+    except Exception as e:
+        print(f"❌ 인덱스 재로드 실패 - 기존 인덱스를 계속 사용합니다: {e}")
+        reload_status = {"state": "failed", "error": str(e), "at": time.time()}
+    finally:
+        reload_lock.release()
 
 @app.get("/")
 async def read_root():
@@ -89,25 +126,43 @@ def ask(req: AskReq):
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"처리 중 오류 발생: {str(e)}")
 
+@app.post("/reload")
+def reload_index():
+    """인덱스 재로드 (백그라운드에서 행렬을 다시 만들고 완료되면 원자적으로 교체)"""
+    if not reload_lock.acquire(blocking=False):
+        return {"status": "already_reloading"}
+    threading.Thread(target=reload_state, daemon=True).start()
+    return {"status": "reloading", "current_chunks": len(state.texts)}
+
 @app.get("/health")
 def health_check():
     """헬스 체크"""
+    current = state
     return {
         "status": "healthy",
-        "index_loaded": len(texts) > 0,
-        "total_chunks": len(texts)
+        "index_loaded": len(current.texts) > 0,
+        "total_chunks": len(current.texts),
+        "reloading": reload_lock.locked(),
+        "last_reload": reload_status
     }
 
 @app.get("/stats")
 def get_stats():
     """통계 정보"""
-    if not texts:
-        return {"error": "인덱스가 로드되지 않았습니다."}
+    current = state
+    if not current.texts:
+        return {"error": "인덱스가 로드되지 않았습니다.", "last_reload": reload_status}
     
     return {
-        "total_chunks": len(texts),
-        "total_documents": len(set(meta["source"] for meta in metas)),
-        "search_type": "simple_keyword_search"
+        "total_chunks": len(current.texts),
+        "total_documents": len(set(meta["source"] for meta in current.metas)),
+        "search_type": f"sparse_{current.index.scoring}",
+        "vocab_size": len(current.index.vocab),
+        "matrix_nnz": current.index.nnz,
+        "build_seconds": round(current.build_seconds, 3),
+        "from_artifact": current.from_artifact,
+        "loaded_at": current.loaded_at,
+        "last_reload": reload_status
     }
 
 if __name__ == "__main__":
@@ -5,8 +5,14 @@ import os
 import json
 import re
 import glob
+import time
 from pathlib import Path
 
+# 검색 색인 파일 생성 (Python 내장 모듈만 사용)
+from program_blocks import ProgramBlockTable
+from search_artifact import ARTIFACT_NAME, ARTIFACT_VERSION, write_artifact
+from text_stream import iter_text_blocks, stream_chunks
+
 DATA_DIR = Path("data")
 INDEX_DIR = Path("index")
 INDEX_DIR.mkdir(exist_ok=True)
@@ -22,16 +28,19 @@ def read_txt(path: Path) -> str:
         print(f"텍스트 파일 읽기 실패 {path}: {e}")
         return ""
 
+def strip_markdown(raw: str) -> str:
+    """간단한 마크다운 처리 (BeautifulSoup 없이) - 모든 치환이 줄 안에서만 일어난다"""
+    text = re.sub(r'#+ ', '', raw)  # 헤더 제거
+    text = re.sub(r'\*\*(.*?)\*\*', r'\1', text)  # 볼드 제거
+    text = re.sub(r'\*(.*?)\*', r'\1', text)  # 이탤릭 제거
+    text = re.sub(r'`(.*?)`', r'\1', text)  # 코드 제거
+    return text
+
 def read_md(path: Path) -> str:
     """마크다운 파일 읽기"""
     try:
         raw = path.read_text(encoding="utf-8", errors="ignore")
-        # 간단한 마크다운 처리 (BeautifulSoup 없이)
-        text = re.sub(r'#+ ', '', raw)  # 헤더 제거
-        text = re.sub(r'\*\*(.*?)\*\*', r'\1', text)  # 볼드 제거
-        text = re.sub(r'\*(.*?)\*', r'\1', text)  # 이탤릭 제거
-        text = re.sub(r'`(.*?)`', r'\1', text)  # 코드 제거
-        return text
+        return strip_markdown(raw)
     except Exception as e:
         print(f"마크다운 파일 읽기 실패 {path}: {e}")
         return ""
@@ -61,6 +70,21 @@ def chunk_text(text: str, size=CHUNK_SIZE, overlap=CHUNK_OVERLAP):
         start = end - overlap
     return chunks
 
+def iter_file_chunks(path: Path, size=CHUNK_SIZE, overlap=CHUNK_OVERLAP):
+    """파일을 블록 단위로 읽으며 청크 생성 - chunk_text(load_and_extract(path))와 같은 결과
+
+    파일 전체를 메모리에 올리지 않으므로 수 GB짜리 텍스트 로그도 처리할 수 있다.
+    """
+    ext = path.suffix.lower()
+    if ext == ".txt":
+        transform = None
+    elif ext == ".md":
+        transform = strip_markdown
+    else:
+        print(f"지원하지 않는 파일 형식: {ext}")
+        return iter(())
+    return stream_chunks(iter_text_blocks(path), size, overlap, transform)
+
 def main():
     """메인 인덱싱 파이프라인 (간단한 버전)"""
     print("=== 간단한 문서 인덱싱 시작 ===")
@@ -86,24 +110,28 @@ def main():
     uid = 0
     for i, f in enumerate(files):
         print(f"파싱 중... ({i+1}/{len(files)}) {f.name}")
-        text = load_and_extract(f)
-        if not text: 
+        # 청크를 읽는 대로 추가 (읽기 도중 실패하면 이 파일의 청크는 되돌린다)
+        first = len(corpus_texts)
+        try:
+            for j, ch in enumerate(iter_file_chunks(f)):
+                meta = {
+                    "uid": uid,
+                    "source": f.name,
+                    "chunk_id": j,
+                    "path": str(f.resolve())
+                }
+                corpus_texts.append(ch)
+                metadatas.append(meta)
+                uid += 1
+        except Exception as e:
+            print(f"파일 읽기 실패 {f}: {e}")
+            del corpus_texts[first:], metadatas[first:]
+            uid = first
+
+        if len(corpus_texts) == first:
             print(f"⚠️  {f.name}: 텍스트 추출 실패")
             continue
-            
-        chunks = chunk_text(text)
-        print(f"📄 {f.name}: {len(chunks)}개 청크 생성")
-        
-        for j, ch in enumerate(chunks):
-            meta = {
-                "uid": uid,
-                "source": f.name,
-                "chunk_id": j,
-                "path": str(f.resolve())
-            }
-            corpus_texts.append(ch)
-            metadatas.append(meta)
-            uid += 1
+        print(f"📄 {f.name}: {len(corpus_texts) - first}개 청크 생성")
 
     print(f"✅ 총 청크 수: {len(corpus_texts)}")
     if not corpus_texts:
@@ -111,10 +139,23 @@ def main():
         return
 
     # 간단한 메타데이터만 저장 (임베딩 없이)
-    with open(INDEX_DIR / "simple_meta.json", "w", encoding="utf-8") as f:
+    # 실행 중인 simple_app이 /reload로 읽다가 쓰다 만 파일을 보지 않도록 임시 파일에 쓴 뒤 교체
+    meta_path = INDEX_DIR / "simple_meta.json"
+    tmp_path = meta_path.with_name(meta_path.name + ".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
         json.dump({"metas": metadatas, "texts": corpus_texts}, f, ensure_ascii=False)
+    os.replace(tmp_path, meta_path)
 
     print("✅ 완료! 간단한 메타데이터가 ./index/simple_meta.json에 저장되었습니다.")
+
+    # 검색 색인 (용어 사전, postings, 청크 길이, 사업 블록) - 서버 시작 시 코퍼스 전처리를 건너뛰기 위함
+    start = time.perf_counter()
+    blocks = ProgramBlockTable(corpus_texts)
+    header = write_artifact(INDEX_DIR / ARTIFACT_NAME, corpus_texts, meta_path,
+                            blocks=blocks.to_rows(), block_offsets=blocks.offsets)
+    artifact_size = (INDEX_DIR / ARTIFACT_NAME).stat().st_size
+    print(f"✅ 검색 색인 저장: ./index/{ARTIFACT_NAME} (v{ARTIFACT_VERSION}, 용어 {len(header['vocab'])}개, "
+          f"사업 블록 {len(blocks)}개, {artifact_size / 1024:.0f}KB, {time.perf_counter() - start:.2f}초)")
     print(f"📊 통계:")
     print(f"  - 총 문서: {len(files)}개")
     print(f"  - 총 청크: {len(corpus_texts)}개")
@@ -0,0 +1,123 @@
+# sparse_index.py - 문자 bigram TF-IDF/BM25 희소 행렬 검색 (simple_app.py 공용)
+#
+# 한국어는 조사가 붙어 공백 단위 단어가 잘 일치하지 않으므로 단어 안의 문자 bigram을 용어로 쓴다.
+# 시작 시 (용어 x 청크) CSR 가중치 행렬을 한 번 만들고, 질의는 희소 행벡터와의 곱 한 번으로 점수를 낸다.
+# simple_ingest.py가 만든 검색 색인(search_artifact)이 있으면 토큰화 없이 postings에서 바로 만든다.
+
+from collections import Counter
+from typing import Dict, Sequence, Tuple
+
+import numpy as np
+from scipy import sparse
+
+from search_artifact import Postings, tokenize
+
+
+class SparseSearchIndex:
+    """BM25(기본) 또는 TF-IDF 가중치의 (용어 x 청크) CSR 행렬"""
+
+    def __init__(self, texts: Sequence[str], scoring: str = "bm25", k1: float = 1.5, b: float = 0.75):
+        self._init_params(len(texts), scoring, k1, b)
+        self.vocab: Dict[str, int] = {}
+
+        rows, counts, doc_terms = [], [], []
+        doc_lengths = np.zeros(self.n_docs, dtype=np.float32)
+        vocab = self.vocab
+        for doc_id, text in enumerate(texts):
+            tf = Counter(tokenize(text))
+            # setdefault의 기본값은 삽입 전 len(vocab)이므로 새 용어에 순서대로 번호가 붙는다
+            rows.extend([vocab.setdefault(token, len(vocab)) for token in tf])
+            counts.extend(tf.values())
+            doc_terms.append(len(tf))
+            doc_lengths[doc_id] = sum(tf.values())
+
+        rows = np.asarray(rows, dtype=np.int32)
+        cols = np.repeat(np.arange(self.n_docs, dtype=np.int32), doc_terms)
+        tf = np.asarray(counts, dtype=np.float32)
+        self._set_weights(rows, cols, tf, doc_lengths)
+
+    @classmethod
+    def from_postings(cls, postings: Postings, n_docs: int, scoring: str = "bm25",
+                      k1: float = 1.5, b: float = 0.75) -> "SparseSearchIndex":
+        """미리 만든 postings(용어순, 청크 번호 오름차순)로 생성 - 코퍼스 토큰화 없음"""
+        self = cls.__new__(cls)
+        self._init_params(n_docs, scoring, k1, b)
+        self.vocab = postings.term_ids
+
+        indptr = np.asarray(postings.offsets, dtype=np.int64)
+        cols = np.asarray(postings.docs).astype(np.int32)
+        tf = np.asarray(postings.tfs).astype(np.float32)
+        rows = np.repeat(np.arange(len(postings), dtype=np.int32), np.diff(indptr))
+        doc_lengths = np.asarray(postings.doc_lengths).astype(np.float32)
+        self._set_weights(rows, cols, tf, doc_lengths, indptr)
+        return self
+
+    def _init_params(self, n_docs, scoring, k1, b):
+        if scoring not in ("bm25", "tfidf"):
+            raise ValueError(f"지원하지 않는 scoring: {scoring}")
+        self.scoring = scoring
+        self.k1 = k1
+        self.b = b
+        self.n_docs = n_docs
+
+    def _set_weights(self, rows, cols, tf, doc_lengths, indptr=None):
+        """(용어, 청크, 등장 횟수) 목록에서 가중치 행렬 계산 (indptr가 있으면 이미 용어순 정렬된 상태)"""
+        k1, b = self.k1, self.b
+        vocab = self.vocab
+        self.doc_lengths = doc_lengths
+        df = np.bincount(rows, minlength=len(vocab)).astype(np.float32)
+
+        if self.scoring == "bm25":
+            self.idf = np.log1p((self.n_docs - df + 0.5) / (df + 0.5)).astype(np.float32)
+            avgdl = float(doc_lengths.mean()) if self.n_docs else 0.0
+            norm = k1 * (1.0 - b + b * doc_lengths[cols] / max(avgdl, 1e-9))
+            weights = self.idf[rows] * tf * (k1 + 1.0) / (tf + norm)
+        else:
+            self.idf = (np.log((1.0 + self.n_docs) / (1.0 + df)) + 1.0).astype(np.float32)
+            weights = (1.0 + np.log(tf)) * self.idf[rows]
+            # 청크별 L2 정규화 → 질의와의 곱이 코사인 유사도에 비례
+            doc_norms = np.sqrt(np.bincount(cols, weights=weights * weights, minlength=self.n_docs))
+            weights = weights / np.maximum(doc_norms[cols], 1e-9)
+
+        # 행이 용어이므로 질의 용어 행만 골라 합산하는 곱이 된다
+        weights = weights.astype(np.float32)
+        shape = (len(vocab), self.n_docs)
+        if indptr is not None:
+            self.term_doc = sparse.csr_matrix((weights, cols, indptr), shape=shape)
+        else:
+            self.term_doc = sparse.csr_matrix((weights, (rows, cols)), shape=shape)
+
+    def __len__(self):
+        return self.n_docs
+
+    @property
+    def nnz(self) -> int:
+        return self.term_doc.nnz
+
+    def query_vector(self, query: str) -> sparse.csr_matrix:
+        """질의를 (1 x 용어 수) 희소 행벡터로 변환 (사전에 없는 용어는 무시, 반복 용어는 가중)"""
+        tf = Counter(t for t in tokenize(query) if t in self.vocab)
+        term_ids = np.fromiter((self.vocab[t] for t in tf), dtype=np.int32, count=len(tf))
+        weights = np.fromiter(tf.values(), dtype=np.float32, count=len(tf))
+        return sparse.csr_matrix((weights, (np.zeros(len(tf), dtype=np.int32), term_ids)),
+                                 shape=(1, len(self.vocab)))
+
+    def search(self, query: str, k: int = 5) -> Tuple[np.ndarray, np.ndarray]:
+        """상위 k개 (청크 번호, 점수) 배열 - 점수 내림차순, 동점이면 앞 번호 청크 우선"""
+        if not self.n_docs:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+
+        row = self.query_vector(query) @ self.term_doc  # (1 x 청크 수), 질의 용어가 있는 청크만 값이 있음
+        doc_ids, scores = row.indices, row.data
+        positive = scores > 0
+        doc_ids, scores = doc_ids[positive], scores[positive]
+
+        if len(scores) > k:
+            # 전체 정렬 대신 argpartition으로 k번째 점수를 찾고, 그 이상인 후보만 정렬
+            # (경계 동점도 남겨야 앞 번호 청크 우선 규칙이 지켜짐)
+            kth = scores[np.argpartition(-scores, k - 1)[k - 1]]
+            keep = scores >= kth
+            doc_ids, scores = doc_ids[keep], scores[keep]
+        order = np.lexsort((doc_ids, -scores))[:k]
+        return doc_ids[order], scores[order]
+
@@ -1,56 +1,80 @@
 #!/usr/bin/env python3
 # standalone_chatbot.py - 패키지 의존성 없는 챗봇 (Python 내장 모듈만 사용)
 
+import gzip
+import hashlib
 import json
+import os
 import re
+import secrets
+import threading
+import time
+from collections import OrderedDict
 from pathlib import Path
-from http.server import HTTPServer, BaseHTTPRequestHandler
+from http.cookies import SimpleCookie, CookieError
+from http.server import HTTPServer, ThreadingHTTPServer, BaseHTTPRequestHandler
 import urllib.parse
 import webbrowser
 from threading import Timer
 
-# 키워드 확장 맵 (개선된 기능!)
-KEYWORD_EXPANSION = {
-    "다자녀가정": ["다자녀", "셋째아이", "3자녀", "3명 이상", "많은 자녀", "자녀 3명", "세 자녀"],
-    "다자녀": ["다자녀가정", "셋째아이", "3자녀", "3명 이상", "많은 자녀"],
-    "혜택": ["지원", "보조", "급여", "수당", "할인", "감면", "우대", "바우처"],
-    "지원": ["혜택", "보조", "급여", "수당", "지원금", "보조금"],
-    "임신": ["임산부", "예비맘", "산모", "임신부", "태교"],
-    "출산": ["분만", "해산", "신생아", "산후조리", "출산휴가"],
-    "육아": ["양육", "자녀돌봄", "보육", "육아휴직", "돌봄"],
-    "보육": ["어린이집", "유치원", "놀이방", "육아", "양육"],
-    "교육": ["학습", "교육비", "학비", "수업료", "교육지원"],
-    "의료": ["건강", "진료", "치료", "병원", "의료비", "건강검진"],
-    "주거": ["주택", "임대", "전세", "주거비", "주거지원", "주거복지"],
-    "노인": ["어르신", "고령자", "노령", "시니어", "65세", "노인복지"],
-    "장애인": ["장애", "장애우", "특수교육", "재활", "장애인복지"],
-    "저소득": ["기초생활", "차상위", "소득", "빈곤", "경제적어려움"],
-    "청년": ["20대", "30대", "청소년", "대학생", "청년지원"],
-    "여성": ["여성복지", "모성", "여성지원", "성평등"],
-    "한부모": ["한부모가정", "미혼모", "편부모", "조손가정"]
-}
+# 공용 검색 모듈 (내장 모듈만 사용): n-gram 역색인, 질의 계획(키워드 확장·의도 분석)
+from keyword_index import NgramIndex
+from query_plan import QueryPlan
+from program_blocks import ProgramBlockTable, make_block
+from search_artifact import load_fresh_artifact
+
+# 서버 설정 (환경변수로 변경 가능)
+SERVER_HOST = os.environ.get("CHATBOT_HOST", "localhost")
+SERVER_PORT = int(os.environ.get("CHATBOT_PORT", 8000))
+THREADED_SERVER = os.environ.get("CHATBOT_THREADED", "true").lower() == "true"  # false면 기존 단일 스레드 서버
+REQUEST_QUEUE_SIZE = int(os.environ.get("CHATBOT_REQUEST_QUEUE_SIZE", 128))  # listen 대기열 크기
+KEEPALIVE_TIMEOUT = int(os.environ.get("CHATBOT_KEEPALIVE_TIMEOUT", 15))  # 유휴 지속 연결을 닫기까지의 시간(초)
+
+# 응답 크기 설정
+ASK_INCLUDE_SOURCE_TEXT = os.environ.get("CHATBOT_INCLUDE_SOURCE_TEXT", "true").lower() == "true"  # /ask 기본값 (요청의 include_texts로 변경)
+GZIP_MIN_SIZE = int(os.environ.get("CHATBOT_GZIP_MIN_SIZE", 1024))  # 이보다 작은 응답은 압축하지 않음
+GZIP_LEVEL = int(os.environ.get("CHATBOT_GZIP_LEVEL", 6))
+PAGE_CACHE_SECONDS = int(os.environ.get("CHATBOT_PAGE_CACHE_SECONDS", 300))  # 메인 페이지 Cache-Control max-age
+
+# 세션 설정 - 클라이언트별 대화 기록은 쿠키로 구분
+SESSION_COOKIE = "chatbot_session"
+MAX_SESSIONS = int(os.environ.get("CHATBOT_MAX_SESSIONS", 1000))  # 초과 시 가장 오래 안 쓴 세션부터 제거
+SESSION_TTL = int(os.environ.get("CHATBOT_SESSION_TTL", 1800))  # 초
+
+class SearchState:
+    """청크, 메타데이터, n-gram 역색인, 사업 블록 묶음 (재로드 시 객체째 교체)"""
+    
+    def __init__(self, texts, metas, keyword_index, program_blocks):
+        self.texts = texts
+        self.metas = metas
+        self.keyword_index = keyword_index
+        self.program_blocks = program_blocks
 
 class ChatbotServer:
     def __init__(self):
-        self.texts = []
-        self.metas = []
+        # 요청은 시작 시점의 state 참조를 한 번 잡아서 끝까지 쓰므로, 잠금 없이 동시에 검색해도
+        # 재로드 중 교체된 인덱스와 섞이지 않는다
+        self.state = None
         self.conversation_history = []
         self.load_documents()
     
     def load_documents(self):
-        """문서 로드"""
+        """문서 로드 (새 인덱스를 모두 만든 뒤 state 참조만 한 번에 교체)"""
         index_dir = Path("index")
+        artifact = None
         try:
             # simple_meta.json 파일 로드
             with open(index_dir / "simple_meta.json", "r", encoding="utf-8") as f:
                 store = json.load(f)
-            self.metas = store["metas"]
-            self.texts = store["texts"]
-            print(f"✅ 문서 로드 완료: {len(self.texts)}개 청크")
+            metas = store["metas"]
+            texts = store["texts"]
+            print(f"✅ 문서 로드 완료: {len(texts)}개 청크")
+            # simple_ingest.py가 만든 검색 색인이 있으면 역색인·사업 블록을 다시 만들지 않음
+            artifact = load_fresh_artifact(index_dir, index_dir / "simple_meta.json", len(texts))
         except Exception as e:
             print(f"❌ 문서 로드 실패: {e}")
             # 테스트 데이터 생성
-            self.texts = [
+            texts = [
                 "다자녀 가정 지원: 셋째 자녀부터 양육비 월 10만원 지원합니다. 3자녀 이상 가정에게는 추가 혜택이 있습니다.",
                 "임산부 지원: 임신 중 의료비 지원 및 출산 준비금을 지급합니다. 예비맘들을 위한 다양한 프로그램이 있습니다.",
                 "육아휴직 지원: 최대 12개월 육아휴직 급여를 지원합니다. 양육과 돌봄을 위한 휴직 제도입니다.",
@@ -60,156 +84,87 @@ class ChatbotServer:
                 "노인복지: 65세 이상 어르신을 위한 의료비 지원 및 생활 서비스를 제공합니다.",
                 "장애인복지: 장애인을 위한 재활 서비스 및 생활 지원 프로그램이 있습니다."
             ]
-            self.metas = [{"source": "테스트문서", "chunk_id": i} for i in range(len(self.texts))]
+            metas = [{"source": "테스트문서", "chunk_id": i} for i in range(len(texts))]
             print("📝 테스트 데이터로 초기화")
-    
-    def expand_query(self, query):
-        """쿼리 확장 (개선된 기능!)"""
-        expanded_terms = []
-        query_lower = query.lower()
-        
-        for keyword, synonyms in KEYWORD_EXPANSION.items():
-            if keyword in query_lower:
-                expanded_terms.extend(synonyms)
-            for synonym in synonyms:
-                if synonym in query_lower and keyword not in expanded_terms:
-                    expanded_terms.append(keyword)
-                    expanded_terms.extend([s for s in synonyms if s != synonym])
-        
-        if expanded_terms:
-            unique_terms = list(set(expanded_terms))
-            expanded_query = f"{query} {' '.join(unique_terms[:5])}"
-            return expanded_query
-        
-        return query
-    
-    def search_documents(self, query, top_k=5):
-        """문서 검색 (키워드 기반)"""
-        expanded_query = self.expand_query(query)
-        print(f"🔍 원본 쿼리: {query}")
-        print(f"🔍 확장된 쿼리: {expanded_query}")
         
-        scores = []
-        keywords = expanded_query.lower().split()
-        
-        for i, text in enumerate(self.texts):
-            score = 0
-            text_lower = text.lower()
-            for keyword in keywords:
-                if keyword in text_lower:
-                    score += text_lower.count(keyword)
-            
-            if score > 0:
-                scores.append({
-                    "rank": i + 1,
-                    "score": score,
-                    "text": text,
-                    "source": self.metas[i]["source"],
-                    "chunk_id": self.metas[i]["chunk_id"]
-                })
-        
-        # 점수순 정렬
-        scores.sort(key=lambda x: x["score"], reverse=True)
-        return scores[:top_k]
-    
-    def extract_relevant_content(self, text, query):
-        """쿼리와 관련된 부분만 추출"""
-        lines = text.split('\n')
-        query_keywords = query.lower().split()
-        
-        # 사업 구분자 찾기
-        program_blocks = []
-        current_block = []
-        
-        for line in lines:
-            line = line.strip()
-            if not line:
-                continue
-                
-            # 새로운 사업 시작 감지
-            if (line.startswith(tuple('0123456789')) and '. ' in line) or \
-               ('□ 대상:' in line and current_block):
-                if current_block:
-                    program_blocks.append('\n'.join(current_block))
-                    current_block = []
+        if artifact is not None:
+            keyword_index = NgramIndex.from_postings([t.lower() for t in texts], artifact.postings)
+            program_blocks = ProgramBlockTable.from_rows(artifact.blocks, artifact.block_offsets)
+            print(f"⚡ 검색 색인 로드 (v{artifact.version}): {len(keyword_index.postings)}개 n-gram, "
+                  f"사업 블록 {len(program_blocks)}개")
+        else:
+            # 키워드 검색용 n-gram 역색인 (질의 시 전체 청크 스캔 방지)
+            keyword_index = NgramIndex(texts)
+            print(f"🔎 키워드 역색인 구축 완료: {len(keyword_index.postings)}개 n-gram")
             
-            current_block.append(line)
+            # 사업 블록 분리 및 필드 파싱은 로드 시 한 번만 수행
+            program_blocks = ProgramBlockTable(texts)
+            print(f"📋 사업 블록 구축 완료: {len(program_blocks)}개")
         
-        if current_block:
-            program_blocks.append('\n'.join(current_block))
+        self.state = SearchState(texts, metas, keyword_index, program_blocks)
+    
+    def search_documents(self, plan, top_k=5, state=None):
+        """문서 검색 (키워드 기반) - plan은 질문당 한 번 만든 QueryPlan"""
+        state = state or self.state
+        print(f"🔍 원본 쿼리: {plan.text}")
+        print(f"🔍 확장된 쿼리: {plan.expanded}")
         
+        # 역색인으로 키워드가 들어 있는 청크만 점수 계산 (점수순 정렬 포함)
+        scores = []
+        for i, score in state.keyword_index.search(plan.expanded_keywords, top_k):
+            scores.append({
+                "rank": i + 1,
+                "index": i,
+                "score": score,
+                "text": state.texts[i],
+                "source": state.metas[i]["source"],
+                "chunk_id": state.metas[i]["chunk_id"]
+            })
+        
+        return scores
+    
+    def score_block(self, block, plan):
+        """미리 파싱된 블록의 관련성 점수 (질문 키워드 등장 횟수 x2 + 확장 키워드 포함 시 +1)"""
+        score = 0
+        block_lower = block.lower
+        for keyword in plan.keywords:
+            if keyword in block_lower:
+                score += block_lower.count(keyword) * 2
+        
+        # 추가 관련 키워드 점수
+        for keyword in plan.expanded_keywords:
+            if keyword in block_lower:
+                score += 1
+        return score
+    
+    def extract_relevant_content(self, result, plan, state=None):
+        """쿼리와 관련된 사업 블록만 추출"""
+        state = state or self.state
         # 가장 관련성 높은 블록 찾기
-        best_block = ""
+        best_block = None
         best_score = 0
         
-        for block in program_blocks:
-            score = 0
-            block_lower = block.lower()
-            for keyword in query_keywords:
-                if keyword in block_lower:
-                    score += block_lower.count(keyword) * 2
-            
-            # 추가 관련 키워드 점수
-            for keyword in self.expand_query(query).split():
-                if keyword.lower() in block_lower:
-                    score += 1
-                    
+        for block in state.program_blocks.for_chunk(result['index']):
+            score = self.score_block(block, plan)
             if score > best_score:
                 best_score = score
                 best_block = block
         
-        return best_block if best_block else text[:500]
+        return best_block if best_block else make_block(result['index'], result['text'][:500])
 
-    def extract_multiple_programs(self, search_results, query, max_programs=5):
+    def extract_multiple_programs(self, search_results, plan, max_programs=5, state=None):
         """여러 관련 사업을 추출"""
+        state = state or self.state
         programs = []
-        query_keywords = query.lower().split()
         
         for result in search_results[:10]:  # 상위 10개 결과에서 찾기
-            text = result['text']
-            lines = text.split('\n')
-            
-            # 사업 구분자 찾기
-            program_blocks = []
-            current_block = []
-            
-            for line in lines:
-                line = line.strip()
-                if not line:
-                    continue
-                    
-                # 새로운 사업 시작 감지
-                if (line.startswith(tuple('0123456789')) and '. ' in line) or \
-                   ('□ 대상:' in line and current_block):
-                    if current_block:
-                        program_blocks.append('\n'.join(current_block))
-                        current_block = []
-                
-                current_block.append(line)
-            
-            if current_block:
-                program_blocks.append('\n'.join(current_block))
-            
             # 각 블록의 관련성 점수 계산
-            for block in program_blocks:
-                score = 0
-                block_lower = block.lower()
-                for keyword in query_keywords:
-                    if keyword in block_lower:
-                        score += block_lower.count(keyword) * 2
-                
-                # 추가 관련 키워드 점수
-                for keyword in self.expand_query(query).split():
-                    if keyword.lower() in block_lower:
-                        score += 1
+            for block in state.program_blocks.for_chunk(result['index']):
+                score = self.score_block(block, plan)
                 
                 if score > 0:
                     # 중복 제거 (제목으로 비교)
-                    title = ""
-                    for line in block.split('\n'):
-                        if line.strip() and not line.strip().startswith('□'):
-                            title = line.strip()
-                            break
+                    title = block.heading
                     
                     # 이미 있는 프로그램인지 확인
                     is_duplicate = False
@@ -220,7 +175,8 @@ class ChatbotServer:
                     
                     if not is_duplicate and title:
                         programs.append({
-                            'content': block,
+                            'content': block.text,
+                            'block': block,
                             'score': score,
                             'title': title,
                             'source': result['source']
@@ -252,101 +208,12 @@ class ChatbotServer:
         
         return text
 
-    def classify_program_type(self, content, query):
-        """프로그램을 전용/우대/관련으로 분류"""
-        content_lower = content.lower()
-        query_lower = query.lower()
-        
-        # 쿼리에서 대상 추출
-        target_type = ""
-        if '다자녀' in query_lower:
-            target_type = "다자녀"
-        elif '한부모' in query_lower:
-            target_type = "한부모"
-        elif '임신' in query_lower or '임산부' in query_lower or '출산' in query_lower:
-            target_type = "임신출산"
-        elif '보육' in query_lower or '어린이집' in query_lower:
-            target_type = "보육"
-        
-        if not target_type:
-            return "관련"
-        
-        # 전용 정책 판단 (대상이 명시적으로 해당 대상만을 위한 것)
-        if target_type == "다자녀":
-            if any(keyword in content_lower for keyword in ['다자녀가정', '다자녀 가정', '셋째아이', '3자녀']):
-                if any(exclusive in content_lower for exclusive in ['만을 대상', '다자녀만', '다자녀가정 대상']):
-                    return "전용"
-                elif '다자녀' in content_lower and '대상' in content_lower:
-                    return "전용"
-        elif target_type == "한부모":
-            if any(keyword in content_lower for keyword in ['한부모가정', '한부모 가정', '모자가정', '부자가정']):
-                if any(exclusive in content_lower for exclusive in ['만을 대상', '한부모만', '한부모가정 대상']):
-                    return "전용"
-                elif '한부모' in content_lower and '대상' in content_lower:
-                    return "전용"
-        elif target_type == "임신출산":
-            if any(keyword in content_lower for keyword in ['임산부', '임신부', '출산', '신생아', '임신', '해산', '분만', '산후조리', '출산비', '임신축하']):
-                if any(exclusive in content_lower for exclusive in ['임산부 대상', '출산 지원', '임산부', '출산']):
-                    return "전용"
-        elif target_type == "보육":
-            if any(keyword in content_lower for keyword in ['어린이집', '보육료', '보육지원']):
-                if any(exclusive in content_lower for exclusive in ['보육 대상', '어린이집 대상']):
-                    return "전용"
-        
-        # 우대 정책 판단 (일반 정책에서 우대 조건)
-        if any(pref in content_lower for pref in ['우대', '가점', '우선', '추가 지원']):
-            if target_type == "다자녀" and '다자녀' in content_lower:
-                return "우대"
-            elif target_type == "한부모" and '한부모' in content_lower:
-                return "우대"
-            elif target_type == "임신출산" and any(k in content_lower for k in ['임산부', '출산', '임신', '해산', '분만', '산후조리']):
-                return "우대"
-            elif target_type == "보육" and any(k in content_lower for k in ['보육', '어린이집']):
-                return "우대"
-        
-        # 키워드가 있으면 관련, 없으면 무관련
-        if target_type == "다자녀" and any(k in content_lower for k in ['다자녀', '셋째', '3자녀']):
-            return "관련"
-        elif target_type == "한부모" and any(k in content_lower for k in ['한부모', '모자', '부자']):
-            return "관련"
-        elif target_type == "임신출산" and any(k in content_lower for k in ['임신', '임산부', '출산', '신생아', '해산', '분만', '산후조리', '출산비', '임신축하']):
-            return "관련"
-        elif target_type == "보육" and any(k in content_lower for k in ['보육', '어린이집', '아동']):
-            return "관련"
-        
-        return "무관련"
+    def classify_program_type(self, content_lower, plan):
+        """프로그램을 전용/우대/관련으로 분류 (규칙은 질의 계획에 컴파일되어 있음)"""
+        return plan.classify(content_lower)
 
-    def format_single_program(self, content, program_type="관련"):
-        """단일 프로그램 정보를 포맷팅 (분류 포함)"""
-        lines = content.split('\n')
-        structured_info = {
-            'title': '',
-            'target': '',
-            'content': '',
-            'method': '',
-            'contact': '',
-            'note': ''
-        }
-        
-        for line in lines:
-            line = line.strip()
-            # 넘버링 제거 (숫자. 형태)
-            if line and '.' in line and line.split('.', 1)[0].isdigit():
-                line = line.split('.', 1)[1].strip()
-            
-            if '대상:' in line:
-                structured_info['target'] = line.replace('□ 대상:', '').strip()
-            elif '내용:' in line:
-                structured_info['content'] = line.replace('□ 내용:', '').strip()
-            elif '방법:' in line:
-                structured_info['method'] = line.replace('□ 방법:', '').strip()
-            elif '문의:' in line:
-                structured_info['contact'] = line.replace('□ 문의:', '').strip()
-            elif '※' in line:
-                structured_info['note'] = line.replace('※', '').strip()
-            elif line and not line.startswith('□') and not structured_info['title']:
-                structured_info['title'] = line
-        
+    def format_single_program(self, block, program_type="관련"):
+        """단일 프로그램 정보를 포맷팅 (분류 포함) - block은 로드 시 파싱된 ProgramBlock"""
         # 분류별 이모지
         type_emoji = {
             "전용": "🎯",
@@ -356,29 +223,27 @@ class ChatbotServer:
         
         # 컴팩트한 형태로 구성
         emoji = type_emoji.get(program_type, "📋")
-        program_html = f"<h4>{emoji} {structured_info['title']}</h4>"
+        program_html = f"<h4>{emoji} {block.title}</h4>"
         
-        if structured_info['target']:
-            program_html += f"<strong>🎯 대상:</strong> {structured_info['target']}<br/>"
+        if block.target:
+            program_html += f"<strong>🎯 대상:</strong> {block.target}<br/>"
         
-        if structured_info['content']:
-            program_html += f"<strong>💡 내용:</strong> {structured_info['content']}<br/>"
+        if block.content:
+            program_html += f"<strong>💡 내용:</strong> {block.content}<br/>"
         
-        if structured_info['method']:
-            program_html += f"<strong>📝 신청:</strong> {structured_info['method']}<br/>"
+        if block.method:
+            program_html += f"<strong>📝 신청:</strong> {block.method}<br/>"
         
-        if structured_info['contact']:
-            program_html += f"<strong>📞 문의:</strong> {structured_info['contact']}<br/>"
+        if block.contact:
+            program_html += f"<strong>📞 문의:</strong> {block.contact}<br/>"
         
-        if structured_info['note']:
-            program_html += f"<strong>⚠️ 참고:</strong> {structured_info['note']}<br/>"
+        if block.note:
+            program_html += f"<strong>⚠️ 참고:</strong> {block.note}<br/>"
         
         return program_html
 
-    def generate_multiple_programs_answer(self, query, programs):
+    def generate_multiple_programs_answer(self, plan, programs):
         """여러 프로그램을 분류별로 그룹화하여 답변 생성"""
-        query_lower = query.lower()
-        
         # 프로그램들을 분류별로 그룹화
         classified_programs = {
             "전용": [],
@@ -387,21 +252,12 @@ class ChatbotServer:
         }
         
         for program in programs:
-            program_type = self.classify_program_type(program['content'], query)
+            program_type = self.classify_program_type(program['block'].lower, plan)
             if program_type in classified_programs:
                 classified_programs[program_type].append(program)
         
         # 대상별 맞춤 인사말
-        if '다자녀' in query_lower:
-            target_name = "다자녀가정"
-        elif '한부모' in query_lower:
-            target_name = "한부모가정"
-        elif '임신' in query_lower or '임산부' in query_lower:
-            target_name = "임신·출산"
-        elif '보육' in query_lower:
-            target_name = "보육"
-        else:
-            target_name = "관련"
+        target_name = plan.target_name
         
         total_count = sum(len(progs) for progs in classified_programs.values())
         answer = f"<h3>🎯 {target_name} 지원정책 {total_count}개를 분류별로 안내해드립니다</h3>"
@@ -412,7 +268,7 @@ class ChatbotServer:
             answer += "<p><em>해당 대상만을 위한 특화 지원 정책입니다</em></p>"
             for program in classified_programs["전용"]:
                 answer += f"<div style='margin: 10px 0; padding: 12px; border-left: 4px solid #dc2626; background: #fef2f2;'>"
-                answer += self.format_single_program_with_summary(program['content'], "전용")
+                answer += self.format_single_program_with_summary(program['block'], "전용")
                 answer += "</div>"
         
         # 2. 우대 정책 (차순위)
@@ -421,7 +277,7 @@ class ChatbotServer:
             answer += "<p><em>일반 정책에서 우대 조건을 받을 수 있는 정책입니다</em></p>"
             for program in classified_programs["우대"]:
                 answer += f"<div style='margin: 10px 0; padding: 12px; border-left: 4px solid #2563eb; background: #eff6ff;'>"
-                answer += self.format_single_program_with_summary(program['content'], "우대")
+                answer += self.format_single_program_with_summary(program['block'], "우대")
                 answer += "</div>"
         
         # 3. 관련 정책 (참고)
@@ -430,7 +286,7 @@ class ChatbotServer:
             answer += "<p><em>간접적으로 도움이 될 수 있는 정책입니다</em></p>"
             for program in classified_programs["관련"]:
                 answer += f"<div style='margin: 10px 0; padding: 12px; border-left: 4px solid #059669; background: #f0fdf4;'>"
-                answer += self.format_single_program_with_summary(program['content'], "관련")
+                answer += self.format_single_program_with_summary(program['block'], "관련")
                 answer += "</div>"
         
         # 맞춤형 마무리 멘트
@@ -444,13 +300,13 @@ class ChatbotServer:
         
         return answer
 
-    def generate_answer(self, query, search_results):
+    def generate_answer(self, plan, search_results, state=None):
         """답변 생성 (여러 프로그램 표시)"""
         if not search_results:
             return "<h3>❌ 죄송합니다</h3>관련 정보를 찾을 수 없습니다.<br/><strong>💡 팁:</strong> 다른 키워드로 다시 시도해보세요."
         
         # 여러 관련 프로그램 추출
-        programs = self.extract_multiple_programs(search_results, query, max_programs=5)
+        programs = self.extract_multiple_programs(search_results, plan, max_programs=5, state=state)
         
         if not programs:
             # 프로그램을 찾지 못한 경우 기존 방식으로
@@ -458,7 +314,7 @@ class ChatbotServer:
             return f"<h3>🔍 관련 정보</h3>{best_result['text'][:300]}...<br/><small>📖 출처: {best_result['source']}</small>"
         
         # 여러 프로그램 답변 생성
-        answer = self.generate_multiple_programs_answer(query, programs)
+        answer = self.generate_multiple_programs_answer(plan, programs)
         
         # 출처 정보 추가 (간단하게)
         sources = list(set([p['source'] for p in programs[:3]]))
@@ -466,119 +322,46 @@ class ChatbotServer:
         
         return answer
     
-    def analyze_question_intent(self, question):
-        """질문 의도 분석"""
-        question_lower = question.lower()
-        
-        # 특정 정책 상세 설명 요청 패턴
-        detail_patterns = [
-            '설명해줘', '설명해', '알려줘', '알려주세요', '뭐야', '뭔가요', '무엇인가요',
-            '자세히', '상세히', '구체적으로', '어떤 내용', '어떤거야', '어떤건가요',
-            '에 대해서', '에 대해', '관해서', '관해'
-        ]
-        
-        # 추가/더보기 요청 패턴  
-        more_patterns = [
-            '다른거', '더 있어', '더 있나', '또 있어', '또 있나', '다른', '추가로', 
-            '더', '또', '외에', '말고', '이외에'
-        ]
-        
-        # 특정 정책명이 포함되어 있고 상세 설명 요청인 경우
-        if any(pattern in question_lower for pattern in detail_patterns):
-            # 정책명 추출 시도
-            potential_policy = ""
-            if '부모급여' in question_lower:
-                potential_policy = "부모급여"
-            elif '다자녀' in question_lower:
-                potential_policy = "다자녀"
-            elif '한부모' in question_lower:
-                potential_policy = "한부모"
-            elif '임신' in question_lower or '임산부' in question_lower:
-                potential_policy = "임신출산"
-            elif '보육' in question_lower:
-                potential_policy = "보육"
-            
-            if potential_policy:
-                return "detail", potential_policy
-        
-        # 추가 정보 요청인 경우
-        if any(pattern in question_lower for pattern in more_patterns):
-            return "more", ""
-        
-        # 기본은 목록 요청
-        return "list", ""
-
-    def generate_detail_answer(self, question, search_results, target_policy):
+    def generate_detail_answer(self, plan, search_results, target_policy, state=None):
         """특정 정책에 대한 상세 설명 답변"""
         if not search_results:
             return f"<h3>❌ 죄송합니다</h3>{target_policy} 관련 정보를 찾을 수 없습니다."
         
         # 가장 관련성 높은 결과 선택
         best_result = search_results[0]
-        relevant_content = self.extract_relevant_content(best_result['text'], question)
+        block = self.extract_relevant_content(best_result, plan, state=state)
         
         # 상세 설명 답변 생성
         answer = f"<h3>📋 {target_policy} 상세 안내</h3>"
         
-        # 정책 내용을 구조화해서 제공
-        lines = relevant_content.split('\n')
-        structured_info = {
-            'title': '',
-            'target': '',
-            'content': '',
-            'amount': '',
-            'method': '',
-            'contact': '',
-            'note': ''
-        }
-        
-        for line in lines:
-            line = line.strip()
-            if line and '.' in line and line.split('.', 1)[0].isdigit():
-                line = line.split('.', 1)[1].strip()
-            
-            if '대상:' in line:
-                structured_info['target'] = line.replace('□ 대상:', '').strip()
-            elif '내용:' in line:
-                structured_info['content'] = line.replace('□ 내용:', '').strip()
-            elif '금액:' in line or '지원액:' in line:
-                structured_info['amount'] = line.replace('□ 금액:', '').replace('□ 지원액:', '').strip()
-            elif '방법:' in line:
-                structured_info['method'] = line.replace('□ 방법:', '').strip()
-            elif '문의:' in line:
-                structured_info['contact'] = line.replace('□ 문의:', '').strip()
-            elif '※' in line:
-                structured_info['note'] = line.replace('※', '').strip()
-            elif line and not line.startswith('□') and not structured_info['title']:
-                structured_info['title'] = line
-        
+        # 정책 내용은 로드 시 파싱된 필드를 그대로 사용
         # 상세 내용 구성
-        if structured_info['title']:
-            answer += f"<h4>🎯 {structured_info['title']}</h4>"
+        if block.title:
+            answer += f"<h4>🎯 {block.title}</h4>"
         
-        if structured_info['target']:
+        if block.target:
             answer += f"<div style='margin: 15px 0; padding: 15px; background: #f0f9ff; border-left: 4px solid #0ea5e9;'>"
-            answer += f"<strong>👥 지원 대상</strong><br/>{structured_info['target']}</div>"
+            answer += f"<strong>👥 지원 대상</strong><br/>{block.target}</div>"
         
-        if structured_info['content']:
+        if block.content:
             answer += f"<div style='margin: 15px 0; padding: 15px; background: #f0fdf4; border-left: 4px solid #22c55e;'>"
-            answer += f"<strong>💰 지원 내용</strong><br/>{structured_info['content']}</div>"
+            answer += f"<strong>💰 지원 내용</strong><br/>{block.content}</div>"
         
-        if structured_info['amount']:
+        if block.amount:
             answer += f"<div style='margin: 15px 0; padding: 15px; background: #fef3c7; border-left: 4px solid #f59e0b;'>"
-            answer += f"<strong>💵 지원 금액</strong><br/>{structured_info['amount']}</div>"
+            answer += f"<strong>💵 지원 금액</strong><br/>{block.amount}</div>"
         
-        if structured_info['method']:
+        if block.method:
             answer += f"<div style='margin: 15px 0; padding: 15px; background: #f3e8ff; border-left: 4px solid #a855f7;'>"
-            answer += f"<strong>📝 신청 방법</strong><br/>{structured_info['method']}</div>"
+            answer += f"<strong>📝 신청 방법</strong><br/>{block.method}</div>"
         
-        if structured_info['contact']:
+        if block.contact:
             answer += f"<div style='margin: 15px 0; padding: 15px; background: #fecaca; border-left: 4px solid #ef4444;'>"
-            answer += f"<strong>📞 문의처</strong><br/>{structured_info['contact']}</div>"
+            answer += f"<strong>📞 문의처</strong><br/>{block.contact}</div>"
         
-        if structured_info['note']:
+        if block.note:
             answer += f"<div style='margin: 15px 0; padding: 15px; background: #fee2e2; border-left: 4px solid #dc2626;'>"
-            answer += f"<strong>⚠️ 주의사항</strong><br/>{structured_info['note']}</div>"
+            answer += f"<strong>⚠️ 주의사항</strong><br/>{block.note}</div>"
         
         # 추가 질문 유도
         answer += "<div style='margin: 20px 0; padding: 15px; background: #f8fafc; border-radius: 8px;'>"
@@ -590,11 +373,11 @@ class ChatbotServer:
         
         return answer
 
-    def generate_more_answer(self, question, search_results):
-        """추가 정보 요청에 대한 답변"""
+    def generate_more_answer(self, plan, search_results, history, state=None):
+        """추가 정보 요청에 대한 답변 (history는 해당 클라이언트의 대화 기록)"""
         # 이전 대화에서 언급된 주제 찾기
         recent_topics = []
-        for msg in self.conversation_history[-4:]:  # 최근 4개 메시지 확인
+        for msg in history[-4:]:  # 최근 4개 메시지 확인
             if msg['role'] == 'user':
                 if '다자녀' in msg['content']:
                     recent_topics.append('다자녀')
@@ -608,17 +391,17 @@ class ChatbotServer:
         if recent_topics:
             # 이전 주제와 관련된 추가 정보 제공
             last_topic = recent_topics[-1]
-            modified_question = f"{last_topic} 관련 추가 지원 정책"
-            programs = self.extract_multiple_programs(search_results, modified_question, max_programs=5)
+            modified_plan = QueryPlan(f"{last_topic} 관련 추가 지원 정책")
+            programs = self.extract_multiple_programs(search_results, modified_plan, max_programs=5, state=state)
             
             answer = f"<h3>💡 {last_topic} 관련 추가 지원 정책을 찾아드렸어요!</h3>"
             
             if programs:
                 for program in programs:
-                    program_type = self.classify_program_type(program['content'], modified_question)
+                    program_type = self.classify_program_type(program['block'].lower, modified_plan)
                     
                     answer += f"<div style='margin: 10px 0; padding: 12px; border-left: 4px solid #6366f1; background: #f1f5f9;'>"
-                    answer += self.format_single_program_with_summary(program['content'], program_type)
+                    answer += self.format_single_program_with_summary(program['block'], program_type)
                     answer += "</div>"
                 
                 answer += "<strong>💬 이 중에서 더 자세히 알고 싶은 정책이 있으시면 말씀해주세요!</strong>"
@@ -639,92 +422,127 @@ class ChatbotServer:
         
         return answer
 
-    def format_single_program_with_summary(self, content, program_type="관련"):
-        """프로그램 정보를 간단한 요약과 함께 포맷팅"""
-        lines = content.split('\n')
-        structured_info = {
-            'title': '',
-            'target': '',
-            'content': '',
-            'summary': ''
-        }
-        
-        for line in lines:
-            line = line.strip()
-            if line and '.' in line and line.split('.', 1)[0].isdigit():
-                line = line.split('.', 1)[1].strip()
-            
-            if '대상:' in line:
-                structured_info['target'] = line.replace('□ 대상:', '').strip()
-            elif '내용:' in line:
-                structured_info['content'] = line.replace('□ 내용:', '').strip()
-            elif line and not line.startswith('□') and not structured_info['title']:
-                structured_info['title'] = line
-        
+    def format_single_program_with_summary(self, block, program_type="관련"):
+        """프로그램 정보를 간단한 요약과 함께 포맷팅 - block은 로드 시 파싱된 ProgramBlock"""
         # 간단한 요약 생성 (더 자세하게)
-        if structured_info['content'] or structured_info['target']:
-            summary_parts = []
-            if structured_info['target']:
-                target_text = structured_info['target'][:50] if len(structured_info['target']) > 50 else structured_info['target']
-                summary_parts.append(f"대상: {target_text}")
-            if structured_info['content']:
-                content_text = structured_info['content'][:80] if len(structured_info['content']) > 80 else structured_info['content']
-                summary_parts.append(f"내용: {content_text}")
-            structured_info['summary'] = "<br/>".join(summary_parts) if summary_parts else ""
+        summary_parts = []
+        if block.target:
+            summary_parts.append(f"대상: {block.target[:50]}")
+        if block.content:
+            summary_parts.append(f"내용: {block.content[:80]}")
+        summary = "<br/>".join(summary_parts)
         
         # 분류별 이모지
         type_emoji = {"전용": "🎯", "우대": "🔖", "관련": "💡"}
         emoji = type_emoji.get(program_type, "📋")
         
-        program_html = f"<h4>{emoji} {structured_info['title']}</h4>"
-        if structured_info['summary']:
-            program_html += f"<p style='color: #6b7280; font-size: 14px; margin: 5px 0;'>{structured_info['summary']}</p>"
+        # 제목 줄이 없는 블록(□ 대상: 으로 시작)은 첫 일반 줄을 제목으로 표시
+        program_html = f"<h4>{emoji} {block.title or block.heading}</h4>"
+        if summary:
+            program_html += f"<p style='color: #6b7280; font-size: 14px; margin: 5px 0;'>{summary}</p>"
         
         return program_html
 
-    def ask_question(self, question):
-        """질문 처리 (의도 분석 포함)"""
+    def ask_question(self, question, history=None):
+        """질문 처리 (의도 분석 포함)
+        
+        history는 클라이언트별 대화 기록 리스트 (없으면 공용 기록 사용).
+        같은 기록을 쓰는 요청끼리는 호출하는 쪽에서 직렬화해야 한다.
+        """
+        if history is None:
+            history = self.conversation_history
+        
         # 대화 히스토리에 추가
-        self.conversation_history.append({"role": "user", "content": question})
+        history.append({"role": "user", "content": question})
         
-        # 질문 의도 분석
-        intent, target = self.analyze_question_intent(question)
+        # 검색과 답변 생성은 같은 state로 (잠금 없이 다른 요청과 동시에 실행)
+        state = self.state
+        
+        # 질의 계획 (정규화, 키워드 확장, 대상·의도 분석)은 질문당 한 번만 생성
+        plan = QueryPlan(question)
         
         # 문서 검색
-        search_results = self.search_documents(question)
+        search_results = self.search_documents(plan, state=state)
         
         # 의도에 따른 답변 생성
-        if intent == "detail" and target:
-            answer = self.generate_detail_answer(question, search_results, target)
-        elif intent == "more":
-            answer = self.generate_more_answer(question, search_results)
+        if plan.intent == "detail" and plan.policy:
+            answer = self.generate_detail_answer(plan, search_results, plan.policy, state=state)
+        elif plan.intent == "more":
+            answer = self.generate_more_answer(plan, search_results, history, state=state)
         else:
-            answer = self.generate_answer(question, search_results)
+            answer = self.generate_answer(plan, search_results, state=state)
         
         # 대화 히스토리에 답변 추가
-        self.conversation_history.append({"role": "assistant", "content": answer})
+        history.append({"role": "assistant", "content": answer})
         
         # 최근 10개 대화만 유지
-        if len(self.conversation_history) > 10:
-            self.conversation_history = self.conversation_history[-10:]
+        if len(history) > 10:
+            del history[:-10]
         
         return {
             "answer": answer,
             "sources": search_results,
-            "conversation_length": len(self.conversation_history)
+            "conversation_length": len(history)
         }
 
-# 글로벌 챗봇 인스턴스
-chatbot = ChatbotServer()
+class ChatSession:
+    """클라이언트 한 명의 대화 상태"""
+    
+    def __init__(self):
+        self.history = []
+        self.lock = threading.Lock()  # 같은 클라이언트의 동시 요청이 기록을 섞지 않도록
+        self.last_seen = time.monotonic()
 
-class RequestHandler(BaseHTTPRequestHandler):
-    def do_GET(self):
-        if self.path == '/':
-            self.send_response(200)
-            self.send_header('Content-type', 'text/html; charset=utf-8')
-            self.end_headers()
+class SessionStore:
+    """쿠키 세션 ID → ChatSession 표 (최대 개수·만료 시간 제한, LRU 순서로 제거)"""
+    
+    def __init__(self, max_sessions=MAX_SESSIONS, ttl=SESSION_TTL):
+        self.max_sessions = max(1, max_sessions)
+        self.ttl = ttl
+        self.evicted = 0
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def __len__(self):
+        return len(self._sessions)
+    
+    def get_or_create(self, session_id=None):
+        """(세션 ID, 세션) 반환 - 모르는 ID나 만료된 세션이면 새 ID를 발급"""
+        now = time.monotonic()
+        with self._lock:
+            session = self._sessions.get(session_id) if session_id else None
+            if session is not None and now - session.last_seen > self.ttl:
+                del self._sessions[session_id]
+                self.evicted += 1
+                session = None
             
-            html = '''
+            if session is None:
+                # 클라이언트가 보낸 ID를 그대로 쓰지 않고 항상 새로 발급 (세션 고정 방지)
+                session_id = secrets.token_urlsafe(16)
+                session = ChatSession()
+                self._sessions[session_id] = session
+                self._evict(now)
+            else:
+                self._sessions.move_to_end(session_id)
+            
+            session.last_seen = now
+            return session_id, session
+    
+    def _evict(self, now):
+        """가장 오래 안 쓴 세션부터 만료분과 상한 초과분을 제거"""
+        while self._sessions:
+            oldest_id, oldest = next(iter(self._sessions.items()))
+            if len(self._sessions) > self.max_sessions or now - oldest.last_seen > self.ttl:
+                del self._sessions[oldest_id]
+                self.evicted += 1
+            else:
+                break
+
+# 글로벌 챗봇 인스턴스와 세션 표
+chatbot = ChatbotServer()
+sessions = SessionStore()
+
+INDEX_HTML = '''
 <!DOCTYPE html>
 <html lang="ko">
 <head>
@@ -984,7 +802,8 @@ class RequestHandler(BaseHTTPRequestHandler):
                 const response = await fetch('/ask', {
                     method: 'POST',
                     headers: { 'Content-Type': 'application/json' },
-                    body: JSON.stringify({ question: message })
+                    // 화면에는 출처 원문을 쓰지 않으므로 응답에서 제외
+                    body: JSON.stringify({ question: message, include_texts: false })
                 });
                 
                 const data = await response.json();
@@ -1013,44 +832,158 @@ class RequestHandler(BaseHTTPRequestHandler):
     </script>
 </body>
 </html>
-            '''
-            self.wfile.write(html.encode('utf-8'))
+'''
+
+class StaticPage:
+    """미리 인코딩·압축해 둔 정적 페이지 (요청마다 다시 만들지 않음)"""
+    
+    def __init__(self, html, content_type='text/html; charset=utf-8'):
+        self.body = html.encode('utf-8')
+        self.gzip_body = gzip.compress(self.body, compresslevel=9)
+        self.etag = '"' + hashlib.sha1(self.body).hexdigest()[:16] + '"'
+        self.content_type = content_type
+
+INDEX_PAGE = StaticPage(INDEX_HTML)
+
+class RequestHandler(BaseHTTPRequestHandler):
+    # HTTP/1.1 지속 연결: 같은 연결로 여러 /ask 요청을 처리 (유휴 연결은 timeout 후 닫음)
+    protocol_version = "HTTP/1.1"
+    timeout = KEEPALIVE_TIMEOUT
+    # 헤더와 본문을 따로 쓰므로 Nagle 알고리즘을 끄지 않으면 지속 연결에서 ACK 지연(~40ms)이 생김
+    disable_nagle_algorithm = True
+    
+    def do_GET(self):
+        if self.path == '/':
+            self.send_page(INDEX_PAGE)
             
         elif self.path == '/ask' and self.command == 'POST':
             self.do_POST()
         else:
             self.send_error(404)
     
+    def do_HEAD(self):
+        self.do_GET()
+    
     def do_POST(self):
         if self.path == '/ask':
-            content_length = int(self.headers['Content-Length'])
+            content_length = int(self.headers.get('Content-Length', 0))
             post_data = self.rfile.read(content_length)
             
             try:
                 data = json.loads(post_data.decode('utf-8'))
                 question = data.get('question', '')
+                include_texts = data.get('include_texts', ASK_INCLUDE_SOURCE_TEXT)
+                
+                cookie_id = self.get_session_cookie()
+                session_id, session = sessions.get_or_create(cookie_id)
+                with session.lock:
+                    result = chatbot.ask_question(question, session.history)
                 
-                result = chatbot.ask_question(question)
+                if not include_texts:
+                    # 출처 원문(청크 전체)을 빼고 메타데이터만 전송
+                    result["sources"] = [{k: v for k, v in source.items() if k != "text"}
+                                         for source in result["sources"]]
                 
-                self.send_response(200)
-                self.send_header('Content-type', 'application/json; charset=utf-8')
-                self.end_headers()
+                headers = {}
+                if session_id != cookie_id:
+                    headers['Set-Cookie'] = f"{SESSION_COOKIE}={session_id}; Path=/; HttpOnly; SameSite=Lax"
                 
                 response = json.dumps(result, ensure_ascii=False)
-                self.wfile.write(response.encode('utf-8'))
+                self.send_body(200, 'application/json; charset=utf-8', response.encode('utf-8'), headers=headers)
                 
             except Exception as e:
                 self.send_error(500, str(e))
+        else:
+            self.send_error(404)
+    
+    def accepts_gzip(self):
+        """Accept-Encoding에 gzip이 허용되어 있는지 (q=0이면 거부로 처리)"""
+        for coding in self.headers.get('Accept-Encoding', '').split(','):
+            name, _, params = coding.strip().partition(';')
+            if name.strip().lower() in ('gzip', '*'):
+                return params.replace(' ', '') not in ('q=0', 'q=0.0', 'q=0.00', 'q=0.000')
+        return False
+    
+    def send_body(self, status, content_type, body, gzip_body=None, headers=None):
+        """본문 전송 - 클라이언트가 허용하면 gzip으로 압축하고, 지속 연결을 위해 Content-Length를 항상 보냄"""
+        use_gzip = self.accepts_gzip()
+        if use_gzip and gzip_body is None:
+            if len(body) >= GZIP_MIN_SIZE:
+                gzip_body = gzip.compress(body, compresslevel=GZIP_LEVEL)
+            else:
+                use_gzip = False
+        if use_gzip:
+            body = gzip_body
+        
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('Vary', 'Accept-Encoding')
+        if use_gzip:
+            self.send_header('Content-Encoding', 'gzip')
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        if self.command != 'HEAD':
+            self.wfile.write(body)
+    
+    def send_page(self, page):
+        """정적 페이지 전송 (If-None-Match가 ETag와 같으면 본문 없이 304)"""
+        headers = {
+            'ETag': page.etag,
+            'Cache-Control': f"public, max-age={PAGE_CACHE_SECONDS}",
+        }
+        if_none_match = self.headers.get('If-None-Match', '')
+        if page.etag in [tag.strip() for tag in if_none_match.split(',')] or if_none_match.strip() == '*':
+            self.send_response(304)
+            for name, value in headers.items():
+                self.send_header(name, value)
+            self.send_header('Vary', 'Accept-Encoding')
+            self.end_headers()
+            return
+        self.send_body(200, page.content_type, page.body, page.gzip_body, headers)
+    
+    def get_session_cookie(self):
+        """요청 쿠키에서 세션 ID 읽기 (없거나 잘못된 쿠키면 None)"""
+        cookie = SimpleCookie()
+        try:
+            cookie.load(self.headers.get('Cookie', ''))
+        except CookieError:
+            return None
+        morsel = cookie.get(SESSION_COOKIE)
+        return morsel.value if morsel else None
+
+class ClosingRequestHandler(RequestHandler):
+    """단일 스레드 모드용 - 연결을 붙잡고 있으면 다른 클라이언트가 기다리므로 응답 후 바로 닫음"""
+    protocol_version = "HTTP/1.0"
+
+def make_server(host=SERVER_HOST, port=SERVER_PORT, threaded=THREADED_SERVER):
+    """HTTP 서버 생성 (threaded면 요청마다 스레드를 띄워 느린 요청이 다른 사용자를 막지 않음)"""
+    if threaded:
+        server = ThreadingHTTPServer((host, port), RequestHandler, bind_and_activate=False)
+    else:
+        server = HTTPServer((host, port), ClosingRequestHandler, bind_and_activate=False)
+    # 기본 listen 대기열(5)은 동시 접속이 몰리면 넘쳐서 클라이언트가 1초씩 재접속을 기다린다
+    server.request_queue_size = REQUEST_QUEUE_SIZE
+    try:
+        server.server_bind()
+        server.server_activate()
+    except Exception:
+        server.server_close()
+        raise
+    return server
 
-def run_server():
-    server = HTTPServer(('localhost', 8000), RequestHandler)
+def run_server(host=SERVER_HOST, port=SERVER_PORT, threaded=THREADED_SERVER):
+    server = make_server(host, port, threaded)
+    url = f"http://{host}:{port}"
     print("🚀 챗봇 서버가 시작되었습니다!")
-    print("📱 브라우저에서 http://localhost:8000 에 접속하세요")
+    print(f"🧵 서버 모드: {'멀티스레드' if threaded else '단일 스레드'} (세션 최대 {sessions.max_sessions}개)")
+    print(f"📱 브라우저에서 {url} 에 접속하세요")
     print("💡 이제 실제 문서 검색과 개선된 기능들을 사용할 수 있습니다!")
     
     # 3초 후 자동으로 브라우저 열기
     def open_browser():
-        webbrowser.open('http://localhost:8000')
+        webbrowser.open(url)
     
     Timer(3.0, open_browser).start()
     
@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+# structured_answer.py - 필드 조회 질문의 구조화 답변 (Python 내장 모듈만 사용)
+#
+# "부모급여 문의처 알려줘", "출산지원금 신청 방법"처럼 사업 하나의 필드 하나를 묻는 질문은
+# 검색된 사업 블록의 파싱된 필드로 바로 답할 수 있다. 확신이 높을 때만(필드 하나, 사업 하나)
+# LLM 호출 없이 답하고, 그 외에는 None을 돌려 기존 LLM 경로를 타게 한다.
+
+import threading
+import time
+from collections import Counter, deque
+from typing import Dict, List, NamedTuple, Optional
+
+from program_blocks import parse_program_fields, split_programs
+from query_plan import DETAIL_PATTERNS, QueryPlan, TermMatcher
+
+# 필드별 질문 표현 (질문에서 필드 의도를 찾는 용도)
+FIELD_TERMS = {
+    "contact": ('문의처', '연락처', '전화번호', '문의 전화', '담당 부서', '담당부서', '어디에 문의', '어디로 문의'),
+    "method": ('신청 방법', '신청방법', '신청 절차', '신청절차', '어떻게 신청', '신청하려면', '어디서 신청',
+               '신청은 어디', '접수 방법', '접수방법'),
+    "target": ('지원 대상', '지원대상', '신청 대상', '신청대상', '신청 자격', '신청자격', '누가 받', '누가 신청'),
+    "amount": ('지원 금액', '지원금액', '지원액', '얼마', '금액'),
+}
+FIELD_MATCHERS = {field: TermMatcher(terms) for field, terms in FIELD_TERMS.items()}
+
+FIELD_LABELS = {
+    "contact": ("📞", "문의처"),
+    "method": ("📝", "신청 방법"),
+    "target": ("👥", "지원 대상"),
+    "amount": ("💰", "지원 금액"),
+}
+
+# 여러 사업을 묻는 질문 (목록/비교는 LLM이 정리)
+LIST_MATCHER = TermMatcher(['목록', '종류', '전부', '모두', '모든', '뭐뭐', '비교', '다른', '추가로', '외에', '말고'])
+
+# 사업명을 찾을 때 질문에서 지우는 표현 (긴 것부터)
+_NOISE_TERMS = sorted(
+    {term for terms in FIELD_TERMS.values() for term in terms} | set(DETAIL_PATTERNS) |
+    {'알고 싶어', '알고싶어', '궁금해', '궁금합니다', '주세요', '어디', '어떻게', '무엇', '누구', '뭐', '좀', '인가요', '인지'},
+    key=len, reverse=True,
+)
+_PARTICLES = ('에서', '으로', '은', '는', '이', '가', '을', '를', '의', '에', '로', '와', '과', '도')
+_PUNCTUATION = '?!.,~"\''
+
+
+def subject_terms(plan: QueryPlan) -> List[str]:
+    """질문에서 필드 표현·요청 표현·조사를 지우고 남은 사업명 단어 (공백 없이)"""
+    text = plan.lower
+    for term in _NOISE_TERMS:
+        text = text.replace(term, ' ')
+    terms = []
+    for word in text.split():
+        word = word.strip(_PUNCTUATION)
+        for particle in _PARTICLES:
+            if len(word) > len(particle) + 1 and word.endswith(particle):
+                word = word[:-len(particle)]
+                break
+        if len(word) >= 2:
+            terms.append(word)
+    return terms
+
+
+def detect_field(plan: QueryPlan) -> Optional[str]:
+    """질문이 묻는 필드 하나 (없거나 둘 이상이면 None)"""
+    if plan.intent == "more" or LIST_MATCHER(plan.lower):
+        return None
+    fields = [field for field, matcher in FIELD_MATCHERS.items() if matcher(plan.lower)]
+    return fields[0] if len(fields) == 1 else None
+
+
+def hit_programs(hit: Dict) -> List[Dict[str, str]]:
+    """검색 결과의 사업 필드 목록 (사업 단위 청크는 메타데이터, 고정 길이 청크는 즉석 파싱)
+
+    고정 길이 청크의 첫 블록과 마지막 블록은 청크 경계에서 잘렸을 수 있어(필드 값이 중간에 끊김) 버리고,
+    앞뒤가 다음 사업으로 닫힌 가운데 블록만 쓴다.
+    """
+    if "program" in hit:
+        return [hit["program"]]
+    blocks = list(split_programs(hit["text"].split('\n')))
+    return [parse_program_fields(block) for block in blocks[1:-1]]
+
+
+class StructuredAnswer(NamedTuple):
+    answer: str
+    field: str
+    title: str
+    hit: Dict
+
+
+def format_answer(field: str, program: Dict[str, str], hit: Dict) -> str:
+    """필드 하나를 답변 문장으로"""
+    icon, label = FIELD_LABELS[field]
+    return (
+        f"{icon} **{program['title']}** {label}입니다.\n\n"
+        f"- {label}: {program[field]}\n\n"
+        f"[출처: {hit['source']}#{hit['chunk_id']}]\n\n"
+        f"다른 내용(대상, 지원 내용 등)도 궁금하시면 편하게 물어보세요! 😊"
+    )
+
+
+def answer_from_fields(question: str, hits: List[Dict]) -> Optional[StructuredAnswer]:
+    """필드 조회 질문이고, 사업명이 맞는 사업이 검색 결과에 하나뿐이면 그 필드로 답변"""
+    plan = QueryPlan(question)
+    field = detect_field(plan)
+    if field is None:
+        return None
+    terms = subject_terms(plan)
+    if not terms:
+        return None
+
+    matches = {}
+    for hit in hits:
+        for program in hit_programs(hit):
+            title = program.get('title', '')
+            compact = title.lower().replace(' ', '')
+            if program.get(field) and all(term in compact for term in terms):
+                # 겹치는 청크에 같은 사업이 여러 번 나와도 하나로 본다 (첫 검색 결과 유지)
+                matches.setdefault((compact, program[field]), (program, hit))
+    if len(matches) != 1:
+        return None
+
+    program, hit = next(iter(matches.values()))
+    return StructuredAnswer(format_answer(field, program, hit), field, program['title'], hit)
+
+
+class StructuredAnswerStats:
+    """구조화 답변 적중률 기록 (최근 N건)"""
+
+    def __init__(self, maxlen: int = 1000):
+        self._records = deque(maxlen=maxlen)
+        self._lock = threading.Lock()
+
+    def record(self, field: Optional[str], elapsed_ms: float):
+        """field가 None이면 LLM으로 넘긴 요청"""
+        with self._lock:
+            self._records.append((field, elapsed_ms))
+
+    def summary(self) -> Dict:
+        with self._lock:
+            records = list(self._records)
+        if not records:
+            return {"requests": 0}
+        hits = [(field, ms) for field, ms in records if field is not None]
+        return {
+            "requests": len(records),
+            "hits": len(hits),
+            "hit_rate": round(len(hits) / len(records), 3),
+            "avg_hit_ms": round(sum(ms for _, ms in hits) / len(hits), 3) if hits else None,
+            "fields": dict(Counter(field for field, _ in hits)),
+        }
+
+
+def timed_answer(question: str, hits: List[Dict], stats: StructuredAnswerStats) -> Optional[StructuredAnswer]:
+    """answer_from_fields를 실행하고 적중 여부·소요 시간을 기록"""
+    start = time.perf_counter()
+    result = answer_from_fields(question, hits)
+    stats.record(result.field if result else None, (time.perf_counter() - start) * 1000)
+    return result
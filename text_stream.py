@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+# text_stream.py - 대용량 텍스트 파일 스트리밍 읽기/청크 분할 (Python 내장 모듈만 사용)
+#
+# ingest.py / simple_ingest.py의 chunk_text는 파일 전체를 문자열로 읽은 뒤
+# re.sub와 슬라이싱을 하므로 수 GB짜리 상담 기록 로그에서는 메모리가 부족해진다.
+# 여기서는 파일을 고정 크기 블록으로 읽으면서 같은 정규화(\n 3개 이상 → 2개, 앞뒤 공백 제거)를
+# 이어서 적용하고, 블록 경계를 넘는 겹침까지 맞춰 chunk_text와 똑같은 청크를 차례로 내보낸다.
+# 메모리는 청크 크기 + 읽기 블록 크기 정도만 사용한다.
+
+import re
+from pathlib import Path
+from typing import Callable, Iterable, Iterator, Optional
+
+STREAM_BLOCK_SIZE = 1 << 16  # 한 번에 읽는 문자 수
+
+_NEWLINE_RUN = re.compile(r"\n{3,}")
+
+
+def iter_text_blocks(path: Path, block_size: int = STREAM_BLOCK_SIZE) -> Iterator[str]:
+    """파일을 block_size 문자씩 읽기 (read_text와 같은 인코딩·줄바꿈 처리)"""
+    # 텍스트 모드의 universal newlines가 블록 경계에 걸친 \r\n도 \n 하나로 바꿔 준다
+    with open(path, "r", encoding="utf-8", errors="ignore") as f:
+        while True:
+            block = f.read(block_size)
+            if not block:
+                return
+            yield block
+
+
+def iter_lines_blocks(blocks: Iterable[str]) -> Iterator[str]:
+    """블록을 완전한 줄 단위로 다시 묶기 (줄 단위 정규식 변환을 블록마다 적용할 때 사용)"""
+    rest = ""
+    for block in blocks:
+        block = rest + block
+        cut = block.rfind("\n") + 1
+        rest = block[cut:]
+        if cut:
+            yield block[:cut]
+    if rest:
+        yield rest
+
+
+def iter_lines(blocks: Iterable[str]) -> Iterator[str]:
+    """블록 스트림을 줄 단위로 (줄바꿈 문자 제외)"""
+    for block in iter_lines_blocks(blocks):
+        yield from (block[:-1] if block.endswith("\n") else block).split("\n")
+
+
+def map_lines(blocks: Iterable[str], transform: Callable[[str], str]) -> Iterator[str]:
+    """줄을 넘지 않는 변환(줄바꿈을 매칭하지 않는 정규식 치환 등)을 블록 단위로 적용"""
+    for block in iter_lines_blocks(blocks):
+        yield transform(block)
+
+
+def normalize_blocks(blocks: Iterable[str]) -> Iterator[str]:
+    """re.sub(r"\\n{3,}", "\\n\\n", text).strip()을 블록 단위로 적용
+
+    각 블록 끝의 공백은 다음 블록에 공백 아닌 문자가 올 때까지 보류한다.
+    그러면 내보내는 조각은 항상 공백 아닌 문자로 끝나서 줄바꿈 연속 구간이 조각 사이에 걸리지 않고,
+    파일 끝까지 보류된 공백은 strip()처럼 버려진다.
+    """
+    pending = ""
+    started = False
+    for block in blocks:
+        block = pending + block
+        end = len(block.rstrip())
+        if not end:
+            # 공백뿐인 구간 - 줄바꿈은 미리 줄여서 보류 문자열이 커지지 않게 한다 (결과는 동일)
+            pending = _NEWLINE_RUN.sub("\n\n", block)
+            continue
+        piece, pending = block[:end], block[end:]
+        if not started:
+            piece = piece.lstrip()
+            started = True
+        yield _NEWLINE_RUN.sub("\n\n", piece)
+
+
+def iter_chunks(pieces: Iterable[str], size: int, overlap: int) -> Iterator[str]:
+    """정규화된 텍스트 조각들을 chunk_text와 같은 규칙(size 글자, overlap 글자 겹침)으로 분할
+
+    청크 뒤에 글자가 더 남아 있을 때만 다음 청크로 넘어가므로,
+    마지막 청크 판정(end >= len(text))도 전체 길이를 모른 채로 똑같이 맞춘다.
+    """
+    step = size - overlap
+    if step <= 0:
+        raise ValueError(f"overlap({overlap})은 size({size})보다 작아야 합니다")
+
+    buffer = ""
+    for piece in pieces:
+        buffer += piece
+        start = 0
+        while len(buffer) - start > size:
+            yield buffer[start:start + size]
+            start += step
+        buffer = buffer[start:]
+    if buffer:
+        yield buffer
+
+
+def stream_chunks(blocks: Iterable[str], size: int, overlap: int,
+                  transform: Optional[Callable[[str], str]] = None) -> Iterator[str]:
+    """원문 블록 → (줄 단위 변환) → 정규화 → 청크"""
+    if transform is not None:
+        blocks = map_lines(blocks, transform)
+    return iter_chunks(normalize_blocks(blocks), size, overlap)